@@ -0,0 +1,259 @@
+'''
+Mapped and unmapped read counts of BAM files. The counts are read from the BAM index
+(.bai or .csi): the pseudo-bin of each reference holds its number of mapped and
+unmapped reads, and the index ends with the number of unplaced unmapped reads, so the
+BAM itself is not read. Only BAMs without an index are decompressed: the BGZF blocks
+are decompressed on a pool of threads and the alignment records counted.
+'''
+import os
+import gzip
+import zlib
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from fastq_counts import find_sample_files
+
+
+BAI_PSEUDO_BIN = 37450
+# compressed bytes of BGZF blocks decompressed per batch by the fallback count
+SCAN_BATCH_SIZE = 64 * 1024 ** 2
+INT32 = struct.Struct('<i')
+UINT32 = struct.Struct('<I')
+UINT64_PAIR = struct.Struct('<QQ')
+# block_size, refID and (after pos, l_read_name, mapq, bin, n_cigar_op) flag of a record
+RECORD = struct.Struct('<ii10xH')
+BAM_FUNMAP = 4
+
+
+class BamCounts:
+    '''
+    Read counts of a BAM: mapped and unmapped reads per reference (in the order of the
+    BAM header), unplaced unmapped reads (no reference) and the source of the counts
+    ('index' or 'scan').
+    '''
+
+    def __init__(self, mapped, unmapped, unplaced, source):
+        self.mapped = mapped
+        self.unmapped = unmapped
+        self.unplaced = unplaced
+        self.source = source
+
+    @property
+    def total_mapped(self):
+        return sum(self.mapped)
+
+    @property
+    def total_unmapped(self):
+        return sum(self.unmapped) + self.unplaced
+
+    @property
+    def total(self):
+        return self.total_mapped + self.total_unmapped
+
+
+def index_path(bam):
+    '''
+    Path of the index of a BAM (<bam>.bai, <name>.bai, <bam>.csi), None if not indexed
+    '''
+    stem = os.path.splitext(bam)[0]
+    for path in [bam + '.bai', stem + '.bai', bam + '.csi']:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def bai_counts(data):
+    '''
+    Read counts from the pseudo-bins of a BAI index (the index content as bytes)
+    '''
+    if data[:4] != b'BAI\x01':
+        raise Exception('Not a BAI index (bad magic).')
+    return index_counts(data, 4, BAI_PSEUDO_BIN, bin_offsets=False)
+
+
+def csi_counts(data):
+    '''
+    Read counts from the pseudo-bins of a CSI index (the decompressed index as bytes)
+    '''
+    if data[:4] != b'CSI\x01':
+        raise Exception('Not a CSI index (bad magic).')
+    _, depth, l_aux = struct.unpack_from('<iii', data, 4)
+    pseudo_bin = ((1 << ((depth + 1) * 3)) - 1) // 7 + 1
+    return index_counts(data, 16 + l_aux, pseudo_bin, bin_offsets=True)
+
+
+def index_counts(data, offset, pseudo_bin, bin_offsets):
+    '''
+    Walk the references of a BAI/CSI index from offset (n_ref) and collect the mapped
+    and unmapped counts of each reference's pseudo-bin. Only bin and chunk headers are
+    read; chunk lists are skipped. CSI bins have a loffset (bin_offsets) and no linear
+    index.
+    '''
+    (n_ref,) = INT32.unpack_from(data, offset)
+    offset += 4
+    mapped, unmapped = [0] * n_ref, [0] * n_ref
+    for ref in range(n_ref):
+        (n_bin,) = INT32.unpack_from(data, offset)
+        offset += 4
+        for _ in range(n_bin):
+            (bin_id,) = UINT32.unpack_from(data, offset)
+            (n_chunk,) = INT32.unpack_from(data, offset + (12 if bin_offsets else 4))
+            offset += 16 if bin_offsets else 8
+            if bin_id == pseudo_bin and n_chunk == 2:
+                mapped[ref], unmapped[ref] = UINT64_PAIR.unpack_from(data, offset + 16)
+            offset += 16 * n_chunk
+        if not bin_offsets:
+            (n_intv,) = INT32.unpack_from(data, offset)
+            offset += 4 + 8 * n_intv
+    # the number of unplaced unmapped reads is optional at the end of the index
+    unplaced = 0
+    if len(data) >= offset + 8:
+        (unplaced,) = struct.unpack_from('<Q', data, offset)
+    return BamCounts(mapped, unmapped, unplaced, 'index')
+
+
+def read_index_counts(path):
+    '''
+    Read counts from a .bai or .csi index file
+    '''
+    with open(path, 'rb') as file:
+        data = file.read()
+    if path.endswith('.csi'):
+        return csi_counts(gzip.decompress(data))
+    return bai_counts(data)
+
+
+def bgzf_blocks(data):
+    '''
+    Split BGZF data into complete blocks. Returns the blocks and the offset of the first
+    incomplete block.
+    '''
+    blocks = []
+    offset = 0
+    while offset + 18 <= len(data):
+        if data[offset:offset + 4] != b'\x1f\x8b\x08\x04':
+            raise Exception('Not a BGZF compressed BAM.')
+        (block_size,) = struct.unpack_from('<H', data, offset + 16)
+        end = offset + block_size + 1
+        if end > len(data):
+            break
+        blocks.append(data[offset:end])
+        offset = end
+    return blocks, offset
+
+
+def decompress_block(block):
+    '''
+    Decompress a single BGZF block
+    '''
+    return zlib.decompress(block, zlib.MAX_WBITS | 16)
+
+
+def bam_header(data):
+    '''
+    Offset of the first alignment record (after the header) of decompressed BAM data and
+    the reference names, None if data does not yet hold the whole header
+    '''
+    if len(data) < 12:
+        return None
+    if data[:4] != b'BAM\x01':
+        raise Exception('Not a BAM file (bad magic).')
+    (l_text,) = INT32.unpack_from(data, 4)
+    offset = 8 + l_text
+    if len(data) < offset + 4:
+        return None
+    (n_ref,) = INT32.unpack_from(data, offset)
+    offset += 4
+    references = []
+    for _ in range(n_ref):
+        if len(data) < offset + 4:
+            return None
+        (l_name,) = INT32.unpack_from(data, offset)
+        if len(data) < offset + 4 + l_name + 4:
+            return None
+        references.append(data[offset + 4:offset + 4 + l_name - 1].decode())
+        offset += 4 + l_name + 4
+    return offset, references
+
+
+def read_bam(path, threads=1):
+    '''
+    Stream the alignment records of a BAM: BGZF blocks are read in batches of
+    SCAN_BATCH_SIZE and decompressed on a pool of threads. Yields the reference names
+    first, then (data, offset) of each record in order (the record starts at offset in
+    data, with its block_size).
+    '''
+    references = None
+    pending = b''
+    with open(path, 'rb') as file, ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        compressed = b''
+        for batch in iter(lambda: file.read(SCAN_BATCH_SIZE), b''):
+            compressed += batch
+            blocks, used = bgzf_blocks(compressed)
+            compressed = compressed[used:]
+            for data in executor.map(decompress_block, blocks):
+                pending += data
+                offset = 0
+                if references == None:
+                    header = bam_header(pending)
+                    if header == None:
+                        continue
+                    offset, references = header
+                    yield references
+                # complete records, an incomplete record continues in the next block
+                end = len(pending)
+                while offset + 4 <= end:
+                    (block_size,) = INT32.unpack_from(pending, offset)
+                    if offset + 4 + block_size > end:
+                        break
+                    yield pending, offset
+                    offset += 4 + block_size
+                pending = pending[offset:]
+    if compressed or pending or references == None:
+        raise Exception(f'BAM is truncated: {path}')
+
+
+def scan_counts(path, threads=1):
+    '''
+    Read counts of a BAM without an index, counting its records (read_bam)
+    '''
+    records = read_bam(path, threads)
+    references = next(records, None)
+    mapped, unmapped, unplaced = [0] * len(references or []), [0] * len(references or []), 0
+    for data, offset in records:
+        _, ref_id, flag = RECORD.unpack_from(data, offset)
+        if ref_id < 0:
+            unplaced += 1
+        elif flag & BAM_FUNMAP:
+            unmapped[ref_id] += 1
+        else:
+            mapped[ref_id] += 1
+    return BamCounts(mapped, unmapped, unplaced, 'scan')
+
+
+def bam_counts(path, threads=1):
+    '''
+    Read counts of a BAM, from its index if it has one which is not older than the BAM
+    (otherwise by decompressing the BAM on a pool of threads)
+    '''
+    index = index_path(path)
+    # an index older than the BAM may not match it
+    if index != None and os.stat(index).st_mtime_ns >= os.stat(path).st_mtime_ns:
+        return read_index_counts(index)
+    return scan_counts(path, threads)
+
+
+def count_sample_bam_reads(bam_dirs, samples, jobs=1):
+    '''
+    Read counts of each sample's BAMs found in bam_dirs (searched recursively). Returns
+    a dict keyed on sample of (BAM paths, list of BamCounts of each BAM or the error
+    message if a BAM could not be read).
+    '''
+    bams = find_sample_files(bam_dirs, samples, ('.bam',))
+    sample_counts = {}
+    for sample, paths in bams.items():
+        try:
+            counts = [bam_counts(path, jobs) for path in paths]
+        except Exception as error:
+            counts = f'{type(error).__name__}: {error}'
+        sample_counts[sample] = (paths, counts)
+    return sample_counts
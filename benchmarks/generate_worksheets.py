@@ -0,0 +1,321 @@
+'''
+Generate synthetic MiSeq Universal pipeline output for benchmarking the quality checks:
+a TSHC worksheet pair and TSMP/CLL worksheets (with samplesheets). The directory layout,
+file names and sheets match those read by quality_check.py; sample counts and sheet
+sizes are configurable. A batch manifest of the generated worksheets is written to
+<out_dir>/manifest.tsv.
+'''
+import os
+import csv
+import zlib
+import struct
+import random
+import argparse
+import pandas as pd
+
+
+PIPELINE_VERSION = 'v1.0.3'
+CHROMS = [f'chr{num}' for num in list(range(1, 23)) + ['X', 'Y']]
+BASES = 'ACGT'
+# number of exons expected in the negative sample by the quality checks
+NEG_EXONS = {'TSHC': 1350, 'TSMP': 491, 'CLL': 150}
+GENE_COV_THRES = {'TSMP': 200, 'CLL': 300}
+CMD_LOG_DIRS = {'TSHC': 'TSHC', 'TSMP': 'TSMP_Flex', 'CLL': 'OGT_CLL'}
+# BGZF end-of-file marker (an empty BGZF block)
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+def bgzf_compress(data):
+    '''
+    Compress data as BGZF (blocked gzip, as written by bgzip) including the EOF block
+    '''
+    blocks = []
+    for start in range(0, len(data), 0xff00):
+        chunk = data[start:start + 0xff00]
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        deflated = compressor.compress(chunk) + compressor.flush()
+        header = struct.pack('<4BI2BH2BHH', 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6,
+                             ord('B'), ord('C'), 2, len(deflated) + 25)
+        footer = struct.pack('<2I', zlib.crc32(chunk) & 0xffffffff, len(chunk))
+        blocks.append(header + deflated + footer)
+    return b''.join(blocks) + BGZF_EOF
+
+
+def write_workbook(path, sheets):
+    '''
+    Write a dict of {sheet name: DataFrame} to an excel workbook
+    '''
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for sheet_name, sheet_df in sheets.items():
+            sheet_df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+def extra_columns(rng, num_rows, num_cols, prefix):
+    '''
+    Filler metric columns so sheets have a realistic width
+    '''
+    return {f'{prefix}_{col}': [round(rng.random() * 100, 3) for _ in range(num_rows)]
+            for col in range(num_cols)}
+
+
+def random_variants(rng, sample, num_rows, num_cols):
+    '''
+    A Variants-all-data style sheet. Columns SAMPLE to AB are shown in the report.
+    '''
+    refs = [rng.choice(BASES) for _ in range(num_rows)]
+    variants = {
+        'SAMPLE': [sample] * num_rows,
+        'CHROM': [rng.choice(CHROMS) for _ in range(num_rows)],
+        'POS': [rng.randint(1, 10 ** 8) for _ in range(num_rows)],
+        'REF': refs,
+        'ALT': [rng.choice(BASES.replace(ref, '')) for ref in refs],
+        'Gene': [f'GENE{rng.randint(1, 60)}' for _ in range(num_rows)],
+        'Alleles': [f'{rng.randint(100, 900)},{rng.randint(1, 40)}' for _ in range(num_rows)],
+        'AB': [round(rng.random(), 3) for _ in range(num_rows)],
+        'FILTER': [rng.choice(['PASS', 'PASS', 'PASS', 'singleton', 'LowQual'])
+                   for _ in range(num_rows)]
+    }
+    variants.update(extra_columns(rng, num_rows, num_cols, 'INFO'))
+    return pd.DataFrame(variants)
+
+
+def write_vcf(path, sample, num_records, rng):
+    '''
+    Write a bgzipped single sample VCF and a tabix index placeholder (written after the
+    VCF so it is newer)
+    '''
+    lines = ['##fileformat=VCFv4.2',
+             f'##source=MiSeq-Universal-{PIPELINE_VERSION}']
+    lines += [f'##contig=<ID={chrom}>' for chrom in CHROMS]
+    lines.append('\t'.join(['#CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER',
+                            'INFO', 'FORMAT', sample]))
+    positions = sorted((CHROMS.index(rng.choice(CHROMS)), rng.randint(1, 10 ** 8))
+                       for _ in range(num_records))
+    for chrom, pos in positions:
+        ref = rng.choice(BASES)
+        alt = rng.choice(BASES.replace(ref, ''))
+        filt = rng.choice(['PASS', 'PASS', 'PASS', 'LowQual', 'singleton'])
+        depth = rng.randint(100, 1000)
+        lines.append(f'{CHROMS[chrom]}\t{pos}\t.\t{ref}\t{alt}\t{rng.randint(20, 99)}\t{filt}'
+                     f'\tDP={depth}\tGT:AD:DP\t0/1:{depth // 2},{depth // 2}:{depth}')
+    with open(path, 'wb') as file:
+        file.write(bgzf_compress(('\n'.join(lines) + '\n').encode()))
+    with open(path + '.tbi', 'wb') as file:
+        file.write(bgzf_compress(b'TBI\x01' + bytes(64)))
+
+
+def write_cmd_log(path, panel, worksheet):
+    with open(path, 'w') as file:
+        file.write(f'Pipeline command:\n/opt/scripts/MiSeq-Universal-{PIPELINE_VERSION}/'
+                   f'MiSeq-master-pipeline.py -s \n/network/sequenced/MiSeq_data/'
+                   f'{CMD_LOG_DIRS[panel]}/{worksheet}/200101_M01234_0001_000000000-ABCDE/'
+                   f'SampleSheet.csv -p {panel}\n')
+
+
+def write_samplesheet(path, samples):
+    '''
+    W10 style samplesheet (header lines without trailing commas)
+    '''
+    columns = ['Sample_ID', 'Sample_Name', 'Sample_Plate', 'Sample_Well', 'I7_Index_ID',
+               'index', 'I5_Index_ID', 'index2', 'Sample_Project', 'Description']
+    with open(path, 'w', newline='') as file:
+        file.write('[Header]\nIEMFileVersion,5\nWorkflow,GenerateFASTQ\n\n[Reads]\n151\n151\n\n'
+                   '[Settings]\n\n[Data]\n')
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for num, sample in enumerate(samples, 1):
+            writer.writerow([sample, sample, '', f'A{num:02d}', f'N7{num:02d}', 'ACGTACGT',
+                             f'S5{num:02d}', 'TGCATGCA', '', ''])
+
+
+def tshc_worksheet(out_dir, worksheet, num_samples, has_negative, args, rng):
+    '''
+    One worksheet of a TSHC pair. The negative sample and kinship report (for the pair)
+    are written to the worksheet with has_negative set.
+    '''
+    ws_dir = os.path.join(out_dir, worksheet, f'TSHC_{worksheet}_{PIPELINE_VERSION}')
+    excel_dir = os.path.join(ws_dir, f'excel_reports_TSHC_{worksheet}')
+    vcf_dir = os.path.join(ws_dir, f'vcfs_TSHC_{worksheet}')
+    os.makedirs(excel_dir, exist_ok=True)
+    os.makedirs(vcf_dir, exist_ok=True)
+
+    samples = [f'{worksheet}-{num:02d}-D21-{rng.randint(10000, 99999)}-AB-Smith-001_S{num}'
+               for num in range(1, num_samples + 1)]
+    if has_negative:
+        samples[-1] = f'{worksheet}-{num_samples:02d}-D00-00000-Neg-001_S{num_samples}'
+
+    hybqc = {'Sample': samples,
+             'PCT_TARGET_BASES_20X': [round(rng.uniform(0.965, 0.999), 4) for _ in samples]}
+    hybqc.update(extra_columns(rng, len(samples), args.extra_columns, 'METRIC'))
+    verify = {'SAMPLE': samples, '#SNPS': [rng.randint(5000, 9000) for _ in samples],
+              '%CONT': [round(rng.uniform(0, 2), 3) for _ in samples]}
+    config = pd.DataFrame({
+        'key': ['AB_threshold', 'pipeline_version', 'target_regions', 'refined_target_regions',
+                'coverage_regions', 'panel', 'worksheet'],
+        'variable': ['0.2', PIPELINE_VERSION, '/data/beds/TSHC_target_v3.bed',
+                     '/data/beds/TSHC_refined_v3.bed', '/data/beds/TSHC_coverage_v3.bed',
+                     'TSHC', worksheet]})
+    sheets = {'Hyb-QC': pd.DataFrame(hybqc), 'VerifyBamId': pd.DataFrame(verify),
+              'config_parameters': config}
+
+    for sample in samples:
+        sample_sheets = dict(sheets)
+        sample_sheets['Variants-all-data'] = random_variants(
+            rng, sample, args.variants, args.extra_columns)
+        if 'Neg' in sample:
+            sample_sheets['Coverage-exon'] = pd.DataFrame({
+                'Gene': [f'GENE{exon % 60}' for exon in range(NEG_EXONS['TSHC'])],
+                'Exon': list(range(NEG_EXONS['TSHC'])),
+                'Max': [0] * NEG_EXONS['TSHC']})
+        write_workbook(os.path.join(
+            excel_dir, f'{sample}.{PIPELINE_VERSION}-results.xlsx'), sample_sheets)
+        write_vcf(os.path.join(vcf_dir, f'{sample}.vcf.gz'), sample, args.vcf_records, rng)
+
+    reads = [rng.randint(10 ** 6, 3 * 10 ** 6) for _ in samples]
+    write_workbook(os.path.join(excel_dir, f'{worksheet}-fastq-bam-check.xlsx'), {
+        'Check': pd.DataFrame({'Sample': samples, 'FASTQ': reads, 'BAM': reads,
+                               'Result': ['PASS'] * len(samples)})})
+    write_workbook(os.path.join(excel_dir, f'{worksheet}-merged-variants.xlsx'), {
+        'Variants': random_variants(rng, 'merged', args.variants, args.extra_columns)})
+    write_cmd_log(os.path.join(ws_dir, f'{worksheet}.commandline_usage_logfile'),
+                  'TSHC', worksheet)
+    return ws_dir + '/', samples
+
+
+def tshc_pair(out_dir, ws_1, ws_2, args, rng):
+    '''
+    A TSHC worksheet pair with the kinship report for all samples in the pair
+    '''
+    ws_1_dir, samples_1 = tshc_worksheet(out_dir, ws_1, args.tshc_samples, True, args, rng)
+    ws_2_dir, samples_2 = tshc_worksheet(out_dir, ws_2, args.tshc_samples, False, args, rng)
+
+    samples = [sample for sample in samples_1 + samples_2 if 'Neg' not in sample]
+    pairs = [(first, second) for num, first in enumerate(samples) for second in samples[num + 1:]]
+    write_workbook(os.path.join(ws_1_dir, f'{ws_1}_{ws_2}.king.xlsx'), {
+        'Kinship': pd.DataFrame({
+            'FID1': [first for first, _ in pairs], 'ID1': [first for first, _ in pairs],
+            'FID2': [second for _, second in pairs], 'ID2': [second for _, second in pairs],
+            'N_SNP': [rng.randint(2000, 4000) for _ in pairs],
+            'HetHet': [round(rng.random() * 0.1, 4) for _ in pairs],
+            'IBS0': [round(rng.random() * 0.1, 4) for _ in pairs],
+            'Kinship': [round(rng.uniform(-0.3, 0.1), 4) for _ in pairs]})})
+    return ws_1_dir, ws_2_dir
+
+
+def ho_worksheet(out_dir, panel, worksheet, args, rng):
+    '''
+    A TSMP or CLL worksheet and its samplesheet
+    '''
+    ws_dir = os.path.join(out_dir, worksheet, f'{panel}_{worksheet}_{PIPELINE_VERSION}')
+    excel_dir = os.path.join(ws_dir, f'excel_reports_{panel}_{worksheet}')
+    vcf_dir = os.path.join(ws_dir, f'vcfs_{panel}_{worksheet}')
+    os.makedirs(excel_dir, exist_ok=True)
+    os.makedirs(vcf_dir, exist_ok=True)
+
+    samples = [f'{worksheet}-{num:02d}-D21-{rng.randint(10000, 99999)}-AB-Jones-001_S{num}'
+               for num in range(1, args.ho_samples + 1)]
+    negative = f'{worksheet}-{args.ho_samples + 1:02d}-NEG-001_S{args.ho_samples + 1}'
+    thres = GENE_COV_THRES[panel]
+    verify = pd.DataFrame({'SAMPLE': samples + [negative],
+                           '%CONT': [round(rng.uniform(0, 4), 3) for _ in samples] + [0.0]})
+
+    for sample in samples:
+        genes = [f'GENE{num}' for num in range(args.genes)]
+        sheets = {
+            'Coverage-gene': pd.DataFrame({
+                'Worksheet': [worksheet] * args.genes, 'Sample': [sample] * args.genes,
+                'Gene': genes,
+                f'pct>{thres}x': [round(rng.uniform(75, 100), 2) for _ in genes]}),
+            'Coverage-details': pd.DataFrame({
+                'SAMPLE': [sample] * args.exons,
+                'GENE': [f'GENE{rng.randint(0, args.genes - 1)}' for _ in range(args.exons)],
+                'Exon': list(range(args.exons)),
+                'Min_depth': [rng.randint(90, 2000) for _ in range(args.exons)]}),
+            'VerifyBamId': verify,
+            'Variants-all-data': random_variants(rng, sample, args.variants, args.extra_columns)
+        }
+        if panel == 'TSMP':
+            num_flt3 = rng.choice([0, 0, 0, 1, 2])
+            sheets['FLT3'] = pd.DataFrame({
+                'AD': [rng.randint(10, 200) for _ in range(num_flt3)],
+                'ALT-REF': ['A-T'] * num_flt3,
+                'Grouped AR (ALT-REF)': [round(rng.random(), 3) for _ in range(num_flt3)],
+                'Grouped AB (ALT-REF)': [round(rng.random(), 3) for _ in range(num_flt3)]})
+        write_workbook(os.path.join(
+            excel_dir, f'{sample}.{PIPELINE_VERSION}-results.xlsx'), sheets)
+
+    num_exons = NEG_EXONS[panel]
+    neg_variants = random_variants(rng, negative, rng.randint(0, 5), 0)
+    write_workbook(os.path.join(excel_dir, f'{negative}.{PIPELINE_VERSION}-results.xlsx'), {
+        'Coverage-exon': pd.DataFrame({
+            'Gene': [f'GENE{exon % args.genes}' for exon in range(num_exons)],
+            'Exon': list(range(num_exons)),
+            'Max': [rng.choice([0] * 20 + [rng.randint(1, 40)]) for _ in range(num_exons)]}),
+        'Variants-all-data': neg_variants})
+    write_workbook(os.path.join(excel_dir, f'{worksheet}-SRY.xlsx'), {
+        'SRY': pd.DataFrame({'Sample': samples, 'SRY': [rng.choice(['M', 'F']) for _ in samples]})})
+    write_workbook(os.path.join(excel_dir, f'{worksheet}-merged-variants.xlsx'), {
+        'Variants': random_variants(rng, 'merged', args.variants, args.extra_columns)})
+
+    for sample in samples + [negative]:
+        write_vcf(os.path.join(vcf_dir, f'{sample}.vcf.gz'), sample, args.vcf_records, rng)
+    write_cmd_log(os.path.join(ws_dir, f'{worksheet}.commandline_usage_logfile'),
+                  panel, worksheet)
+    sample_sheet = os.path.join(out_dir, worksheet, 'SampleSheet.csv')
+    write_samplesheet(sample_sheet, samples + [negative])
+    return ws_dir + '/', sample_sheet
+
+
+def generate(out_dir, args):
+    '''
+    Generate the requested panels. Returns the batch manifest entries
+    (ws_1, ws_2, samplesheet) of the generated worksheets.
+    '''
+    rng = random.Random(args.seed)
+    out_dir = os.path.abspath(out_dir)
+    entries = []
+    if 'TSHC' in args.panels:
+        entries.append(tshc_pair(out_dir, '000001', '000002', args, rng) + ('-',))
+    if 'TSMP' in args.panels:
+        ws_1, sample_sheet = ho_worksheet(out_dir, 'TSMP', '000003', args, rng)
+        entries.append((ws_1, '-', sample_sheet))
+    if 'CLL' in args.panels:
+        ws_1, sample_sheet = ho_worksheet(out_dir, 'CLL', '000004', args, rng)
+        entries.append((ws_1, '-', sample_sheet))
+
+    with open(os.path.join(out_dir, 'manifest.tsv'), 'w') as file:
+        file.write('# ws_1\tws_2\tsamplesheet\tout_dir\n')
+        for entry in entries:
+            file.write('\t'.join(entry) + '\n')
+    return entries
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Generate synthetic pipeline output (TSHC pair, TSMP and CLL worksheets)')
+    parser.add_argument('out_dir', help='Directory to write the worksheets to')
+    parser.add_argument('-panels', '--panels', nargs='+', default=['TSHC', 'TSMP', 'CLL'],
+                        choices=['TSHC', 'TSMP', 'CLL'], help='Panels to generate')
+    parser.add_argument('-tshc_samples', '--tshc_samples', type=int, default=24,
+                        help='Samples per TSHC worksheet (2 VCF files each)')
+    parser.add_argument('-ho_samples', '--ho_samples', type=int, default=24,
+                        help='Patient samples per TSMP/CLL worksheet (plus a negative)')
+    parser.add_argument('-genes', '--genes', type=int, default=50,
+                        help='Coverage-gene rows per TSMP/CLL sample')
+    parser.add_argument('-exons', '--exons', type=int, default=500,
+                        help='Coverage-details rows per TSMP/CLL sample')
+    parser.add_argument('-variants', '--variants', type=int, default=300,
+                        help='Variants-all-data rows per sample workbook')
+    parser.add_argument('-extra_columns', '--extra_columns', type=int, default=20,
+                        help='Filler columns added to the wide sheets (Hyb-QC, variants)')
+    parser.add_argument('-vcf_records', '--vcf_records', type=int, default=1000,
+                        help='Records per VCF')
+    parser.add_argument('-seed', '--seed', type=int, default=1, help='Random seed')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    entries = generate(args.out_dir, args)
+    print(f'Generated {len(entries)} quality check inputs, manifest: '
+          f'{os.path.join(os.path.abspath(args.out_dir), "manifest.tsv")}')
@@ -0,0 +1,239 @@
+'''
+Benchmark suite for the quality checks. Each tshc_*/ho_* check and the end-to-end
+tshc_main/ho_main are timed on worksheets written by generate_worksheets.py. Every
+benchmark runs in its own process so peak RSS is measured per benchmark, and the
+workbook cache is cleared before each repeat so excel parsing is included.
+
+Results (wall time, CPU time and peak RSS) are compared against a stored
+baseline; a benchmark slower or larger than the baseline by more than the tolerance
+is reported as a regression (exit status 1).
+'''
+import os
+import io
+import re
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import statistics
+import subprocess
+import contextlib
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+# wall time differences below this are treated as noise when comparing to the baseline
+MIN_SECONDS = 0.05
+DEFAULT_BASELINE = os.path.join(repo_dir, 'benchmarks', 'baseline.json')
+
+
+def read_manifest(fixtures):
+    '''
+    Worksheets written by generate_worksheets.py, keyed on panel
+    '''
+    import quality_check as qc
+    worksheets = {}
+    for entry in qc.read_batch_manifest(os.path.join(fixtures, 'manifest.tsv')):
+        panel = re.search(qc.panel_regex, entry['ws_1']).group(1)
+        worksheets[panel] = entry
+    return worksheets
+
+
+def tshc_benchmarks(entry, out_dir):
+    '''
+    (name, setup) for each TSHC benchmark. setup returns the function to time.
+    '''
+    import quality_check as qc
+    from check_results import CHECK_COLUMNS
+    ws_1, ws_2 = entry['ws_1'], entry['ws_2']
+
+    def check(function, input_index):
+        def setup():
+            inputs = qc.tshc_get_inputs(ws_1, ws_2)
+            return lambda: function(inputs[input_index], qc.pd.DataFrame(columns=CHECK_COLUMNS))
+        return setup
+
+    def run_details():
+        inputs = qc.tshc_get_inputs(ws_1, ws_2)
+        run_details_df = qc.pd.DataFrame(columns=[
+            'Worksheet', 'Pipeline version', 'Experiment name', 'Bed files', 'AB threshold'])
+        return lambda: qc.tshc_run_details(inputs[8], inputs[0], run_details_df)
+
+    return [
+        ('tshc_get_inputs', lambda: lambda: qc.tshc_get_inputs(ws_1, ws_2)),
+        ('tshc_results_excel_check', check(qc.tshc_results_excel_check, 0)),
+        ('tshc_neg_excel_check', check(qc.tshc_neg_excel_check, 2)),
+        ('tshc_fastq_bam_check', check(qc.tshc_fastq_bam_check, 3)),
+        ('tshc_kinship_check', check(qc.tshc_kinship_check, 5)),
+        ('tshc_vcf_dir_check', check(qc.tshc_vcf_dir_check, 6)),
+        ('tshc_run_details', run_details),
+        ('tshc_main', lambda: lambda: qc.tshc_main(ws_1, ws_2, out_dir))
+    ]
+
+
+def ho_benchmarks(panel, entry, out_dir):
+    '''
+    (name, setup) for each TSMP/CLL benchmark. setup returns the function to time.
+    '''
+    import quality_check as qc
+    from check_results import CHECK_COLUMNS
+    ws_1, sample_sheet = entry['ws_1'], entry['sample_sheet']
+    gene_cov_thres = {'TSMP': 200, 'CLL': 300}[panel]
+
+    def check(function, *args):
+        def setup():
+            ho_inp = qc.ho_sort_inputs(panel, ws_1, sample_sheet)
+            return lambda: function(ho_inp, qc.pd.DataFrame(columns=CHECK_COLUMNS), *args)
+        return setup
+
+    def inputs_only(function):
+        def setup():
+            ho_inp = qc.ho_sort_inputs(panel, ws_1, sample_sheet)
+            return lambda: function(ho_inp)
+        return setup
+
+    return [
+        ('ho_sort_inputs', lambda: lambda: qc.ho_sort_inputs(panel, ws_1, sample_sheet)),
+        ('ho_run_details', inputs_only(qc.ho_run_details)),
+        ('ho_vcf_check', check(qc.ho_vcf_check)),
+        ('ho_neg_checks', check(qc.ho_neg_checks)),
+        ('ho_neg_summary_table', inputs_only(qc.ho_neg_summary_table)),
+        ('ho_verifybamid_check', check(qc.ho_verifybamid_check)),
+        ('ho_sry_check', check(qc.ho_sry_check)),
+        ('ho_flt3_check', check(qc.ho_flt3_check)),
+        ('ho_coverage_check', check(qc.ho_coverage_check, gene_cov_thres)),
+        ('ho_main', lambda: lambda: qc.ho_main(panel, ws_1, sample_sheet, out_dir))
+    ]
+
+
+def benchmark_list(fixtures, out_dir):
+    '''
+    All benchmarks for the generated worksheets as {'<panel>/<function>': setup}
+    '''
+    benchmarks = {}
+    for panel, entry in read_manifest(fixtures).items():
+        if panel == 'TSHC':
+            panel_benchmarks = tshc_benchmarks(entry, out_dir)
+        else:
+            panel_benchmarks = ho_benchmarks(panel, entry, out_dir)
+        for name, setup in panel_benchmarks:
+            benchmarks[f'{panel}/{name}'] = setup
+    return benchmarks
+
+
+def run_one(fixtures, name, repeat):
+    '''
+    Run a single benchmark in this process. Returns wall and CPU times of each repeat
+    and the peak RSS (MB) of the process.
+    '''
+    from workbook_cache import workbook_cache
+    with tempfile.TemporaryDirectory() as out_dir:
+        setup = benchmark_list(fixtures, out_dir)[name]
+        function = setup()
+        wall, cpu = [], []
+        for _ in range(repeat):
+            workbook_cache.clear()
+            start_wall, start_cpu = time.perf_counter(), time.process_time()
+            # reports print where they are saved
+            with contextlib.redirect_stdout(io.StringIO()):
+                function()
+            wall.append(time.perf_counter() - start_wall)
+            cpu.append(time.process_time() - start_cpu)
+    # ru_maxrss is in KB on linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {'wall': wall, 'cpu': cpu, 'peak_rss_mb': round(peak_rss, 1)}
+
+
+def run_all(fixtures, repeat, names=None):
+    '''
+    Run each benchmark in a separate process. Returns {name: summary}.
+    '''
+    results = {}
+    for name in benchmark_list(fixtures, None):
+        if names and not any(name.startswith(prefix) or name.endswith(prefix) for prefix in names):
+            continue
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), fixtures, '-single', name,
+             '-repeat', str(repeat)],
+            check=True, capture_output=True, text=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        results[name] = {
+            'wall_s': round(statistics.median(run['wall']), 4),
+            'wall_min_s': round(min(run['wall']), 4),
+            'cpu_s': round(statistics.median(run['cpu']), 4),
+            'peak_rss_mb': run['peak_rss_mb']
+        }
+        print(f"{name:<32}{results[name]['wall_s']:>10.4f}s{results[name]['cpu_s']:>10.4f}s"
+              f"{results[name]['peak_rss_mb']:>10.1f} MB", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''
+    List of regressions: benchmarks slower (fastest repeat, which is least affected by
+    other load on the machine) or using more memory (peak RSS) than the baseline by more
+    than the tolerance (a fraction)
+    '''
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if (result['wall_min_s'] > base['wall_min_s'] * (1 + tolerance) and
+                result['wall_min_s'] - base['wall_min_s'] > MIN_SECONDS):
+            regressions.append(f"{name}: wall time {result['wall_min_s']}s "
+                               f"(baseline {base['wall_min_s']}s)")
+        if result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak RSS {result['peak_rss_mb']} MB (baseline {base['peak_rss_mb']} MB)")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Time each quality check on worksheets from generate_worksheets.py')
+    parser.add_argument('fixtures', help='Output directory of generate_worksheets.py')
+    parser.add_argument('-repeat', '--repeat', type=int, default=3,
+                        help='Times each benchmark is run (the median is reported)')
+    parser.add_argument('-only', '--only', nargs='+',
+                        help='Only run benchmarks matching these names (e.g. TSHC/ or ho_main)')
+    parser.add_argument('-baseline', '--baseline', default=DEFAULT_BASELINE,
+                        help='Baseline results to compare against (json)')
+    parser.add_argument('-save_baseline', '--save_baseline', action='store_true',
+                        help='Save these results as the baseline')
+    parser.add_argument('-tolerance', '--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown/memory increase over the baseline (fraction)')
+    parser.add_argument('-out', '--out', help='Save the results (json)')
+    parser.add_argument('-single', '--single', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    fixtures = os.path.abspath(args.fixtures)
+    if args.single != None:
+        print(json.dumps(run_one(fixtures, args.single, args.repeat)))
+        sys.exit(0)
+
+    print(f"{'benchmark':<32}{'wall':>11}{'cpu':>11}{'peak RSS':>13}")
+    results = run_all(fixtures, args.repeat, args.only)
+
+    if args.out != None:
+        with open(args.out, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        print(f'{len(regressions)} regressions against {args.baseline}')
+        sys.exit(1 if regressions else 0)
+    else:
+        print(f'No baseline at {args.baseline} (use -save_baseline to create one)')
@@ -0,0 +1,150 @@
+from lazy_import import LazyModule
+
+pd = LazyModule('pandas')
+
+
+CHECK_COLUMNS = ['Worksheet', 'Check', 'Description', 'Result']
+
+
+class CheckResult:
+    '''
+    A single row of a quality check table (a PASS/FAIL result for one check)
+    '''
+    __slots__ = ('worksheet', 'check', 'description', 'result')
+
+    def __init__(self, check, description, result, worksheet):
+        self.check = check
+        self.description = description
+        self.result = result
+        self.worksheet = worksheet
+
+    def as_row(self):
+        '''
+        Values in the order of CHECK_COLUMNS
+        '''
+        return (self.worksheet, self.check, self.description, self.result)
+
+
+class RowCollector:
+    '''
+    Collects table rows (dicts, CheckResult records or DataFrames) and builds the
+    DataFrame once when all rows have been added, rather than copying a DataFrame for
+    every row added (DataFrame.append is quadratic and no longer exists in pandas 2).
+    '''
+
+    def __init__(self, columns=CHECK_COLUMNS):
+        self.columns = list(columns)
+        self.parts = []
+        self.rows = []
+
+    def add(self, row):
+        '''
+        Add a dict keyed on column name (missing columns are left empty) or a CheckResult
+        '''
+        if isinstance(row, CheckResult):
+            self.rows.append(row.as_row())
+        else:
+            self.rows.append(tuple(row.get(col) for col in self.columns))
+
+    def add_result(self, check, description, result, worksheet):
+        '''
+        Add a check result row
+        '''
+        self.add(CheckResult(check, description, result, worksheet))
+
+    def add_frame(self, frame):
+        '''
+        Add all rows of a DataFrame (columns not in the collector are kept, as with concat)
+        '''
+        self._flush()
+        self.parts.append(frame)
+
+    def _flush(self):
+        if self.rows:
+            self.parts.append(pd.DataFrame(self.rows, columns=self.columns))
+            self.rows = []
+
+    def __len__(self):
+        return len(self.rows) + sum(len(part) for part in self.parts)
+
+    def frame(self, sort=False):
+        '''
+        Build the DataFrame of all rows added (in the order they were added)
+        '''
+        self._flush()
+        if not self.parts:
+            return pd.DataFrame(columns=self.columns)
+        if len(self.parts) == 1:
+            return self.parts[0].reset_index(drop=True)
+        return pd.concat(self.parts, ignore_index=True, sort=sort)
+
+
+def add_results(check_df, results):
+    '''
+    Return check_df with the CheckResult records (or row dicts) added, using a single
+    concat for all rows
+    '''
+    collector = RowCollector(check_df.columns)
+    for result in results:
+        collector.add(result)
+    if check_df.empty:
+        return collector.frame()
+    return pd.concat([check_df, collector.frame()], ignore_index=True)
+
+
+def results_from_frame(check_df, slots=()):
+    '''
+    CheckResult records for each row of a check table. The placeholders of the HTML
+    report (slots, replaced by detail tables) are removed from the descriptions.
+    '''
+    results = []
+    for row in check_df.to_dict('records'):
+        description = row['Description']
+        for slot in slots:
+            description = description.replace(slot, '').rstrip()
+        results.append(CheckResult(row['Check'], description, row['Result'], row['Worksheet']))
+    return results
+
+
+class QCResult:
+    '''
+    Outcome of the quality checks for a worksheet (or TSHC worksheet pair)
+
+    panel        - TSHC, TSMP or CLL
+    worksheets   - worksheet numbers checked
+    report_paths - paths the HTML report was saved to
+    checks       - CheckResult records, in report order
+    run_details  - DataFrame of the run details table
+    details      - detail tables behind the checks (e.g. exon fails), DataFrames keyed on name
+    '''
+    __slots__ = ('panel', 'worksheets', 'report_paths', 'checks', 'run_details', 'details')
+
+    def __init__(self, panel, worksheets, report_paths, checks, run_details, details=None):
+        self.panel = panel
+        self.worksheets = list(worksheets)
+        self.report_paths = list(report_paths)
+        self.checks = list(checks)
+        self.run_details = run_details
+        self.details = dict(details or {})
+
+    @property
+    def failed(self):
+        '''
+        Checks which did not PASS
+        '''
+        return [check for check in self.checks if check.result != 'PASS']
+
+    @property
+    def passed(self):
+        return not self.failed
+
+    def as_dict(self):
+        return {
+            'panel': self.panel,
+            'worksheets': self.worksheets,
+            'report_paths': self.report_paths,
+            'passed': self.passed,
+            'checks': [dict(zip(CHECK_COLUMNS, check.as_row())) for check in self.checks],
+            'run_details': self.run_details.to_dict('records'),
+            'details': {name: df.to_dict('records') for name, df in self.details.items()}
+        }
@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from workbook_cache import read_sheet
+import profiler
+
+
+class CheckUnit:
+    '''
+    A quality check registered with the scheduler.
+
+    name    - unique name of the check within a report
+    run     - function (no arguments) which runs the check and returns its result
+    sheets  - (path, sheet_name, columns) workbook sheets read by the check
+    depends - names of other check units which must complete first
+    '''
+
+    def __init__(self, name, run, sheets=(), depends=()):
+        self.name = name
+        self.run = run
+        self.sheets = list(sheets)
+        self.depends = list(depends)
+
+
+def load_sheet(path, sheet_name, columns):
+    '''
+    Load a sheet into the shared workbook cache ahead of the checks which read it.
+    Errors (e.g. a missing sheet) are left for the check itself to raise.
+    '''
+    try:
+        with profiler.stage('load_sheets'):
+            read_sheet(path, sheet_name, columns)
+    except Exception:
+        pass
+
+
+def run_unit(unit):
+    '''
+    Run a check unit (recorded as a stage of the run profile)
+    '''
+    with profiler.stage(unit.name):
+        return unit.run()
+
+
+def run_checks(units, jobs=1):
+    '''
+    Run the registered check units and return a dict of results keyed on unit name, in
+    the order the units were registered (which determines the order of report tables).
+
+    With jobs > 1 the checks and their inputs form a dependency graph: each distinct
+    sheet is loaded once as its own task, and a check is started as soon as the sheets
+    it reads and the checks it depends on are complete. Independent checks run
+    concurrently on a pool of jobs threads. With jobs == 1 the checks run serially in
+    registration order.
+    '''
+    names = [unit.name for unit in units]
+    if len(set(names)) != len(names):
+        raise Exception('Check names registered with the scheduler must be unique.')
+
+    if jobs <= 1:
+        return {unit.name: run_unit(unit) for unit in units}
+
+    # build the task graph: sheet loads (shared between checks) and checks
+    tasks = {}
+    for unit in units:
+        load_tasks = []
+        for path, sheet_name, columns in unit.sheets:
+            load_name = ('load', path, sheet_name, tuple(columns or ()))
+            if load_name not in tasks:
+                tasks[load_name] = (
+                    lambda sheet=(path, sheet_name, columns): load_sheet(*sheet), [])
+            load_tasks.append(load_name)
+        tasks[unit.name] = (lambda unit=unit: run_unit(unit), load_tasks + unit.depends)
+
+    for name, (_, depends) in tasks.items():
+        for depend in depends:
+            if depend not in tasks:
+                raise Exception(f'Check {name} depends on unknown check {depend}')
+
+    results = {}
+    pending = dict(tasks)
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            ready = [name for name, (_, depends) in pending.items()
+                     if all(depend in results for depend in depends)]
+            for name in ready:
+                running[executor.submit(pending.pop(name)[0])] = name
+            if not running:
+                raise Exception(f'Check dependencies cannot be resolved: {list(pending)}')
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                results[name] = future.result()
+
+    return {name: results[name] for name in names}
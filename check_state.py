@@ -0,0 +1,155 @@
+import os
+import pickle
+import hashlib
+from stat import S_ISDIR
+from inventory import dir_inventory, registered_stat
+from lazy_import import LazyModule
+
+pd = LazyModule('pandas')
+
+
+STATE_VERSION = 4
+
+
+def file_hash(path):
+    '''
+    blake2b hash of a file's content
+    '''
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 ** 2), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def tree_listing(path):
+    '''
+    (relative path, size, mtime) of every entry in a directory and, recursively, its
+    sub directories (symbolic links to directories are not followed, as os.walk)
+    '''
+    listing = []
+    pending = [('', dir_inventory(path))]
+    while pending:
+        prefix, inventory = pending.pop()
+        for name, entry_stat in inventory.stats.items():
+            listing.append((prefix + name, entry_stat.st_size, entry_stat.st_mtime_ns))
+            sub_dir = inventory.join(name)
+            if S_ISDIR(entry_stat.st_mode) and not os.path.islink(sub_dir):
+                pending.append((prefix + name + '/', dir_inventory(sub_dir)))
+    return tuple(sorted(listing))
+
+
+def fingerprint(path, content_hash=False):
+    '''
+    Fingerprint of a check input: (path, size, mtime[, hash]) for a file, the
+    fingerprint of every entry under a directory (tree_listing, so a change to a file in
+    a sub directory of e.g. -fastq_dir is seen) and None for a path which does not exist.
+    The stat results of the run's directory inventories (inventory.py) are used for
+    directories and the files in them which have been scanned.
+    '''
+    if path is None:
+        return (path, None)
+    stat = registered_stat(path)
+    if stat == None and not os.path.exists(path):
+        return (path, None)
+    if (stat == None and os.path.isdir(path)) or (stat != None and S_ISDIR(stat.st_mode)):
+        return (os.path.abspath(path), tree_listing(path))
+
+    if stat == None:
+        stat = os.stat(path)
+    file_print = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if content_hash:
+        file_print += (file_hash(path),)
+    return file_print
+
+
+class CheckState:
+    '''
+    Stored check results used to re-evaluate a report incrementally.
+
+    Each check is run through CheckState.run with the input files/directories it
+    reads. The fingerprint of those inputs and the check result are saved alongside
+    the report (<report>.state.pkl); on the next run a check whose inputs and
+    parameters are unchanged returns the stored result instead of being recomputed.
+    A CheckState without a state_path runs every check and stores nothing.
+    '''
+
+    def __init__(self, state_path=None, content_hash=False):
+        self.state_path = state_path
+        self.content_hash = content_hash
+        self.previous = {}
+        self.current = {}
+        self.reused = []
+        self.recomputed = []
+
+        if state_path != None and os.path.exists(state_path):
+            try:
+                with open(state_path, 'rb') as file:
+                    state = pickle.load(file)
+            except Exception:
+                state = {}
+            # results are only re-used from the same state format and pandas version
+            if state.get('version') == (STATE_VERSION, pd.__version__):
+                self.previous = state['checks']
+
+    def run(self, name, inputs, params, check):
+        '''
+        Return the result of check() (a function with no arguments), re-using the
+        stored result if the fingerprints of inputs and params match the previous run.
+        params must have a stable repr (e.g. paths, thresholds and the ho_inp dict).
+        '''
+        if self.state_path == None:
+            return check()
+
+        fingerprints = [fingerprint(path, self.content_hash) for path in inputs]
+        key = (repr(params), fingerprints)
+        stored = self.previous.get(name)
+
+        if stored != None and stored['key'] == key:
+            result = stored['result']
+            self.reused.append(name)
+        else:
+            result = check()
+            self.recomputed.append(name)
+
+        self.current[name] = {'key': key, 'result': result}
+        return result
+
+    def run_check(self, check, inputs, first_arg, check_df, *args):
+        '''
+        Run a check function of the form check(first_arg, check_df, *args) which adds
+        its rows to check_df and returns check_df (or a list/tuple starting with it).
+        The check is given an empty check_df so only its own rows are stored; these are
+        then added to check_df and the return value is rebuilt in the same form.
+        Checks run on a single input file (first_arg) are stored per input.
+        '''
+        name = check.__name__
+        if isinstance(first_arg, str):
+            name = f'{name}:{first_arg}'
+        empty_df = check_df.iloc[0:0]
+        result = self.run(name, inputs, (first_arg,) + args,
+                          lambda: check(first_arg, empty_df, *args))
+
+        if isinstance(result, (list, tuple)):
+            check_rows, extra = result[0], list(result[1:])
+        else:
+            check_rows, extra = result, None
+
+        check_df = pd.concat([check_df, check_rows], ignore_index=True)
+        if extra == None:
+            return check_df
+        return type(result)([check_df] + extra)
+
+    def save(self):
+        '''
+        Save the fingerprints and results of the checks run in this session
+        '''
+        if self.state_path == None:
+            return
+        state = {'version': (STATE_VERSION, pd.__version__), 'checks': self.current}
+        tmp_path = f'{self.state_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(state, file)
+        os.replace(tmp_path, self.state_path)
+        print(f'Incremental checks: {len(self.reused)} re-used, '
+              f'{len(self.recomputed)} recomputed')
@@ -0,0 +1,93 @@
+// Detail tables embedded in the report as gzip compressed, base64 encoded JSON
+// (see html_template.render_compact_table). Rows are decompressed when the modal holding
+// the table is first opened and rendered a page at a time. No external scripts are
+// used so the report can be viewed offline.
+(function () {
+    function decode(text) {
+        var bytes = Uint8Array.from(atob(text.trim()), function (c) { return c.charCodeAt(0); });
+        var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+        return new Response(stream).text().then(JSON.parse);
+    }
+
+    function cell(tag, value) {
+        var element = document.createElement(tag);
+        element.textContent = value === null ? '' : value;
+        return element;
+    }
+
+    function renderPage(container, table, page) {
+        var pageSize = parseInt(container.dataset.pageSize, 10);
+        var numPages = Math.max(1, Math.ceil(table.data.length / pageSize));
+        page = Math.min(Math.max(page, 0), numPages - 1);
+        var start = page * pageSize;
+        var end = Math.min(start + pageSize, table.data.length);
+
+        var html = document.createElement('table');
+        html.id = container.dataset.tableId;
+        html.className = 'table table-striped';
+        var head = html.createTHead().insertRow();
+        table.columns.forEach(function (column) { head.appendChild(cell('th', column)); });
+        var body = document.createElement('tbody');
+        table.data.slice(start, end).forEach(function (values) {
+            var row = body.insertRow();
+            values.forEach(function (value) { row.appendChild(cell('td', value)); });
+        });
+        html.appendChild(body);
+
+        var pager = document.createElement('div');
+        [['Previous', page - 1, page === 0], ['Next', page + 1, page === numPages - 1]].forEach(
+            function (button_info) {
+                var button = cell('button', button_info[0]);
+                button.type = 'button';
+                button.className = 'btn btn-default btn-sm';
+                button.disabled = button_info[2];
+                button.addEventListener('click', function () {
+                    renderPage(container, table, button_info[1]);
+                });
+                pager.appendChild(button);
+            });
+        pager.appendChild(cell('span', ' Rows ' + (start + 1) + '-' + end + ' of ' + table.data.length));
+
+        var rows = container.querySelector('.compact_table_rows');
+        rows.replaceChildren(pager, html);
+    }
+
+    function load(container) {
+        if (container.dataset.loaded) {
+            return;
+        }
+        container.dataset.loaded = 'true';
+        var status = container.querySelector('.compact_table_status');
+        if (typeof DecompressionStream === 'undefined') {
+            status.textContent = 'The rows of this table cannot be shown in this browser ' +
+                '(DecompressionStream is not supported).';
+            return;
+        }
+        status.textContent = 'Loading rows...';
+        decode(container.querySelector('.compact_table_data').textContent).then(function (table) {
+            status.textContent = '';
+            renderPage(container, table, 0);
+        }).catch(function (error) {
+            status.textContent = 'The rows of this table could not be loaded: ' + error;
+        });
+    }
+
+    function init() {
+        document.querySelectorAll('.compact_table').forEach(function (container) {
+            var modal = container.closest('.modal');
+            if (modal === null) {
+                load(container);
+                return;
+            }
+            document.querySelectorAll('[data-target="#' + modal.id + '"]').forEach(function (button) {
+                button.addEventListener('click', function () { load(container); });
+            });
+        });
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
@@ -0,0 +1,95 @@
+'''
+Independent read counts of each sample's FASTQ files, used to verify the read counts
+reported in the pipeline's fastq-bam-check workbook. FASTQs are decompressed in large
+blocks and the newlines of each block counted with bytes.count (a C level scan of the
+block, no per-line Python work); a FASTQ record is 4 lines. Files are counted
+concurrently on a bounded pool of threads (decompression releases the GIL).
+'''
+import os
+import gzip
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+
+BLOCK_SIZE = 16 * 1024 ** 2
+FASTQ_SUFFIXES = ('.fastq.gz', '.fq.gz', '.fastq', '.fq')
+
+
+def count_fastq_reads(path, block_size=BLOCK_SIZE):
+    '''
+    Number of reads in a FASTQ (gzip compressed or plain). A final line without a
+    newline is counted.
+    '''
+    opener = gzip.open if path.endswith('.gz') else open
+    lines = 0
+    last = b'\n'
+    with opener(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return lines // 4
+
+
+def find_sample_files(dirs, samples, suffixes):
+    '''
+    Files of each sample with one of suffixes found in dirs (searched recursively), as a
+    dict of sorted paths keyed on sample. A file belongs to a sample if its name is the
+    sample name followed by '_' or '.' (e.g. <sample>_L001_R1_001.fastq.gz), so sample
+    S1 does not match the files of S10.
+    '''
+    files = {sample: [] for sample in samples}
+    prefixes = {}
+    for sample in samples:
+        for separator in ('_', '.'):
+            prefixes[sample + separator] = sample
+    for search_dir in dirs:
+        for root, _, names in os.walk(search_dir):
+            for name in names:
+                if not name.endswith(suffixes):
+                    continue
+                # the longest matching sample name (sample names may prefix each other)
+                matches = [prefix for prefix in prefixes if name.startswith(prefix)]
+                if matches:
+                    sample = prefixes[max(matches, key=len)]
+                    files[sample].append(os.path.join(root, name))
+    return {sample: sorted(paths) for sample, paths in files.items()}
+
+
+def find_fastqs(fastq_dirs, samples):
+    '''
+    FASTQ files of each sample found in fastq_dirs (find_sample_files)
+    '''
+    return find_sample_files(fastq_dirs, samples, FASTQ_SUFFIXES)
+
+
+def count_sample_reads(fastqs, jobs=1):
+    '''
+    Reads in all FASTQ files (every lane and read) of each sample, counted on a pool of
+    jobs threads. fastqs is a dict of paths keyed on sample (find_fastqs); returns a
+    dict of read counts keyed on sample (None for samples without FASTQs, or the error
+    message if a FASTQ could not be read).
+    '''
+    paths = [path for sample_paths in fastqs.values() for path in sample_paths]
+    counts = {}
+    if paths:
+        with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(paths)))) as executor:
+            futures = {path: executor.submit(count_fastq_reads, path) for path in paths}
+            for path, future in futures.items():
+                try:
+                    counts[path] = future.result()
+                except (OSError, EOFError, zlib.error) as error:
+                    counts[path] = f'{type(error).__name__}: {error}'
+
+    sample_reads = {}
+    for sample, sample_paths in fastqs.items():
+        path_counts = [counts[path] for path in sample_paths]
+        errors = [count for count in path_counts if isinstance(count, str)]
+        if not sample_paths:
+            sample_reads[sample] = None
+        elif errors:
+            sample_reads[sample] = errors[0]
+        else:
+            sample_reads[sample] = sum(path_counts)
+    return sample_reads
@@ -0,0 +1,121 @@
+'''
+HTML report rendering. Templates are compiled once into literal text and slots, and
+rendered with a single join, so the cost of building a report scales with its size
+rather than with (number of substitutions x report size) as repeated re.sub calls
+over the whole document did. Slot values are inserted as they are (no regex
+replacement escapes are interpreted).
+'''
+import re
+import gzip
+import base64
+from functools import lru_cache
+
+
+# PASS/FAIL cell styling of the TSMP/CLL and TSHC reports
+HO_CELL_STYLES = {
+    '<td>PASS</td>': "<td style='color:green;'>PASS</td>",
+    '<td>FAIL</td>': "<td style='color:red;'>FAIL</td>"
+}
+TSHC_CELL_STYLES = {
+    '<td>PASS</td>': "<td class='PASS'>PASS</td>",
+    '<td>FAIL</td>': "<td class='FAIL'>FAIL</td>"
+}
+
+# detail tables with more rows than this are embedded as compressed JSON
+COMPACT_TABLE_ROWS = 200
+COMPACT_TABLE_PAGE_SIZE = 100
+
+
+@lru_cache(maxsize=256)
+def slot_pattern(slots):
+    '''
+    Compiled pattern matching any of the literal slot strings (longest first, so a slot
+    which is the prefix of another does not hide it)
+    '''
+    alternatives = sorted(set(slots), key=len, reverse=True)
+    return re.compile('(' + '|'.join(re.escape(slot) for slot in alternatives) + ')')
+
+
+class Template:
+    '''
+    A template compiled into literal text and slots. render() fills every slot in one
+    pass; text inserted into a slot is not searched for further slots.
+    '''
+
+    def __init__(self, text, slots):
+        self.slots = tuple(slots)
+        # split with a capture group: slot names are at the odd indices
+        self.parts = slot_pattern(self.slots).split(text)
+
+    def render(self, values):
+        '''
+        Fill each slot with its value (values is a dict keyed on slot)
+        '''
+        parts = list(self.parts)
+        parts[1::2] = [values[slot] for slot in parts[1::2]]
+        return ''.join(parts)
+
+
+@lru_cache(maxsize=None)
+def load_template(path, slots):
+    '''
+    Read and compile a template file (cached, template files are read once per process)
+    '''
+    with open(path) as file:
+        return Template(file.read(), slots)
+
+
+def substitute(text, replacements):
+    '''
+    Replace each literal key of replacements found in text with its value in a single
+    pass
+    '''
+    if not replacements:
+        return text
+    return slot_pattern(tuple(replacements)).sub(
+        lambda match: replacements[match.group(0)], text)
+
+
+def render_table(df, cells=None, slots=None, **to_html_args):
+    '''
+    Render a DataFrame as an HTML table (DataFrame.to_html arguments) and, in one pass
+    over the table, replace whole cells (cells: {'<td>PASS</td>': styled cell}) and
+    placeholders within cells (slots: {'_neg_calls_': sub table html})
+    '''
+    html = df.to_html(**to_html_args)
+    return substitute(html, {**(cells or {}), **(slots or {})})
+
+
+def compress_table(df):
+    '''
+    DataFrame rows as gzip compressed, base64 encoded JSON ({"columns": [...], "data":
+    [[...], ...]}). The gzip header has no timestamp so reports are reproducible.
+    '''
+    table = df.to_json(orient='split', index=False)
+    return base64.b64encode(gzip.compress(table.encode(), mtime=0)).decode('ascii')
+
+
+def render_compact_table(df, summary_df, rows_table_id, page_size=COMPACT_TABLE_PAGE_SIZE,
+                         **to_html_args):
+    '''
+    Render a large detail table as its summary table (rendered as render_table with
+    to_html_args) followed by the rows as compressed JSON (shown as table rows_table_id). The rows are decompressed
+    and shown a page at a time by compact_table.js when the modal holding the table is
+    opened, so opening the report does not build a DOM row for every detail row.
+    '''
+    summary_html = render_table(summary_df, **to_html_args)
+    return (f'<div class="compact_table" data-table-id="{rows_table_id}" data-page-size="{page_size}">'
+            f'{summary_html}'
+            f'<p class="compact_table_status">{len(df)} rows, shown when opened.</p>'
+            f'<div class="compact_table_rows"></div>'
+            f'<script type="application/octet-stream" class="compact_table_data">'
+            f'{compress_table(df)}</script></div>')
+
+
+@lru_cache(maxsize=None)
+def compact_table_script(path):
+    '''
+    Inline <script> for reports containing compact tables (compact_table.js)
+    '''
+    with open(path) as file:
+        return f'<script>\n{file.read()}</script>\n'
@@ -0,0 +1,136 @@
+'''
+Inventory of the directories of a worksheet's pipeline output. Each directory is listed
+once with os.scandir and the stat result of every entry kept, so locating the inputs,
+counting and sizing VCFs and checking their indexes cost one listing per directory (on
+NFS a listing and a stat per file are each a round trip to the server) rather than a
+listdir, glob or os.stat per check.
+
+Inventories of a run's worksheet directories are registered when its inputs are located
+(scan_worksheet) and shared by every check through dir_inventory. Scanning a directory
+again replaces its inventory, so each run sees the directories as they were when the
+run started.
+'''
+import os
+import stat
+import threading
+
+
+class DirInventory:
+    '''
+    Entries of a directory in listing order (as os.listdir), as a dict of stat results
+    keyed on name
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.stats = {}
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    self.stats[entry.name] = entry.stat()
+                except FileNotFoundError:
+                    # removed since the directory was listed
+                    continue
+
+    def __len__(self):
+        return len(self.stats)
+
+    def __contains__(self, name):
+        return name in self.stats
+
+    def __repr__(self):
+        return f'DirInventory({self.path!r})'
+
+    def join(self, name):
+        return os.path.join(self.path, name)
+
+    def is_file(self, name):
+        return name in self.stats and stat.S_ISREG(self.stats[name].st_mode)
+
+    def classify(self, classes):
+        '''
+        Names of the entries of each class, in listing order, in one pass over the
+        entries. classes is a dict keyed on class name of (include, exclude) compiled
+        patterns; a name is in a class if it matches include (re.search) and not exclude
+        (either may be None).
+        '''
+        classified = {name: [] for name in classes}
+        for entry_name in self.stats:
+            for class_name, (include, exclude) in classes.items():
+                if include != None and not include.search(entry_name):
+                    continue
+                if exclude != None and exclude.search(entry_name):
+                    continue
+                classified[class_name].append(entry_name)
+        return classified
+
+    def vcf_names(self):
+        '''
+        Names of the VCFs (.vcf and .vcf.gz files), sorted
+        '''
+        return sorted(name for name in self.stats
+                      if name.endswith(('.vcf', '.vcf.gz')) and self.is_file(name))
+
+
+_inventories = {}
+_lock = threading.Lock()
+
+
+def scan_dir(path):
+    '''
+    Inventory of a directory, listed now and registered for dir_inventory
+    '''
+    inventory = DirInventory(path)
+    with _lock:
+        _inventories[os.path.abspath(path)] = inventory
+    return inventory
+
+
+def registered_inventory(path):
+    '''
+    The registered inventory of a directory, None if it has not been scanned
+    '''
+    with _lock:
+        return _inventories.get(os.path.abspath(path))
+
+
+def dir_inventory(path):
+    '''
+    The registered inventory of a directory, or a new (unregistered) inventory if it has
+    not been scanned. Raises FileNotFoundError (as os.listdir) if the directory does not
+    exist.
+    '''
+    inventory = registered_inventory(path)
+    if inventory == None:
+        inventory = DirInventory(path)
+    return inventory
+
+
+def registered_stat(path):
+    '''
+    Stat result of a path from the registered inventory of its directory, None if its
+    directory has not been scanned or the path was not in it
+    '''
+    directory, name = os.path.split(os.path.abspath(path))
+    inventory = registered_inventory(directory)
+    if inventory == None:
+        return None
+    return inventory.stats.get(name)
+
+
+def scan_worksheet(ws_dir, sub_dirs):
+    '''
+    Scan a worksheet directory and those of sub_dirs (names) it contains, replacing any
+    inventories of them from a previous run. Returns the inventory of ws_dir and a dict
+    of the sub directory inventories (None for those which do not exist).
+    '''
+    root = scan_dir(ws_dir)
+    inventories = {}
+    for name in sub_dirs:
+        inventories[name] = None
+        if name in root.stats and stat.S_ISDIR(root.stats[name].st_mode):
+            inventories[name] = scan_dir(root.join(name))
+        else:
+            with _lock:
+                _inventories.pop(os.path.abspath(root.join(name)), None)
+    return root, inventories
@@ -0,0 +1,28 @@
+import importlib
+
+
+class LazyModule:
+    '''
+    Stand-in for a module which is imported on first attribute access.
+
+    pandas and numpy are only needed once checks are run, so the quality check modules
+    import them through this proxy: importing quality_check, --help and the file-level
+    paths do not pay their import cost.
+        pd = LazyModule('pandas')
+    '''
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<lazy module {self._name!r} ({state})>'
@@ -0,0 +1,281 @@
+'''
+Historical store of the QC metrics computed by each quality check run (-metrics_db).
+
+Per-sample metrics (e.g. PCT_TARGET_BASES_20X, %CONT, kinship, gene pct>200x) and
+worksheet control metrics (negative max depth and singletons) are saved to a SQLite
+database indexed by panel, worksheet, sample, metric and run date, so trends can be
+queried over years of runs:
+
+    $ python metrics_store.py metrics.db -panel TSMP -metric neg_max_depth -rolling 20
+    $ python metrics_store.py metrics.db -metric %CONT -above 2 -since 2026-07-01
+
+Levey-Jennings charts of the control metrics of a panel are added to the report.
+'''
+import re
+import math
+import html
+import sqlite3
+import datetime
+import argparse
+import statistics
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS metrics (
+    panel TEXT NOT NULL,
+    worksheet TEXT NOT NULL,
+    run_date TEXT NOT NULL,
+    sample TEXT,
+    feature TEXT,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metrics_panel_metric_date ON metrics (panel, metric, run_date);
+CREATE INDEX IF NOT EXISTS metrics_metric_date ON metrics (metric, run_date);
+CREATE INDEX IF NOT EXISTS metrics_worksheet ON metrics (panel, worksheet);
+CREATE INDEX IF NOT EXISTS metrics_sample ON metrics (sample, metric);
+'''
+
+# control metrics charted in the report for each panel: (metric, per-run aggregate)
+CHART_METRICS = {
+    'TSHC': [('neg_max_depth', 'max'), ('PCT_TARGET_BASES_20X', 'mean'), ('%CONT', 'max')],
+    'TSMP': [('neg_max_depth', 'max'), ('neg_singletons', 'max'), ('%CONT', 'max')],
+    'CLL': [('neg_max_depth', 'max'), ('neg_singletons', 'max'), ('%CONT', 'max')]
+}
+# number of previous runs shown in (and used for the control limits of) each chart
+CHART_RUNS = 30
+
+AGGREGATES = {'mean': 'AVG', 'max': 'MAX', 'min': 'MIN'}
+
+
+def sample_id(sample):
+    '''
+    D number of a sample name (the name itself if it does not contain one)
+    '''
+    d_number = re.search(r'D\d\d-\d{5,6}', str(sample))
+    return d_number.group(0) if d_number else str(sample)
+
+
+def run_date(experiment_name):
+    '''
+    Sequencing date (YYYY-MM-DD) from an experiment name (YYMMDD_<instrument>_...),
+    None if the experiment name does not start with a date
+    '''
+    date = re.match(r'(\d{2})(\d{2})(\d{2})_', str(experiment_name))
+    if date:
+        try:
+            return datetime.date(2000 + int(date.group(1)), int(date.group(2)),
+                                 int(date.group(3))).isoformat()
+        except ValueError:
+            pass
+    return None
+
+
+class MetricsStore:
+    '''
+    SQLite store of QC metrics. Each metric is a (worksheet, sample, feature, metric,
+    value) record of a panel's run; feature is the gene (gene coverage) or second sample
+    (kinship) where a metric is not per sample.
+    '''
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add_run(self, panel, date, records):
+        '''
+        Save the metric records of a run, replacing any previously stored for the
+        same panel and worksheets (e.g. a re-run of the quality checks). Values which
+        are not finite numbers (e.g. nan kinship) are not stored.
+        '''
+        rows = []
+        for worksheet, sample, feature, metric, value in records:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            if math.isfinite(value):
+                rows.append((panel, worksheet, date, sample, feature, metric, value))
+        worksheets = sorted({record[0] for record in records})
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM metrics WHERE panel = ? AND worksheet = ?',
+                [(panel, worksheet) for worksheet in worksheets])
+            self.connection.executemany(
+                'INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def run_values(self, metric, panel=None, aggregate='mean', since=None, until=None,
+                   limit=None, worksheets=None):
+        '''
+        (run_date, worksheet, value) of each run (oldest first), with the metric's
+        samples combined by aggregate (mean, max or min). limit returns the latest runs.
+        '''
+        query = (f'SELECT run_date, worksheet, {AGGREGATES[aggregate]}(value) FROM metrics '
+                 'WHERE metric = ?')
+        params = [metric]
+        query, params = self._filter(query, params, panel, since, until)
+        if worksheets != None:
+            query += f' AND worksheet IN ({", ".join("?" * len(worksheets))})'
+            params += list(worksheets)
+        query += ' GROUP BY run_date, worksheet ORDER BY run_date DESC, worksheet DESC'
+        if limit != None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        return self.connection.execute(query, params).fetchall()[::-1]
+
+    def sample_values(self, metric, panel=None, since=None, until=None, above=None,
+                      below=None, sample=None):
+        '''
+        (panel, run_date, worksheet, sample, feature, value) records of a metric, e.g.
+        all samples above 2% contamination since a date
+        '''
+        query = ('SELECT panel, run_date, worksheet, sample, feature, value FROM metrics '
+                 'WHERE metric = ?')
+        params = [metric]
+        query, params = self._filter(query, params, panel, since, until)
+        for condition, value in [('value > ?', above), ('value < ?', below), ('sample = ?', sample)]:
+            if value != None:
+                query += f' AND {condition}'
+                params.append(value)
+        query += ' ORDER BY run_date, worksheet, sample'
+        return self.connection.execute(query, params).fetchall()
+
+    @staticmethod
+    def _filter(query, params, panel, since, until):
+        for condition, value in [('panel = ?', panel), ('run_date >= ?', since),
+                                 ('run_date <= ?', until)]:
+            if value != None:
+                query += f' AND {condition}'
+                params.append(value)
+        return query, params
+
+    def metric_names(self):
+        '''
+        (panel, metric, number of values, first run date, last run date) of the stored metrics
+        '''
+        return self.connection.execute(
+            'SELECT panel, metric, COUNT(*), MIN(run_date), MAX(run_date) FROM metrics '
+            'GROUP BY panel, metric ORDER BY panel, metric').fetchall()
+
+    def charts_html(self, panel, worksheets, date):
+        '''
+        Collapsible Levey-Jennings charts of the panel's control metrics for the foot of
+        the report. The runs of worksheets (this report, run on date) follow the runs up
+        to that date and are highlighted; the control limits are set from the previous runs.
+        '''
+        charts = []
+        for metric, aggregate in CHART_METRICS.get(panel, []):
+            previous = self.run_values(metric, panel, aggregate, until=date,
+                                       limit=CHART_RUNS + len(worksheets))
+            previous = [run for run in previous if run[1] not in worksheets][-CHART_RUNS:]
+            current = self.run_values(metric, panel, aggregate, worksheets=worksheets)
+            charts.append(levey_jennings_svg(
+                f'{metric} ({aggregate} per run)', previous + current, worksheets))
+        return (f'<details id="metric_trends"><summary>{html.escape(panel)} QC metric trends '
+                f'(last {CHART_RUNS} runs)</summary>{"".join(charts)}</details>')
+
+
+def rolling_stats(values, window):
+    '''
+    Rolling (mean, SD) over the previous window values (inclusive) of each value
+    '''
+    stats = []
+    for i in range(len(values)):
+        previous = values[max(0, i - window + 1):i + 1]
+        sd = statistics.stdev(previous) if len(previous) > 1 else None
+        stats.append((statistics.fmean(previous), sd))
+    return stats
+
+
+def levey_jennings_svg(title, runs, worksheets, width=640, height=220):
+    '''
+    Inline SVG Levey-Jennings chart of (run_date, worksheet, value) runs, with the mean
+    and 2SD/3SD control limits of the runs not in worksheets
+    '''
+    history = [value for _, worksheet, value in runs if worksheet not in worksheets]
+    if len(history) < 2:
+        return (f'<p><b>{html.escape(title)}</b>: not enough previous runs for control '
+                f'limits ({len(history)} stored)</p>')
+    mean, sd = statistics.fmean(history), statistics.stdev(history)
+    values = [value for _, _, value in runs]
+    low = min(values + [mean - 3 * sd])
+    high = max(values + [mean + 3 * sd])
+    if high == low:
+        high, low = high + 1, low - 1
+    left, right, top, bottom = 60, 10, 25, 30
+
+    def x(i):
+        return left + (width - left - right) * (i + 0.5) / len(runs)
+
+    def y(value):
+        return top + (height - top - bottom) * (high - value) / (high - low)
+
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'class="levey_jennings" font-family="sans-serif" font-size="10">',
+             f'<text x="{left}" y="14" font-size="12" font-weight="bold">{html.escape(title)}</text>']
+    for label, value, colour, dash in [
+            ('+3SD', mean + 3 * sd, 'red', '4,3'), ('+2SD', mean + 2 * sd, 'orange', '4,3'),
+            ('mean', mean, 'green', ''), ('-2SD', mean - 2 * sd, 'orange', '4,3'),
+            ('-3SD', mean - 3 * sd, 'red', '4,3')]:
+        parts.append(f'<line x1="{left}" x2="{width - right}" y1="{y(value):.1f}" '
+                     f'y2="{y(value):.1f}" stroke="{colour}" stroke-dasharray="{dash}"/>'
+                     f'<text x="2" y="{y(value) + 3:.1f}">{label} {value:.3g}</text>')
+    parts.append('<polyline fill="none" stroke="#888" points="' + ' '.join(
+        f'{x(i):.1f},{y(value):.1f}' for i, value in enumerate(values)) + '"/>')
+    for i, (date, worksheet, value) in enumerate(runs):
+        deviation = abs(value - mean)
+        colour = 'red' if deviation > 3 * sd else 'orange' if deviation > 2 * sd else 'steelblue'
+        radius = 5 if worksheet in worksheets else 3
+        parts.append(f'<circle cx="{x(i):.1f}" cy="{y(value):.1f}" r="{radius}" fill="{colour}">'
+                     f'<title>{html.escape(worksheet)} {date}: {value:.4g}</title></circle>')
+    parts.append(f'<text x="{left}" y="{height - 8}">{html.escape(runs[0][0])}</text>'
+                 f'<text x="{width - right}" y="{height - 8}" text-anchor="end">'
+                 f'{html.escape(runs[-1][0])}</text></svg>')
+    return ''.join(parts)
+
+
+def print_rows(header, rows):
+    print('\t'.join(header))
+    for row in rows:
+        print('\t'.join('' if value is None else f'{value:.6g}' if isinstance(value, float)
+                        else str(value) for value in row))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Query the QC metrics stored by quality_check.py -metrics_db')
+    parser.add_argument('db', help='Metrics database (SQLite)')
+    parser.add_argument('-metric', '--metric',
+                        help='Metric to query e.g. neg_max_depth, %%CONT, PCT_TARGET_BASES_20X, Kinship, pct>200x (omit to list stored metrics)')
+    parser.add_argument('-panel', '--panel', help='TSHC, TSMP or CLL')
+    parser.add_argument('-since', '--since', help='First run date (YYYY-MM-DD)')
+    parser.add_argument('-until', '--until', help='Last run date (YYYY-MM-DD)')
+    parser.add_argument('-rolling', '--rolling', type=int, default=20,
+                        help='Runs in the rolling mean/SD of a trend query (default 20)')
+    parser.add_argument('-aggregate', '--aggregate', choices=sorted(AGGREGATES), default='mean',
+                        help='How the samples of a run are combined in a trend query (default mean)')
+    parser.add_argument('-above', '--above', type=float,
+                        help='List samples with a value above this (instead of the run trend)')
+    parser.add_argument('-below', '--below', type=float,
+                        help='List samples with a value below this (instead of the run trend)')
+    parser.add_argument('-sample', '--sample', help='List the values of this sample (D number)')
+    args = parser.parse_args()
+
+    store = MetricsStore(args.db)
+    if args.metric == None:
+        print_rows(['panel', 'metric', 'values', 'first_run', 'last_run'], store.metric_names())
+    elif args.above != None or args.below != None or args.sample != None:
+        print_rows(['panel', 'run_date', 'worksheet', 'sample', 'feature', 'value'],
+                   store.sample_values(args.metric, args.panel, args.since, args.until,
+                                       args.above, args.below, args.sample))
+    else:
+        runs = store.run_values(args.metric, args.panel, args.aggregate, args.since, args.until)
+        stats = rolling_stats([value for _, _, value in runs], args.rolling)
+        print_rows(['run_date', 'worksheet', args.aggregate, 'rolling_mean', 'rolling_sd'],
+                   [run + stat for run, stat in zip(runs, stats)])
+    store.close()
@@ -0,0 +1,139 @@
+'''
+Read depth of a BAM (e.g. the negative control) over the regions of a coverage BED,
+computed in one pass over the BAM's records. The regions are held in an interval index
+(per reference: regions sorted by start with the running maximum end, searched with
+bisect), and each aligned block of a read adds +1/-1 to a difference array of the
+regions it overlaps; the depth of each base is the cumulative sum of the array. As
+with samtools depth, unmapped, secondary, QC fail and duplicate reads are not counted
+and deletions/skips do not add depth.
+'''
+import struct
+from bisect import bisect_right
+from lazy_import import LazyModule
+from bam_counts import read_bam
+
+np = LazyModule('numpy')
+
+
+# unmapped, secondary, QC fail and duplicate
+DEPTH_EXCLUDE_FLAGS = 0x4 | 0x100 | 0x200 | 0x400
+# CIGAR operations which consume the reference: M, D, N, =, X (D and N add no depth)
+CIGAR_REF = {0: True, 2: False, 3: False, 7: True, 8: True}
+# refID, pos, l_read_name, (mapq, bin) n_cigar_op and flag of a record (after block_size)
+ALIGNMENT = struct.Struct('<iiB3xHH')
+
+
+def read_bed(path):
+    '''
+    Regions of a BED file as (chrom, start, end, name) tuples (0-based, end exclusive).
+    The name is the 4th column, or chrom:start-end if there is none.
+    '''
+    regions = []
+    with open(path) as file:
+        for line in file:
+            if not line.strip() or line.startswith(('#', 'track', 'browser')):
+                continue
+            fields = line.rstrip('\n').split('\t')
+            chrom, start, end = fields[0], int(fields[1]), int(fields[2])
+            name = fields[3] if len(fields) > 3 and fields[3] else f'{chrom}:{start + 1}-{end}'
+            regions.append((chrom, start, end, name))
+    if not regions:
+        raise Exception(f'No regions found in BED file: {path}')
+    return regions
+
+
+class IntervalIndex:
+    '''
+    Index of regions per reference for overlap queries. Regions of a reference are
+    sorted by start with the running maximum of their ends, so the regions overlapping
+    [start, end) are found by bisecting the starts and walking back until the running
+    maximum end is <= start.
+    '''
+
+    def __init__(self, regions):
+        self.chroms = {}
+        for i, (chrom, start, end, _) in enumerate(regions):
+            self.chroms.setdefault(chrom, []).append((start, end, i))
+        for chrom, chrom_regions in self.chroms.items():
+            chrom_regions.sort()
+            starts = [region[0] for region in chrom_regions]
+            max_ends = []
+            max_end = 0
+            for region in chrom_regions:
+                max_end = max(max_end, region[1])
+                max_ends.append(max_end)
+            self.chroms[chrom] = (starts, max_ends, chrom_regions)
+
+    def reference(self, name):
+        '''
+        Index of a BAM reference name (matching the BED chromosome with or without a chr
+        prefix), None if no regions are on the reference
+        '''
+        for chrom in [name, name[3:] if name.startswith('chr') else 'chr' + name]:
+            if chrom in self.chroms:
+                return self.chroms[chrom]
+        return None
+
+    @staticmethod
+    def overlapping(chrom_index, start, end):
+        '''
+        Regions (start, end, region number) of a reference overlapping [start, end)
+        '''
+        starts, max_ends, chrom_regions = chrom_index
+        i = bisect_right(starts, end - 1) - 1
+        while i >= 0 and max_ends[i] > start:
+            if chrom_regions[i][1] > start:
+                yield chrom_regions[i]
+            i -= 1
+
+
+def aligned_blocks(data, offset):
+    '''
+    Reference id and (start, end) blocks of a record which add depth (M, =
+    and X CIGAR operations). offset is the start of the record (its block_size).
+    '''
+    ref_id, pos, l_read_name, n_cigar_op, flag = ALIGNMENT.unpack_from(data, offset + 4)
+    if flag & DEPTH_EXCLUDE_FLAGS or ref_id < 0:
+        return ref_id, []
+    cigar = struct.unpack_from(f'<{n_cigar_op}I', data, offset + 36 + l_read_name)
+    blocks = []
+    for operation in cigar:
+        op, length = operation & 0xF, operation >> 4
+        if op in CIGAR_REF:
+            if CIGAR_REF[op]:
+                if blocks and blocks[-1][1] == pos:
+                    blocks[-1] = (blocks[-1][0], pos + length)
+                else:
+                    blocks.append((pos, pos + length))
+            pos += length
+    return ref_id, blocks
+
+
+def region_depths(bam_path, regions, threads=1):
+    '''
+    Max and mean depth of each region (read_bed) in a BAM, in one pass over its records.
+    Returns a list of (max depth, mean depth) in the order of regions.
+    '''
+    index = IntervalIndex(regions)
+    diffs = {}
+    records = read_bam(bam_path, threads)
+    references = [index.reference(name) for name in next(records)]
+    for data, offset in records:
+        ref_id, blocks = aligned_blocks(data, offset)
+        if not blocks or references[ref_id] == None:
+            continue
+        for block_start, block_end in blocks:
+            for start, end, i in index.overlapping(references[ref_id], block_start, block_end):
+                if i not in diffs:
+                    diffs[i] = [0] * (end - start + 1)
+                diffs[i][max(block_start, start) - start] += 1
+                diffs[i][min(block_end, end) - start] -= 1
+
+    depths = []
+    for i, (_, start, end, _) in enumerate(regions):
+        if i not in diffs or end <= start:
+            depths.append((0, 0.0))
+            continue
+        depth = np.cumsum(np.array(diffs[i][:-1], dtype=np.int64))
+        depths.append((int(depth.max()), float(depth.mean())))
+    return depths
@@ -0,0 +1,121 @@
+'''
+File-level pre-checks. These gates only list directories and stat files (no excel
+reports are opened and pandas is not imported) so a pipeline orchestrator can poll
+whether a worksheet's output is complete before the full quality check run is queued.
+'''
+import os
+import re
+import glob
+from check_results import CheckResult
+from samplesheet import read_samplesheet
+
+
+def pass_fail(passed):
+    return 'PASS' if passed else 'FAIL'
+
+
+def file_present_check(check, path, worksheet):
+    '''
+    PASS if path is an existing file
+    '''
+    present = path != None and os.path.isfile(path)
+    description = path if present else f'Not found: {path}'
+    return CheckResult(check, description, pass_fail(present), worksheet)
+
+
+def list_dir(path):
+    '''
+    Names in a directory ([] if the directory does not exist)
+    '''
+    try:
+        return os.listdir(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def negative_workbook(excel_dirs):
+    '''
+    Path to the negative sample excel report in any of excel_dirs (None if not present)
+    '''
+    for excel_dir in excel_dirs:
+        for name in sorted(list_dir(excel_dir)):
+            if re.search('Neg|NEG', name) and name.endswith('.xlsx'):
+                return os.path.join(excel_dir, name)
+    return None
+
+
+def samplesheet_sample_count(ss_path):
+    '''
+    Number of samples (rows with a Sample_ID) in the [Data] section of a W7/W10
+    samplesheet, counted as ho_vcf_check counts them
+    '''
+    return len(read_samplesheet(ss_path))
+
+
+def size_kb(size_in_bytes):
+    return str(round(size_in_bytes / 1024)) + ' KB'
+
+
+def tshc_precheck(panel, ws_1, ws_2, worksheets):
+    '''
+    TSHC pair gates: 48 VCFs and a command log per worksheet, the kinship report and the
+    negative sample excel report. worksheets are the worksheet numbers of ws_1 and ws_2.
+    '''
+    results = []
+    excel_dirs = []
+    for ws, worksheet in zip([ws_1, ws_2], worksheets):
+        vcf_dir = os.path.join(ws, f'vcfs_{panel}_{worksheet}')
+        num_vcfs = len(list_dir(vcf_dir))
+        results.append(CheckResult(
+            'VCF file count check', f'{num_vcfs} VCFs in {vcf_dir} (48 expected)',
+            pass_fail(num_vcfs == 48), worksheet))
+        results.append(file_present_check(
+            'Command log present', os.path.join(ws, f'{worksheet}.commandline_usage_logfile'),
+            worksheet))
+        excel_dirs.append(os.path.join(ws, f'excel_reports_{panel}_{worksheet}'))
+
+    pair = '_'.join(worksheets)
+    kin_xls = sorted(glob.glob(os.path.join(ws_1, '*king.xlsx')))
+    results.append(file_present_check(
+        'Kinship report present', kin_xls[0] if kin_xls else os.path.join(ws_1, '*king.xlsx'),
+        pair))
+    neg_xls = negative_workbook(excel_dirs)
+    results.append(file_present_check(
+        'Negative workbook present', neg_xls or ' or '.join(excel_dirs), pair))
+    return results
+
+
+def ho_precheck(panel, ws_1, worksheet, sample_sheet):
+    '''
+    TSMP/CLL gates: 2 VCFs per sample on the samplesheet (with the min and max size of
+    the compressed VCFs), the SRY excel report, the command log and the negative sample
+    excel report
+    '''
+    results = []
+    vcf_dir = os.path.join(ws_1, f'vcfs_{panel}_{worksheet}')
+    num_exp = samplesheet_sample_count(sample_sheet) * 2
+    vcf_sizes = {}
+    if os.path.isdir(vcf_dir):
+        with os.scandir(vcf_dir) as entries:
+            for entry in entries:
+                # as glob('*.vcf*'), hidden files are not matched
+                if '.vcf' in entry.name and not entry.name.startswith('.'):
+                    vcf_sizes[entry.name] = entry.stat().st_size
+    gz_sizes = [size for name, size in vcf_sizes.items() if name.endswith('.gz')]
+    description = f'{len(vcf_sizes)} VCFs in {vcf_dir} ({num_exp} expected)'
+    if gz_sizes:
+        description += f', min {size_kb(min(gz_sizes))}, max {size_kb(max(gz_sizes))}'
+    results.append(CheckResult(
+        'VCF count check', description, pass_fail(len(vcf_sizes) == num_exp), worksheet))
+
+    excel_dir = os.path.join(ws_1, f'excel_reports_{panel}_{worksheet}')
+    sry_xls = [name for name in sorted(list_dir(excel_dir)) if 'SRY' in name]
+    results.append(file_present_check(
+        'SRY check', os.path.join(excel_dir, sry_xls[0] if sry_xls else '*SRY*'), worksheet))
+    results.append(file_present_check(
+        'Command log present', os.path.join(ws_1, f'{worksheet}.commandline_usage_logfile'),
+        worksheet))
+    neg_xls = negative_workbook([excel_dir])
+    results.append(file_present_check(
+        'Negative workbook present', neg_xls or excel_dir, worksheet))
+    return results
@@ -0,0 +1,128 @@
+'''
+Read-ahead of a run's input files. Pipeline outputs are on a network share where each
+open and read waits on the server, and the checks read their inputs one at a time. Once
+the inputs of a run are located, the workbooks and command logs are read
+into memory concurrently on a bounded pool of threads; a check opening one of them
+waits only for that file (if it has not yet arrived) and reads it from memory, so the
+network waits overlap with parsing rather than adding to it.
+
+Files not prefetched, larger than the memory cap, or which could not be read are opened
+from disk as usual (so any error is raised where the check opens the file).
+'''
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from inventory import registered_stat
+
+
+PREFETCH_THREADS = 8
+# total bytes held in memory; files beyond the cap are read from disk by the checks
+PREFETCH_MAX_BYTES = 1024 ** 3
+
+
+def read_file(path):
+    '''
+    Content of a file as bytes
+    '''
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+class Prefetcher:
+    '''
+    Files read ahead into memory, keyed on absolute path. start() submits the files to
+    a pool of threads and returns immediately; open_input() returns a file object of the
+    content, waiting for its read to finish if needed. The buffers are held until
+    clear() (at the end of the run) so a file opened by several checks is read once.
+    '''
+
+    def __init__(self, threads=PREFETCH_THREADS, max_bytes=PREFETCH_MAX_BYTES):
+        self.threads = threads
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.executor = None
+        self.futures = {}
+        self.reserved_bytes = 0
+
+    def start(self, paths):
+        '''
+        Read the files of paths (in order, skipping any None) into memory in the
+        background, up to max_bytes in total
+        '''
+        with self.lock:
+            if self.executor == None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.threads, thread_name_prefix='prefetch')
+            for path in paths:
+                if path == None:
+                    continue
+                key = os.path.abspath(path)
+                if key in self.futures:
+                    continue
+                # sized from the run's directory inventory where scanned
+                stat = registered_stat(key)
+                try:
+                    size = stat.st_size if stat != None else os.path.getsize(key)
+                except OSError:
+                    continue
+                if self.reserved_bytes + size > self.max_bytes:
+                    continue
+                self.reserved_bytes += size
+                self.futures[key] = self.executor.submit(read_file, key)
+
+    def content(self, path):
+        '''
+        Prefetched content of a file, None if it was not prefetched or could not be read
+        '''
+        with self.lock:
+            future = self.futures.get(os.path.abspath(path))
+        if future == None:
+            return None
+        try:
+            return future.result()
+        except OSError:
+            return None
+
+    def open_input(self, path, mode='r', newline=None):
+        '''
+        Open a file for reading ('r' or 'rb'), from memory if it was prefetched
+        '''
+        data = self.content(path)
+        if data == None:
+            if 'b' in mode:
+                return open(path, mode)
+            return open(path, mode, newline=newline)
+        if 'b' in mode:
+            return io.BytesIO(data)
+        # decoded as open() would (locale encoding)
+        return io.TextIOWrapper(io.BytesIO(data), newline=newline)
+
+    def workbook(self, path):
+        '''
+        A workbook for zipfile/pandas: an in-memory file if prefetched, otherwise the path
+        '''
+        data = self.content(path)
+        return path if data == None else io.BytesIO(data)
+
+    def clear(self):
+        '''
+        Drop the prefetched files (waiting for reads in progress) and stop the pool
+        '''
+        with self.lock:
+            executor, self.executor = self.executor, None
+            self.futures = {}
+            self.reserved_bytes = 0
+        if executor != None:
+            executor.shutdown(wait=True)
+
+
+# read-ahead shared by all checks in this process
+prefetcher = Prefetcher()
+
+
+def open_input(path, mode='r', newline=None):
+    '''
+    Open an input file for reading through the shared read-ahead
+    '''
+    return prefetcher.open_input(path, mode, newline)
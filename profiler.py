@@ -0,0 +1,201 @@
+import os
+import re
+import html
+import json
+import time
+import pstats
+import cProfile
+import resource
+import threading
+from contextlib import contextmanager
+
+
+class RunProfile:
+    '''
+    Timing and resource use of each stage (check, input discovery, report rendering) of a
+    quality check run, recorded with -profile.
+
+    For each stage the wall time, CPU time (of the thread running the stage), and the
+    workbooks, sheets, rows and compressed bytes parsed from excel reports are recorded.
+    Stages may be nested ('<stage>/<sub stage>') and run concurrently in scheduler threads;
+    workbook reads are counted against the innermost stage of the thread reading them.
+    If cprofile_dir is set a cProfile dump is saved for each top level stage (calls of a
+    stage run more than once, e.g. sheet loads, are combined in a single dump).
+    '''
+
+    def __init__(self, html_table=False, cprofile_dir=None):
+        self.html_table = html_table
+        self.cprofile_dir = cprofile_dir
+        self.stages = {}
+        self.cprofiles = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.totals = self._new_stage('total')
+
+    @staticmethod
+    def _new_stage(name):
+        return {'name': name, 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'workbooks': set(),
+                'sheets_parsed': 0, 'rows_decoded': 0, 'bytes_read': 0}
+
+    def _stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    @contextmanager
+    def stage(self, name):
+        '''
+        Record the time and workbook reads of the code run within the context
+        '''
+        stack = self._stack()
+        full_name = '/'.join(stack + [name])
+        with self.lock:
+            stage = self.stages.setdefault(full_name, self._new_stage(full_name))
+        stack.append(name)
+
+        profile = None
+        if self.cprofile_dir != None and len(stack) == 1:
+            profile = cProfile.Profile()
+            profile.enable()
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - start_wall, time.thread_time() - start_cpu
+            stack.pop()
+            with self.lock:
+                stage['calls'] += 1
+                stage['wall_s'] += wall
+                stage['cpu_s'] += cpu
+            if profile != None:
+                profile.disable()
+                with self.lock:
+                    self.cprofiles.setdefault(full_name, []).append(profile)
+
+    def dump_cprofiles(self):
+        '''
+        Save the cProfile stats of each top level stage as <cprofile_dir>/<stage>.prof
+        '''
+        if self.cprofile_dir == None:
+            return
+        os.makedirs(self.cprofile_dir, exist_ok=True)
+        for name, profiles in self.cprofiles.items():
+            stats = pstats.Stats(*profiles)
+            file_name = re.sub(r'[^\w.-]+', '_', name).strip('_')
+            stats.dump_stats(os.path.join(self.cprofile_dir, file_name + '.prof'))
+
+    def record_sheet(self, path, rows, num_bytes):
+        '''
+        Count a sheet parsed from an excel report against the current stage
+        '''
+        stack = self._stack()
+        with self.lock:
+            stages = [self.totals]
+            if stack:
+                stages.append(self.stages['/'.join(stack)])
+            for stage in stages:
+                stage['workbooks'].add(os.path.abspath(path))
+                stage['sheets_parsed'] += 1
+                stage['rows_decoded'] += rows
+                stage['bytes_read'] += num_bytes
+
+    @staticmethod
+    def _summary(stage):
+        summary = dict(stage)
+        summary['workbooks_parsed'] = len(summary.pop('workbooks'))
+        summary['wall_s'] = round(summary['wall_s'], 4)
+        summary['cpu_s'] = round(summary['cpu_s'], 4)
+        return summary
+
+    def summary(self):
+        '''
+        Profile as a dict (JSON serialisable)
+        '''
+        with self.lock:
+            totals = self._summary(self.totals)
+            totals['wall_s'] = round(time.perf_counter() - self.start_wall, 4)
+            totals['cpu_s'] = round(time.process_time() - self.start_cpu, 4)
+            totals['calls'] = 1
+            # ru_maxrss is in KB on linux
+            totals['peak_rss_mb'] = round(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            return {'total': totals,
+                    'stages': [self._summary(stage) for stage in self.stages.values()]}
+
+    def html(self):
+        '''
+        Collapsible table of stage timings for the foot of the HTML report
+        '''
+        summary = self.summary()
+        columns = ['name', 'calls', 'wall_s', 'cpu_s', 'workbooks_parsed', 'sheets_parsed',
+                   'rows_decoded', 'bytes_read']
+        header = ''.join(f'<th>{col}</th>' for col in columns)
+        rows = ''.join(
+            '<tr>' + ''.join(f'<td>{html.escape(str(stage[col]))}</td>' for col in columns) + '</tr>'
+            for stage in summary['stages'] + [summary['total']])
+        return (f'<details id="profile"><summary>Quality check run profile '
+                f'({summary["total"]["wall_s"]}s)</summary>'
+                f'<table class="table profile_table"><thead><tr>{header}</tr></thead>'
+                f'<tbody>{rows}</tbody></table></details>')
+
+
+# profile of the current run (None unless -profile is used)
+profile = None
+
+
+def start(html_table=False, cprofile_dir=None):
+    '''
+    Start profiling a quality check run
+    '''
+    global profile
+    profile = RunProfile(html_table, cprofile_dir)
+    return profile
+
+
+def stop():
+    '''
+    Stop profiling and return the profile of the run (None if not profiling)
+    '''
+    global profile
+    run_profile, profile = profile, None
+    return run_profile
+
+
+@contextmanager
+def stage(name):
+    '''
+    Record a stage of the run if profiling
+    '''
+    if profile == None:
+        yield
+    else:
+        with profile.stage(name):
+            yield
+
+
+def record_sheet(path, rows, num_bytes):
+    '''
+    Count a parsed sheet if profiling
+    '''
+    if profile != None:
+        profile.record_sheet(path, rows, num_bytes)
+
+
+def add_html_table(html_report):
+    '''
+    Add the timing table to the foot of the report if requested
+    '''
+    if profile == None or not profile.html_table:
+        return html_report
+    return html_report.replace('</body>', profile.html() + '</body>', 1)
+
+
+def save(run_profile, path):
+    '''
+    Save the profile of a run as JSON (and the cProfile dumps if requested)
+    '''
+    run_profile.dump_cprofiles()
+    with open(path, 'w') as file:
+        json.dump(run_profile.summary(), file, indent=2)
@@ -1,22 +1,87 @@
 import os
-import pandas as pd
 import argparse
 import re
-import numpy as np
-import glob
-import tempfile
+import csv
+import time
+import sys
+import traceback
+import datetime
+from lazy_import import LazyModule
+from workbook_cache import read_sheet, workbook_cache
+from check_state import CheckState
+from check_scheduler import CheckUnit, run_checks
+from check_results import CheckResult, RowCollector, QCResult, add_results, results_from_frame
+from precheck import tshc_precheck, ho_precheck
+from results_export import export_results
+from metrics_store import MetricsStore, sample_id, run_date
+from vcf_integrity import check_vcfs
+from vcf_stats import collect_vcf_stats, vcf_problems
+from fastq_counts import find_fastqs, find_sample_files, count_sample_reads
+from bam_counts import count_sample_bam_reads
+from neg_depth import read_bed, region_depths
+from samplesheet import read_samplesheet
+from inventory import dir_inventory, scan_worksheet
+from prefetch import prefetcher, open_input
+from html_template import (HO_CELL_STYLES, TSHC_CELL_STYLES, COMPACT_TABLE_ROWS, load_template,
+                           render_table, render_compact_table, compact_table_script, substitute)
+import profiler
+
+# imported on first use so the command line (and importing this module) stays fast
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+
+# templates are stored alongside this script
+script_dir = os.path.dirname(os.path.abspath(__file__))
 
+# Generic regex used to extact ws_num etc
+panel_regex = r'\/(TSHC|TSMP|CLL)_(\d{6})_(v[\.]?\d\.\d\.\d)\/'
 
-parser = argparse.ArgumentParser()
-parser.add_argument('-ws_1', action='store', required=True,
-                    help='Path to worksheet 1 output files (TSHC/TSMP/CLL) include TSHC_<ws>_version dir')
-parser.add_argument('-ws_2', action='store',
-                    help='Path to worksheet 2 output files (TSHC) include TSHC_<ws>_version dir')
-parser.add_argument('-out_dir', action='store',
-                    help='Specifing an output directory to store html reports')
-parser.add_argument('-s', action='store',
-                    help='SampleSheet required for HO panel quality checks')
-args = parser.parse_args()
+# classes of the excel reports of a worksheet as (include, exclude) patterns
+tshc_excel_classes = {
+    'results': (None, re.compile('Neg|-fastq-bam-check|merged-variants')),
+    'negative': (re.compile('Neg'), None),
+    'fastq_bam': (re.compile('fastq-bam-check'), None)
+}
+ho_excel_classes = {
+    'negative': (re.compile('Neg|NEG'), None),
+    # quality check reports (and stored results) may be saved in the excel reports dir
+    'results': (re.compile(r'\.xlsx$'), re.compile('Neg|NEG|-fastq-bam-check|merged-variants|SRY')),
+    'sry': (re.compile('SRY'), None),
+    'merged': (re.compile('merged-variants'), None)
+}
+# placeholders in HO check descriptions replaced by detail tables in the HTML report
+# (and removed from the exported results)
+HO_DESCRIPTION_SLOTS = ('_vcf_min_max_', '_neg_exon_depth_', '_neg_calls_')
+# as glob('*king.xlsx'), hidden files are not matched
+kinship_xls_pattern = re.compile(r'^[^.].*king\.xlsx$')
+
+# sheets (and the columns used) read from a pipeline workbook by each check. These are
+# registered with the check scheduler so each sheet is loaded once before the checks
+check_sheets = {
+    'tshc_results_excel_check': [('Hyb-QC', ['Sample', 'PCT_TARGET_BASES_20X']),
+                                 ('VerifyBamId', ['%CONT'])],
+    'tshc_neg_excel_check': [('Coverage-exon', ['Max'])],
+    'tshc_kinship_check': [('Kinship', ['ID1', 'ID2', 'Kinship'])],
+    'tshc_fastq_bam_check': [('Check', ['Sample', 'FASTQ', 'BAM', 'Result'])],
+    'tshc_run_details': [('config_parameters', ['key', 'variable'])],
+    'ho_neg_checks': [('Coverage-exon', ['Gene', 'Exon', 'Max']),
+                      ('Variants-all-data', None)],
+    'ho_verifybamid_check': [('VerifyBamId', ['SAMPLE', '%CONT'])]
+}
+
+
+def sheet_columns(check, sheet_name):
+    '''
+    Columns read from a sheet by a check (as registered in check_sheets)
+    '''
+    return dict(check_sheets[check])[sheet_name]
+
+
+def check_unit_sheets(check, path):
+    '''
+    (path, sheet, columns) inputs of a check for the check scheduler
+    '''
+    return [(path, sheet_name, columns) for sheet_name, columns in check_sheets[check]]
 
 
 def tshc_get_inputs(ws_1, ws_2):
@@ -54,41 +119,33 @@ def tshc_get_inputs(ws_1, ws_2):
     else:
         raise Exception('Worksheet 1 and worksheet 2 are from different panels!')
 
+    # one inventory of each worksheet directory (and its excel reports and VCFs)
+    ws_1_excel_name = 'excel_reports_{}_{}'.format(ws_1_panel, ws_1_name)
+    ws_2_excel_name = 'excel_reports_{}_{}'.format(ws_2_panel, ws_2_name)
+    ws_1_root, _ = scan_worksheet(
+        ws_1, [ws_1_excel_name, 'vcfs_{}_{}'.format(ws_1_panel, ws_1_name)])
+    scan_worksheet(ws_2, [ws_2_excel_name, 'vcfs_{}_{}'.format(ws_2_panel, ws_2_name)])
+
     # defining excel inputs
-    ws_1_excel_reports = ws_1 + \
-        'excel_reports_{}_{}/'.format(ws_1_panel, ws_1_name)
-    ws_1_list = pd.DataFrame(os.listdir(
-        ws_1_excel_reports), columns=['sample_name'])
-    ws_2_excel_reports = ws_2 + \
-        'excel_reports_{}_{}/'.format(ws_2_panel, ws_2_name)
-    ws_2_list = pd.DataFrame(os.listdir(
-        ws_2_excel_reports), columns=['sample_name'])
-
-    xls_rep_1 = ws_1_list[~ws_1_list['sample_name'].str.contains(
-        'Neg|-fastq-bam-check|merged-variants')]
-    xls_rep_2 = ws_2_list[~ws_2_list['sample_name'].str.contains(
-        'Neg|-fastq-bam-check|merged-variants')]
-    neg_rep_1 = ws_1_list[ws_1_list['sample_name'].str.contains('Neg')]
-    neg_rep_2 = ws_2_list[ws_2_list['sample_name'].str.contains('Neg')]
-    fastq_xls_1 = ws_1_list[ws_1_list['sample_name'].str.contains(
-        'fastq-bam-check')]
-    fastq_xls_2 = ws_2_list[ws_2_list['sample_name'].str.contains(
-        'fastq-bam-check')]
-
-    xls_rep_1 = ws_1_excel_reports + xls_rep_1.values[0][0]
-    xls_rep_2 = ws_2_excel_reports + xls_rep_2.values[0][0]
+    ws_1_excel_reports = ws_1 + ws_1_excel_name + '/'
+    ws_1_list = dir_inventory(ws_1_excel_reports).classify(tshc_excel_classes)
+    ws_2_excel_reports = ws_2 + ws_2_excel_name + '/'
+    ws_2_list = dir_inventory(ws_2_excel_reports).classify(tshc_excel_classes)
+
+    xls_rep_1 = ws_1_excel_reports + ws_1_list['results'][0]
+    xls_rep_2 = ws_2_excel_reports + ws_2_list['results'][0]
 
     # determine which ws contains the negative sample
-    if len(neg_rep_1) != 0:
-        neg_rep = ws_1_excel_reports + neg_rep_1.values[0][0]
-    elif len(neg_rep_2) != 0:
-        neg_rep = ws_2_excel_reports + neg_rep_2.values[0][0]
+    if len(ws_1_list['negative']) != 0:
+        neg_rep = ws_1_excel_reports + ws_1_list['negative'][0]
+    elif len(ws_2_list['negative']) != 0:
+        neg_rep = ws_2_excel_reports + ws_2_list['negative'][0]
     else:
         raise Exception('Error the negative sample is not present!')
 
     # get fastq-bam-check file names
-    fastq_bam_1 = ws_1_excel_reports + fastq_xls_1.values[0][0]
-    fastq_bam_2 = ws_2_excel_reports + fastq_xls_2.values[0][0]
+    fastq_bam_1 = ws_1_excel_reports + ws_1_list['fastq_bam'][0]
+    fastq_bam_2 = ws_2_excel_reports + ws_2_list['fastq_bam'][0]
 
     # defining vcf directory path
     vcf_dir_1 = ws_1 + 'vcfs_{}_{}/'.format(ws_1_panel, ws_1_name)
@@ -97,7 +154,7 @@ def tshc_get_inputs(ws_1, ws_2):
     # defining cmd_log and kin
     cmd_log_1 = ws_1 + '{}.commandline_usage_logfile'.format(ws_1_name)
     cmd_log_2 = ws_2 + '{}.commandline_usage_logfile'.format(ws_2_name)
-    kin_xls = glob.glob(ws_1 + '*king.xlsx')[0]
+    kin_xls = ws_1 + [name for name in ws_1_root.stats if kinship_xls_pattern.match(name)][0]
 
 
     return xls_rep_1, xls_rep_2, neg_rep, fastq_bam_1, fastq_bam_2, kin_xls, vcf_dir_1, vcf_dir_2, cmd_log_1, cmd_log_2, panel
@@ -111,9 +168,10 @@ def tshc_results_excel_check(res, check_result_df):
     A description of the checks and a PASS/FAIL result for a given check are then added to the check_result_df
     '''
 
-    xls = pd.ExcelFile(res)
-    hybqc_df = pd.read_excel(xls, 'Hyb-QC')
-    verify_bam_id_df = pd.read_excel(xls, 'VerifyBamId')
+    hybqc_df = read_sheet(res, 'Hyb-QC', sheet_columns(
+        'tshc_results_excel_check', 'Hyb-QC'))
+    verify_bam_id_df = read_sheet(res, 'VerifyBamId', sheet_columns(
+        'tshc_results_excel_check', 'VerifyBamId'))
 
     work_num = os.path.basename(res)
     worksheet_name = re.search(r'\d{6}', work_num)[0]
@@ -138,13 +196,9 @@ def tshc_results_excel_check(res, check_result_df):
         if value >= 3:
             verify_bam_result = 'FAIL'
 
-    check_result_df = check_result_df.append({'Check': verify_bam_check,
-                                              'Description': verify_bam_check_des,
-                                              'Result': verify_bam_result, 'Worksheet': worksheet_name}, ignore_index=True)
-
-    check_result_df = check_result_df.append({'Check': coverage_check,
-                                              'Description': coverage_check_des,
-                                              'Result': coverage_result, 'Worksheet': worksheet_name}, ignore_index=True)
+    check_result_df = add_results(check_result_df, [
+        CheckResult(verify_bam_check, verify_bam_check_des, verify_bam_result, worksheet_name),
+        CheckResult(coverage_check, coverage_check_des, coverage_result, worksheet_name)])
 
     return check_result_df
 
@@ -161,8 +215,8 @@ def tshc_neg_excel_check(neg_xls, check_result_df):
     work_num = os.path.basename(neg_xls)
     worksheet_name = re.search(r'\d{6}', work_num)[0]
 
-    xls = pd.ExcelFile(neg_xls)
-    neg_exon_df = pd.read_excel(xls, 'Coverage-exon')
+    neg_exon_df = read_sheet(neg_xls, 'Coverage-exon', sheet_columns(
+        'tshc_neg_excel_check', 'Coverage-exon'))
 
     # number of exons check
     num_exons_check = 'Number of exons in negative sample'
@@ -189,23 +243,132 @@ def tshc_neg_excel_check(neg_xls, check_result_df):
     else:
         cov_neg_exons_check_result = 'PASS'
 
-    check_result_df = check_result_df.append({'Check': num_exons_check,
-                                              'Description': num_exons_check_des,
-                                              'Result': num_exons_check_result,
-                                              'Worksheet': worksheet_name}, ignore_index=True)
-
-    check_result_df = check_result_df.append({'Check': cov_neg_exons_check,
-                                              'Description': cov_neg_exons_check_des,
-                                              'Result': cov_neg_exons_check_result,
-                                              'Worksheet': worksheet_name}, ignore_index=True)
+    check_result_df = add_results(check_result_df, [
+        CheckResult(num_exons_check, num_exons_check_des, num_exons_check_result, worksheet_name),
+        CheckResult(cov_neg_exons_check, cov_neg_exons_check_des, cov_neg_exons_check_result, worksheet_name)])
 
     return check_result_df
 
 
+def neg_bam_depth_check(neg_xls, worksheet, bam_dirs, coverage_bed, max_depth, check_result_df,
+                        jobs=1):
+    '''
+    A check of the read depth of the negative control BAM (found in bam_dirs by the
+    sample name of the negative excel report) over each region of the coverage BED,
+    computed from the BAM in one pass (independent of the Coverage-exon tab). Fails if
+    the max depth of any region exceeds max_depth, or the BAM or BED cannot be read.
+    Returns the check_result_df with the check added and the max and mean depth of each
+    region.
+    '''
+    neg_sample = re.sub(r'\.v\d+\.\d+\.\d+-results\.xlsx$', '', os.path.basename(neg_xls))
+    depth_df = pd.DataFrame(
+        columns=['Worksheet', 'Region', 'Chrom', 'Start', 'End', 'Max depth', 'Mean depth'])
+
+    neg_bam_check = 'Negative control BAM depth check'
+    neg_bam_check_des = (f'The maximum depth of each coverage BED region in the negative control '
+                         f'BAM does not exceed {max_depth} reads.')
+    neg_bams = find_sample_files(bam_dirs, [neg_sample], ('.bam',))[neg_sample]
+    neg_bam_check_result = 'FAIL'
+    if not neg_bams:
+        neg_bam_check_des += f' No BAM found for {neg_sample}'
+    elif coverage_bed == None or not os.path.exists(coverage_bed):
+        neg_bam_check_des += f' Coverage BED not found: {coverage_bed}'
+    else:
+        try:
+            regions = read_bed(coverage_bed)
+            depths = region_depths(neg_bams[0], regions, jobs)
+        except Exception as error:
+            neg_bam_check_des += f' {type(error).__name__}: {error}'
+        else:
+            depth_df = pd.DataFrame(
+                [[worksheet, name, chrom, start, end, max_depth_region, round(mean_depth, 2)]
+                 for (chrom, start, end, name), (max_depth_region, mean_depth) in zip(regions, depths)],
+                columns=depth_df.columns)
+            over_df = depth_df[depth_df['Max depth'] > max_depth]
+            neg_bam_check_des += f' {len(regions)} regions of {os.path.basename(coverage_bed)}'
+            if over_df.empty:
+                neg_bam_check_result = 'PASS'
+            else:
+                over = '; '.join(f'{region}: {depth}' for region, depth in
+                                 over_df[['Region', 'Max depth']].head(5).values)
+                if len(over_df) > 5:
+                    over += f'; and {len(over_df) - 5} more'
+                neg_bam_check_des += f', {len(over_df)} exceed ({over})'
+
+    check_result_df = add_results(check_result_df, [
+        CheckResult(neg_bam_check, neg_bam_check_des, neg_bam_check_result, worksheet)])
+
+    return check_result_df, depth_df
+
+
+def tshc_neg_bam_check(neg_xls, check_result_df, bam_dirs, coverage_bed=None, config_xls=None,
+                       jobs=1):
+    '''
+    Negative control BAM depth check (neg_bam_depth_check) of a TSHC pair: the max depth
+    must be 0. The coverage BED is the coverage_regions of the config_parameters tab of
+    config_xls (a results excel report) unless coverage_bed is set.
+    '''
+    worksheet_name = re.search(r'\d{6}', os.path.basename(neg_xls))[0]
+    if coverage_bed == None:
+        config_df = read_sheet(config_xls, 'config_parameters', sheet_columns(
+            'tshc_run_details', 'config_parameters'))
+        coverage_bed = config_df[config_df['key'] == 'coverage_regions']['variable'].values[0]
+    return neg_bam_depth_check(neg_xls, worksheet_name, bam_dirs, coverage_bed, 0,
+                               check_result_df, jobs)
+
+
+def kinship_analysis(kinship_df, threshold=0.48):
+    '''
+    Vectorised analysis of the sample pairs of a KING kinship report (rows of the
+    'Kinship' tab, or of several reports concatenated with a 'Pair' column). Returns:
+        kinship_fail_df    - offending pairs: kinship >= threshold, NaN or inf
+        kinship_summary_df - per sample: pairs, max kinship, offending pairs and the
+                             samples it is related to (offending pairs)
+    Samples are identified by the ID1/ID2 columns (the excel row if not present).
+    '''
+    kinship = pd.to_numeric(kinship_df['Kinship'], errors='coerce').to_numpy(dtype=float)
+    offending = ~np.isfinite(kinship) | (kinship >= threshold)
+    if 'ID1' in kinship_df.columns and 'ID2' in kinship_df.columns:
+        id_1 = kinship_df['ID1'].astype(str).to_numpy()
+        id_2 = kinship_df['ID2'].astype(str).to_numpy()
+    else:
+        rows = np.array([f'row {row + 2}' for row in range(len(kinship_df))], dtype=object)
+        id_1, id_2 = rows + ' ID1', rows + ' ID2'
+    pair_cols = {'Pair': kinship_df['Pair'].to_numpy()} if 'Pair' in kinship_df.columns else {}
+
+    reason = np.where(np.isnan(kinship), 'NaN', np.where(
+        np.isinf(kinship), 'inf', f'Kinship >= {threshold}'))
+    kinship_fail_df = pd.DataFrame({**pair_cols, 'ID1': id_1, 'ID2': id_2,
+                                    'Kinship': kinship, 'Reason': reason})[offending]
+    kinship_fail_df = kinship_fail_df.sort_values(
+        by='Kinship', ascending=False, na_position='first').reset_index(drop=True)
+
+    # each pair counted for both of its samples
+    both_pair_cols = {col: np.concatenate([values, values]) for col, values in pair_cols.items()}
+    sample_pairs_df = pd.DataFrame({
+        **both_pair_cols,
+        'Sample': np.concatenate([id_1, id_2]),
+        'Related': np.concatenate([id_2, id_1]),
+        'Kinship': np.concatenate([kinship, kinship]),
+        'Offending': np.concatenate([offending, offending])})
+    keys = list(pair_cols) + ['Sample']
+    kinship_summary_df = sample_pairs_df.groupby(keys).agg(**{
+        'Pairs': ('Kinship', 'size'),
+        'Max kinship': ('Kinship', 'max'),
+        'Offending pairs': ('Offending', 'sum')})
+    related = sample_pairs_df[sample_pairs_df['Offending']].groupby(keys)['Related'].agg(', '.join)
+    kinship_summary_df['Related samples'] = related.reindex(kinship_summary_df.index).fillna('')
+    kinship_summary_df = kinship_summary_df.reset_index().sort_values(
+        by=['Offending pairs', 'Max kinship'], ascending=False, kind='stable').reset_index(drop=True)
+
+    return kinship_fail_df, kinship_summary_df
+
+
 def tshc_kinship_check(kin_xls, check_result_df):
     '''
-    A check to determine if any sample the kinship.xls file has a kinship values of >=0.48
+    A check to determine if any sample pair in the kinship.xls file has a kinship value of >=0.48 (or NaN/inf)
     A description of the check and a PASS/FAIL result for the check is then added to the check_result_df
+    The offending pairs and a per-sample relatedness summary are returned for the report (see kinship_analysis)
     '''
 
     worksheet_name = re.search(
@@ -215,27 +378,23 @@ def tshc_kinship_check(kin_xls, check_result_df):
     tshc_kinship_check_des = 'A check to ensure that all samples in a worksheet pair have a kinship value of <0.48'
 
 
-    xls = pd.ExcelFile(kin_xls)
-    kinship_df = pd.read_excel(xls, 'Kinship')
+    kinship_df = read_sheet(kin_xls, 'Kinship', sheet_columns(
+        'tshc_kinship_check', 'Kinship'))
 
-    kinship_values = kinship_df['Kinship'].values
+    kinship_fail_df, kinship_summary_df = kinship_analysis(kinship_df, 0.48)
 
-    if max(kinship_values) >= 0.48:
+    # any kinship result >=0.48 or containing inf and nan values (or no kinship results) fails
+    if kinship_df.empty or not kinship_fail_df.empty:
         tshc_kinship_check_result = 'FAIL'
     else:
         tshc_kinship_check_result = 'PASS'
+    if not kinship_fail_df.empty:
+        tshc_kinship_check_des += f' ({len(kinship_fail_df)} pairs fail, see Kinship below)'
 
-    # Additional step to set fail for any kinship result containing inf and nan values
-    for kin in kinship_values:
-        if np.isnan(kin) == True or np.isinf(kin) == True:
-            tshc_kinship_check_result = 'FAIL'
+    check_result_df = add_results(check_result_df, [
+        CheckResult(tshc_kinship_check, tshc_kinship_check_des, tshc_kinship_check_result, worksheet_name)])
 
-    check_result_df = check_result_df.append({'Check': tshc_kinship_check,
-                                              'Description': tshc_kinship_check_des,
-                                              'Result': tshc_kinship_check_result,
-                                              'Worksheet': worksheet_name}, ignore_index=True)
-
-    return check_result_df
+    return check_result_df, kinship_fail_df, kinship_summary_df
 
 
 def tshc_vcf_dir_check(vcf_dir, check_result_df):
@@ -249,23 +408,140 @@ def tshc_vcf_dir_check(vcf_dir, check_result_df):
     tshc_vcf_dir_check = 'VCF file count check'
     vcf_dir_check_des = 'A check to determine if 48 VCFs have been generated'
 
-    if len(os.listdir(vcf_dir)) == 48:
+    if len(dir_inventory(vcf_dir)) == 48:
         vcf_dir_check_result = 'PASS'
     else:
         vcf_dir_check_result = 'FAIL'
 
-    check_result_df = check_result_df.append({'Check': tshc_vcf_dir_check,
-                                              'Description': vcf_dir_check_des,
-                                              'Result': vcf_dir_check_result,
-                                              'Worksheet': worksheet_name}, ignore_index=True)
+    check_result_df = add_results(check_result_df, [
+        CheckResult(tshc_vcf_dir_check, vcf_dir_check_des, vcf_dir_check_result, worksheet_name)])
 
     return check_result_df
 
 
-def tshc_fastq_bam_check(fastq_xls, check_result_df):
+def vcf_integrity_check(vcf_dir, worksheet, check_result_df):
+    '''
+    A check that each VCF in vcf_dir is intact: BGZF compressed with a VCF header and the
+    BGZF EOF block (i.e. not truncated), with a tabix/CSI index which is not older than
+    the VCF. Only a few bytes of each VCF are read and the VCFs are checked concurrently.
+    Returns the check_result_df with the check added and a table of the failing VCFs.
+    '''
+    inventory = dir_inventory(vcf_dir)
+    paths = [inventory.join(name) for name in inventory.vcf_names()]
+    failures = check_vcfs(paths, stats=inventory.stats)
+    integrity_fail_df = pd.DataFrame(
+        [{'Worksheet': worksheet, 'VCF': vcf, 'Problems': ', '.join(problems)}
+         for vcf, problems in failures.items()],
+        columns=['Worksheet', 'VCF', 'Problems'])
+
+    vcf_integrity_check = 'VCF integrity check'
+    vcf_integrity_check_des = ('All VCFs are BGZF compressed with a VCF header and EOF block '
+                               'and have a tabix/CSI index newer than the VCF.')
+    if failures:
+        vcf_integrity_check_result = 'FAIL'
+        failed = '; '.join(f'{vcf}: {problems}' for vcf, problems in
+                           integrity_fail_df[['VCF', 'Problems']].head(5).values)
+        if len(failures) > 5:
+            failed += f'; and {len(failures) - 5} more'
+        vcf_integrity_check_des += f' {len(failures)} VCFs fail ({failed})'
+    elif not paths:
+        vcf_integrity_check_result = 'FAIL'
+        vcf_integrity_check_des += ' No VCFs found'
+    else:
+        vcf_integrity_check_result = 'PASS'
+
+    check_result_df = add_results(check_result_df, [
+        CheckResult(vcf_integrity_check, vcf_integrity_check_des, vcf_integrity_check_result, worksheet)])
+
+    return check_result_df, integrity_fail_df
+
+
+def tshc_vcf_integrity_check(vcf_dir, check_result_df):
+    '''
+    VCF integrity check (vcf_integrity_check) of a TSHC worksheet's VCF directory
+    '''
+    worksheet_name = str(
+        re.search(r'\/vcfs_\w{4}_(\d{6})\/', vcf_dir).group(1))
+    return vcf_integrity_check(vcf_dir, worksheet_name, check_result_df)
+
+
+def count_summary(counts):
+    '''
+    Counts dict as text, most frequent first (e.g. 'chr1: 120, chr2: 80')
+    '''
+    return ', '.join(f'{key}: {count}' for key, count in
+                     sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+
+def vcf_content_check(vcf_dir, worksheet, sample_ids, check_result_df, jobs=1):
+    '''
+    A check of the content of each VCF in vcf_dir, streamed across jobs processes: the
+    sample columns must be on the samplesheet (sample_ids) or, if there is no
+    samplesheet (sample_ids is None), match the VCF file name, and the number of records
+    must not be an outlier within the worksheet.
+    Returns the check_result_df with the check added and a table of the record count,
+    records per chromosome, FILTER values and problems of each VCF.
+    '''
+    inventory = dir_inventory(vcf_dir)
+    paths = [inventory.join(name) for name in inventory.vcf_names()]
+    stats = collect_vcf_stats(paths, jobs)
+    problems = vcf_problems(paths, stats, sample_ids)
+    vcf_stats_df = pd.DataFrame([{
+        'Worksheet': worksheet,
+        'VCF': os.path.basename(path),
+        'Samples': ', '.join(vcf['samples']),
+        'Records': vcf['records'],
+        'Chromosomes': count_summary(vcf['chromosomes']),
+        'FILTER': count_summary(vcf['filters']),
+        'Problems': ', '.join(messages)
+    } for path, vcf, messages in zip(paths, stats, problems)],
+        columns=['Worksheet', 'VCF', 'Samples', 'Records', 'Chromosomes', 'FILTER', 'Problems'])
+
+    vcf_content_check = 'VCF content check'
+    sample_source = 'the samplesheet' if sample_ids != None else 'its file name'
+    vcf_content_check_des = (f'The sample in each VCF matches {sample_source} and no VCF has an '
+                             'outlying number of records.')
+    fail_df = vcf_stats_df[vcf_stats_df['Problems'] != '']
+    if not paths:
+        vcf_content_check_result = 'FAIL'
+        vcf_content_check_des += ' No VCFs found'
+    elif not fail_df.empty:
+        vcf_content_check_result = 'FAIL'
+        failed = '; '.join(f'{vcf}: {messages}' for vcf, messages in
+                           fail_df[['VCF', 'Problems']].head(5).values)
+        if len(fail_df) > 5:
+            failed += f'; and {len(fail_df) - 5} more'
+        vcf_content_check_des += f' {len(fail_df)} VCFs fail ({failed})'
+    else:
+        vcf_content_check_result = 'PASS'
+
+    check_result_df = add_results(check_result_df, [
+        CheckResult(vcf_content_check, vcf_content_check_des, vcf_content_check_result, worksheet)])
+
+    return check_result_df, vcf_stats_df
+
+
+def tshc_vcf_content_check(vcf_dir, check_result_df, jobs=1):
+    '''
+    VCF content check (vcf_content_check) of a TSHC worksheet's VCF directory. There is
+    no samplesheet so the sample of each VCF must match its file name.
+    '''
+    worksheet_name = str(
+        re.search(r'\/vcfs_\w{4}_(\d{6})\/', vcf_dir).group(1))
+    return vcf_content_check(vcf_dir, worksheet_name, None, check_result_df, jobs)
+
+
+def tshc_fastq_bam_check(fastq_xls, check_result_df, fastq_dirs=None, bam_dirs=None, jobs=1):
     '''
     A check to determine that the expected number of reads are present in each FASTQ and BAM file
     A description of the check and a PASS/FAIL result for the check is then added to the check_result_df
+
+    If fastq_dirs is set the FASTQ read counts of the workbook are verified by counting
+    the reads in each sample's FASTQ files (found in fastq_dirs, counted on a pool of
+    jobs threads). If bam_dirs is set the BAM read counts are verified from the index
+    of each sample's BAM (found in bam_dirs). The check fails if a sample's counted
+    reads differ from the workbook.
+    Returns the check_result_df and a table of the verified read counts of each sample.
     '''
 
     work_num = os.path.basename(fastq_xls)
@@ -273,8 +549,8 @@ def tshc_fastq_bam_check(fastq_xls, check_result_df):
 
     tshc_fastq_bam_check = 'FASTQ-BAM check'
     tshc_fastq_bam_check_des = 'A check to determine that the expected number of reads are present in each FASTQ and BAM file'
-    xls = pd.ExcelFile(fastq_xls)
-    fastq_bam_df = pd.read_excel(xls, 'Check')
+    fastq_bam_df = read_sheet(fastq_xls, 'Check', sheet_columns(
+        'tshc_fastq_bam_check', 'Check'))
     fastq_bam = set(fastq_bam_df['Result'].values)
 
     if 'FAIL' in fastq_bam:
@@ -282,61 +558,151 @@ def tshc_fastq_bam_check(fastq_xls, check_result_df):
     else:
         tshc_fastq_bam_check_result = 'PASS'
 
-    check_result_df = check_result_df.append({'Check': tshc_fastq_bam_check,
-                                              'Description': tshc_fastq_bam_check_des,
-                                              'Result': tshc_fastq_bam_check_result,
-                                              'Worksheet': worksheet_name}, ignore_index=True)
-
-    return check_result_df
+    verify_df = pd.DataFrame(columns=['Worksheet', 'Sample', 'Differences', 'Result'])
+    if fastq_dirs or bam_dirs:
+        verify_df = fastq_bam_verification(fastq_bam_df, worksheet_name, fastq_dirs, bam_dirs, jobs)
+        fail_df = verify_df[verify_df['Result'] == 'FAIL']
+        verified = ' and '.join(
+            [files for files, dirs in [('FASTQ', fastq_dirs), ('BAM', bam_dirs)] if dirs])
+        tshc_fastq_bam_check_des += (f'. {verified} read counts were verified against each '
+                                     f'sample\'s {verified} files')
+        if not fail_df.empty:
+            tshc_fastq_bam_check_result = 'FAIL'
+            failed = '; '.join(f'{sample}: {differences}' for sample, differences in
+                               fail_df[['Sample', 'Differences']].head(5).values)
+            if len(fail_df) > 5:
+                failed += f'; and {len(fail_df) - 5} more'
+            tshc_fastq_bam_check_des += f' ({len(fail_df)} samples differ: {failed})'
+
+    check_result_df = add_results(check_result_df, [
+        CheckResult(tshc_fastq_bam_check, tshc_fastq_bam_check_des, tshc_fastq_bam_check_result, worksheet_name)])
+
+    return check_result_df, verify_df
+
+
+def read_count_difference(files, workbook, counted):
+    '''
+    Description of a difference between the read count of a workbook and the counted
+    reads (a message if the reads could not be counted), '' if they are the same
+    '''
+    if isinstance(counted, str):
+        return f'{files}: {counted}'
+    if counted != workbook:
+        return f'{files} {workbook} in workbook, {counted} counted'
+    return ''
 
 
-def tshc_generate_html_output(check_result_df, run_details_df, panel, bed_1, bed_2):
+def fastq_bam_verification(fastq_bam_df, worksheet, fastq_dirs=None, bam_dirs=None, jobs=1):
+    '''
+    Verify the read counts of each sample of the fastq-bam-check workbook:
+        - FASTQ (fastq_dirs): the reads in the sample's FASTQ files (every lane and read)
+        - BAM (bam_dirs): the mapped and unmapped reads of the sample's BAMs, from the
+          BAM index (the BAM is only decompressed if it has no index)
+    The FASTQ-BAM difference is the FASTQ reads (counted, or from the workbook) less the
+    counted BAM reads. A sample fails if its files are not found or cannot be read, or a
+    count differs from the workbook.
+    '''
+    samples = [str(sample) for sample in fastq_bam_df['Sample'].values]
+    rows = [{'Worksheet': worksheet, 'Sample': sample} for sample in samples]
+    differences = [[] for _ in samples]
+    columns = ['Worksheet', 'Sample']
+
+    if fastq_dirs:
+        fastqs = find_fastqs(fastq_dirs, samples)
+        sample_reads = count_sample_reads(fastqs, jobs)
+        for row, problems, workbook_reads in zip(rows, differences, fastq_bam_df['FASTQ'].values):
+            counted = sample_reads[row['Sample']]
+            if counted == None:
+                counted = 'No FASTQs found'
+            row.update({'FASTQ files': len(fastqs[row['Sample']]),
+                        'Workbook FASTQ reads': workbook_reads, 'Counted FASTQ reads': counted})
+            problems.append(read_count_difference('FASTQ', workbook_reads, counted))
+        columns += ['FASTQ files', 'Workbook FASTQ reads', 'Counted FASTQ reads']
+
+    if bam_dirs:
+        sample_bams = count_sample_bam_reads(bam_dirs, samples, jobs)
+        for row, problems, workbook_reads, workbook_fastq in zip(
+                rows, differences, fastq_bam_df['BAM'].values, fastq_bam_df['FASTQ'].values):
+            paths, bams = sample_bams[row['Sample']]
+            mapped = unmapped = sources = difference = ''
+            if isinstance(bams, str):
+                counted = bams
+            elif not bams:
+                counted = 'No BAMs found'
+            else:
+                mapped = sum(bam.total_mapped for bam in bams)
+                unmapped = sum(bam.total_unmapped for bam in bams)
+                counted = mapped + unmapped
+                sources = ', '.join(sorted({bam.source for bam in bams}))
+            fastq_reads = row.get('Counted FASTQ reads', workbook_fastq)
+            if not isinstance(counted, str) and not isinstance(fastq_reads, str):
+                difference = fastq_reads - counted
+            row.update({'BAM files': len(paths), 'BAM counts from': sources,
+                        'Workbook BAM reads': workbook_reads, 'Counted BAM reads': counted,
+                        'Mapped reads': mapped, 'Unmapped reads': unmapped,
+                        'FASTQ-BAM difference': difference})
+            problems.append(read_count_difference('BAM', workbook_reads, counted))
+        columns += ['BAM files', 'BAM counts from', 'Workbook BAM reads', 'Counted BAM reads',
+                    'Mapped reads', 'Unmapped reads', 'FASTQ-BAM difference']
+
+    for row, problems in zip(rows, differences):
+        row['Differences'] = ', '.join(problem for problem in problems if problem)
+        row['Result'] = 'FAIL' if row['Differences'] else 'PASS'
+    return pd.DataFrame(rows, columns=columns + ['Differences', 'Result'])
+
+
+def tshc_generate_html_output(check_result_df, run_details_df, panel, bed_1, bed_2,
+                              kinship_fail_df, kinship_summary_df, trend_charts=''):
     '''
     Creating a static HTML file to display the results to the Clinical Scientist reviewing the quality check report.
     This function calls the format_bed_files function to add in bed file information.
+    The kinship pairs failing the kinship check and the per-sample relatedness summary are added below the checks.
     This process involves changes directly to the html.
+    trend_charts (QC metric trend charts from the metrics store) are added to the foot of the report.
     '''
 
-    with open('css_style.css') as file:
+    with open(os.path.join(script_dir, 'css_style.css')) as file:
         style = file.read()
-    run_details = run_details_df.to_html(index=False, justify='left')
-    run_details = format_bed_files(run_details, bed_1, bed_2)
-    check_details = check_result_df.to_html(index=False, justify='left')
+    # PASS/FAIL cells are given a class to colour code as the tables are rendered
+    run_details = render_table(
+        run_details_df, cells=TSHC_CELL_STYLES, slots=format_bed_files(bed_1, bed_2),
+        index=False, justify='left')
+    check_details = render_table(
+        check_result_df, cells=TSHC_CELL_STYLES, index=False, justify='left')
+
+    if kinship_fail_df.empty:
+        kinship_fails = '<p>No sample pairs have a kinship value of &gt;=0.48, NaN or inf.</p>'
+    else:
+        kinship_fails = render_table(kinship_fail_df, index=False, justify='left')
+    kinship_summary = render_table(kinship_summary_df, index=False, justify='left')
 
     report_head = f'<h1>{panel} Quality Report</h1>'
     run_sub = '<h2>Pipeline checks<h2/>'
     check_sub = '<h2>QC summary<h2/>'
-    html = f'<!DOCTYPE html><html><head>{style}</head><body>{report_head}{run_sub}{run_details}{check_sub}{check_details}</body></hml>'
-
-    # Add class to PASS/FAIL to colour code
-    html = re.sub(r"<td>PASS</td>", r"<td class='PASS'>PASS</td>", html)
-    html = re.sub(r"<td>FAIL</td>", r"<td class='FAIL'>FAIL</td>", html)
+    kinship_sub = '<h2>Kinship</h2>'
+    kinship_details = (f'{kinship_sub}{kinship_fails}<details><summary>Per-sample relatedness '
+                       f'summary</summary>{kinship_summary}</details>')
+    html = f'<!DOCTYPE html><html><head>{style}</head><body>{report_head}{run_sub}{run_details}{check_sub}{check_details}{kinship_details}{trend_charts}</body></hml>'
 
     file_name = "_".join(
         run_details_df['Worksheet'].values.tolist()) + '_TSHC_quality_checks.html'
     return file_name, html
 
 
-def format_bed_files(run_html, bed_1, bed_2):
+def format_bed_files(bed_1, bed_2):
     '''
-    Adding the bed file html table to the run html table. The bed file information is passed as 
+    Slots adding the bed file html table to the run html table. The bed file information is passed as 
     a list for each worksheet in the pair. [ws_1_html, search_term]. The html contains bed file
     information for the worksheet e.g. target bed, refined bed and coverage bed... This is then
-    substituted into the html by searching for the ws search term e.g. 000001_bed_files.
+    substituted into the run html table (see render_table) in place of the ws search term
+    e.g. 000001_bed_files.
     '''
-
-    bed_1_html = bed_1[0]
-    bed_1_search = bed_1[1]
-    bed_2_html = bed_2[0]
-    bed_2_search = bed_2[1]
-    run_html = re.sub(f'{bed_1_search}', f'{bed_1_html}', run_html)
-    run_html = re.sub(f'{bed_2_search}', f'{bed_2_html}', run_html)
-
-    # rename dataframe bed_table to bed_table... css classes cannot have spaces
-    run_html = re.sub('<td><table border="1" class="dataframe bed_table">',
-                      '<td><table border="1" class="bed_table">', run_html)
-
-    return run_html
+    slots = {}
+    for bed_html, bed_search, _ in [bed_1, bed_2]:
+        # rename dataframe bed_table to bed_table... css classes cannot have spaces
+        slots[bed_search] = substitute(bed_html, {
+            '<table border="1" class="dataframe bed_table">': '<table border="1" class="bed_table">'})
+    return slots
 
 
 def tshc_run_details(cmd, xls_rep, run_details_df):
@@ -346,9 +712,6 @@ def tshc_run_details(cmd, xls_rep, run_details_df):
         2) excel report- Worksheet number, AB threshold, pipeline version and BED files
     Add run details to run details_df
     '''
-    bed_df = pd.DataFrame(
-        columns=['Target bed', 'Refined bed', 'Coverage bed'])
-
     # get ws names for the cmd file and
     cmd_ws = re.search(r'(\d{6})\.commandline_usage_logfile', cmd)
     xls_ws = re.search(
@@ -370,7 +733,7 @@ def tshc_run_details(cmd, xls_rep, run_details_df):
     worksheet = cmd_ws
 
     # get experiment name from command output
-    with open(cmd, 'r') as file:
+    with open_input(cmd, 'r') as file:
         cmd_text = file.read()
 
     search_term = r'-s\s\n\/network\/sequenced\/MiSeq_data\/(TSHC)\/.*(?:' + re.escape(
@@ -384,8 +747,8 @@ def tshc_run_details(cmd, xls_rep, run_details_df):
             "Command line log file check fail- Check path in command line log file vs regex")
 
     # get pipeline version, bed file names and AB threshold
-    xls = pd.ExcelFile(xls_rep)
-    config_df = pd.read_excel(xls, 'config_parameters')
+    config_df = read_sheet(xls_rep, 'config_parameters', sheet_columns(
+        'tshc_run_details', 'config_parameters'))
     allele_balance = config_df[config_df['key']
                                == 'AB_threshold']['variable'].values[0]
     pipe_version = config_df[config_df['key'] ==
@@ -399,104 +762,384 @@ def tshc_run_details(cmd, xls_rep, run_details_df):
 
     bed_file_table = f'{worksheet}_bed_files'
 
-    bed_df = bed_df.append({
+    bed_df = pd.DataFrame([{
         'Target bed': target_bed,
         'Refined bed': refined_target_bed,
         'Coverage bed': coverage_bed
-    }, ignore_index=True)
+    }], columns=['Target bed', 'Refined bed', 'Coverage bed'])
 
     bed_df = bed_df.transpose()
     bed_html = bed_df.to_html(
         justify='left', header=None, escape=True, classes='bed_table', border=0)
 
-    bed = [bed_html, bed_file_table]
+    bed = [bed_html, bed_file_table, {'Worksheet': worksheet, 'Target bed': target_bed,
+                                      'Refined bed': refined_target_bed, 'Coverage bed': coverage_bed}]
 
-    run_details_df = run_details_df.append({'Worksheet': worksheet,
-                                            'Pipeline version': pipe_version,
-                                            'Experiment name': experiment_name,
-                                            'Bed files': bed_file_table,
-                                            'AB threshold': allele_balance
-                                            }, ignore_index=True)
+    run_details_df = add_results(run_details_df, [{'Worksheet': worksheet,
+                                                   'Pipeline version': pipe_version,
+                                                   'Experiment name': experiment_name,
+                                                   'Bed files': bed_file_table,
+                                                   'AB threshold': allele_balance
+                                                   }])
 
     return run_details_df, bed
 
 
-def tshc_main(ws_1, ws_2):
+def tshc_metrics(xls_reps, neg_rep, kin_xls):
     '''
-    A function to organise the TSHC output quality check function calls
+    QC metrics of a TSHC worksheet pair for the metrics store, as (worksheet, sample,
+    feature, metric, value) records: PCT_TARGET_BASES_20X and %CONT of each sample, the
+    max depth of the negative sample and the kinship of each pair of samples
+    '''
+    records = []
+    for xls_rep in xls_reps:
+        worksheet = re.search(r'\d{6}', os.path.basename(xls_rep))[0]
+        hybqc_df = read_sheet(xls_rep, 'Hyb-QC', sheet_columns(
+            'tshc_results_excel_check', 'Hyb-QC'))
+        records += [(worksheet, sample_id(sample), None, 'PCT_TARGET_BASES_20X', value)
+                    for sample, value in zip(hybqc_df['Sample'], hybqc_df['PCT_TARGET_BASES_20X'])]
+        verify_bam_id_df = read_sheet(xls_rep, 'VerifyBamId')
+        samples = verify_bam_id_df.get('SAMPLE', pd.Series([None] * len(verify_bam_id_df)))
+        records += [(worksheet, None if sample is None else sample_id(sample), None, '%CONT', value)
+                    for sample, value in zip(samples, verify_bam_id_df['%CONT'])]
+
+    neg_worksheet = re.search(r'\d{6}', os.path.basename(neg_rep))[0]
+    neg_exon_df = read_sheet(neg_rep, 'Coverage-exon', sheet_columns(
+        'tshc_neg_excel_check', 'Coverage-exon'))
+    records.append((neg_worksheet, sample_id(os.path.basename(neg_rep)), None, 'neg_max_depth',
+                    neg_exon_df['Max'].max()))
+
+    pair = re.search(r'\/(\d{6}_\d{6}).*.king.xlsx.*', kin_xls).group(1)
+    kinship_df = read_sheet(kin_xls, 'Kinship', sheet_columns('tshc_kinship_check', 'Kinship'))
+    if 'ID1' in kinship_df.columns and 'ID2' in kinship_df.columns:
+        records += [(pair, sample_id(id_1), sample_id(id_2), 'Kinship', kinship)
+                    for id_1, id_2, kinship in zip(kinship_df['ID1'], kinship_df['ID2'], kinship_df['Kinship'])]
+    else:
+        records += [(pair, None, None, 'Kinship', kinship) for kinship in kinship_df['Kinship']]
+    return records
+
 
+def record_metrics(metrics_db, panel, experiment_name, records, worksheets):
+    '''
+    Save the QC metrics of a run to the metrics store and return the trend charts of
+    the panel's control metrics for the report. The run date is that of the experiment
+    name, or today's date (with a warning) if the experiment name has no date.
     '''
+    date = run_date(experiment_name)
+    if date == None:
+        date = datetime.date.today().isoformat()
+        print(f'Warning: no run date in experiment name {experiment_name!r}, '
+              f'metrics recorded with run date {date}')
+    store = MetricsStore(metrics_db)
+    try:
+        store.add_run(panel, date, records)
+        return store.charts_html(panel, worksheets, date)
+    finally:
+        store.close()
 
-    xls_rep_1, xls_rep_2, neg_rep, fastq_bam_1, fastq_bam_2, kin_xls, vcf_dir_1, vcf_dir_2, cmd_log_1, cmd_log_2, panel = tshc_get_inputs(
-        ws_1, ws_2)
 
-    pd.set_option('display.max_colwidth', -1)
-    check_result_df = pd.DataFrame(
-        columns=['Worksheet', 'Check', 'Description', 'Result'])
-    run_details_df = pd.DataFrame(columns=[
-                                  'Worksheet', 'Pipeline version', 'Experiment name', 'Bed files', 'AB threshold'])
-
-    # ws_1 checks
-    check_result_df = tshc_results_excel_check(xls_rep_1, check_result_df)
-    check_result_df = tshc_vcf_dir_check(vcf_dir_1, check_result_df)
-    check_result_df = tshc_fastq_bam_check(fastq_bam_1, check_result_df)
-
-    # ws_2 checks
-    check_result_df = tshc_results_excel_check(xls_rep_2, check_result_df)
-    check_result_df = tshc_vcf_dir_check(vcf_dir_2, check_result_df)
-    check_result_df = tshc_fastq_bam_check(fastq_bam_2, check_result_df)
-
-    # pair checks
-    check_result_df = tshc_neg_excel_check(neg_rep, check_result_df)
-    check_result_df = tshc_kinship_check(kin_xls, check_result_df)
-
-    # run details
-    run_details_df, bed_1 = tshc_run_details(
-        cmd_log_1, xls_rep_1, run_details_df)
-    run_details_df, bed_2 = tshc_run_details(
-        cmd_log_2, xls_rep_2, run_details_df)
-
-    # sort
-    check_result_df = check_result_df.sort_values(by=['Worksheet'])
-    run_details_df = run_details_df.sort_values(by=['Worksheet'])
-    # create static html output
-    name, html_report = tshc_generate_html_output(
-        check_result_df, run_details_df, panel, bed_1, bed_2)
-
-    ws_1_out = args.ws_1
-    ws_2_out = args.ws_2
-    # save HTML report to ws_1 and ws_2 output directories
-    if args.out_dir == None:
-        print(f'Saving {name} report to {ws_1_out} and {ws_2_out}')
-        os.chdir(ws_1_out)
-        with open(name, 'w') as file:
-            file.write(html_report)
-        os.chdir(ws_2_out)
-        with open(name, 'w') as file:
-            file.write(html_report)
-    else:
-        # save HTML report to out dir specified
-        print(f'Saving {name} report to {args.out_dir}')
-        os.chdir(args.out_dir)
-        with open(name, 'w') as file:
-            file.write(html_report)
+def tshc_check_unit(check, path, check_result_df, check_state, *args, inputs=()):
+    '''
+    Register a TSHC check run on a single input (file or directory) with the scheduler.
+    The check is run on an empty check_result_df and returns only its own rows. args
+    are passed to the check after check_result_df; inputs are any other files or
+    directories the check reads.
+    '''
+    return CheckUnit(
+        f'{check.__name__}:{path}',
+        lambda: check_state.run_check(check, [path] + list(inputs), path, check_result_df, *args),
+        sheets=check_unit_sheets(check.__name__, path) if check.__name__ in check_sheets else [])
+
+
+def tshc_main(ws_1, ws_2, out_dir=None, incremental=None, jobs=1, metrics_db=None,
+              vcf_stats=False, fastq_dirs=None, bam_dirs=None, coverage_bed=None):
+    '''
+    A function to organise the TSHC output quality check function calls
+    Returns a QCResult including the paths the HTML report has been saved to.
+
+    If incremental is set ('stat' or 'hash') check results are stored alongside the
+    report and re-used on the next run for checks whose inputs have not changed.
+    Checks are run by the check scheduler; with jobs > 1 the ws_1, ws_2 and pair checks
+    run concurrently. Rows are added to the report in the order the checks are listed.
+    If metrics_db is set the QC metrics of the pair are saved to the metrics store and
+    trend charts added to the report. If vcf_stats is set every VCF is decompressed for
+    the VCF content check. If fastq_dirs/bam_dirs are set the FASTQ/BAM read counts of
+    the fastq-bam-check workbooks are verified against the FASTQs/BAMs in those
+    directories, and the depth of the negative control BAM over the coverage BED
+    (coverage_bed, or the coverage_regions of the pipeline config) is checked.
+    '''
 
+    with profiler.stage('tshc_get_inputs'):
+        xls_rep_1, xls_rep_2, neg_rep, fastq_bam_1, fastq_bam_2, kin_xls, vcf_dir_1, vcf_dir_2, cmd_log_1, cmd_log_2, panel = tshc_get_inputs(
+            ws_1, ws_2)
+
+    # read the inputs ahead of the checks (workbooks only if not in the sheet cache)
+    workbooks = [xls_rep_1, xls_rep_2, neg_rep, fastq_bam_1, fastq_bam_2, kin_xls]
+    prefetcher.clear()
+    prefetcher.start((workbooks if workbook_cache.disk_cache == None else []) +
+                     [cmd_log_1, cmd_log_2])
+
+    try:
+        # report name is known before the checks are run, used to locate stored results
+        ws_names = sorted([re.search(panel_regex, ws).group(2) for ws in [ws_1, ws_2]])
+        name = "_".join(ws_names) + '_TSHC_quality_checks.html'
+        check_state = CheckState()
+        if incremental != None:
+            check_state = CheckState(os.path.join(out_dir or ws_1, name + '.state.pkl'),
+                                     content_hash=incremental == 'hash')
+
+        pd.set_option('display.max_colwidth', None)
+        check_result_df = pd.DataFrame(
+            columns=['Worksheet', 'Check', 'Description', 'Result'])
+        run_details_df = pd.DataFrame(columns=[
+                                      'Worksheet', 'Pipeline version', 'Experiment name', 'Bed files', 'AB threshold'])
+
+        fastq_bam_units = [
+            tshc_check_unit(tshc_fastq_bam_check, fastq_bam, check_result_df, check_state,
+                            fastq_dirs, bam_dirs, jobs, inputs=(fastq_dirs or []) + (bam_dirs or []))
+            for fastq_bam in [fastq_bam_1, fastq_bam_2]
+        ]
+        check_units = [
+            # ws_1 checks
+            tshc_check_unit(tshc_results_excel_check, xls_rep_1, check_result_df, check_state),
+            tshc_check_unit(tshc_vcf_dir_check, vcf_dir_1, check_result_df, check_state),
+            fastq_bam_units[0],
+            # ws_2 checks
+            tshc_check_unit(tshc_results_excel_check, xls_rep_2, check_result_df, check_state),
+            tshc_check_unit(tshc_vcf_dir_check, vcf_dir_2, check_result_df, check_state),
+            fastq_bam_units[1],
+            # pair checks
+            tshc_check_unit(tshc_neg_excel_check, neg_rep, check_result_df, check_state)
+        ]
+        integrity_units = [
+            tshc_check_unit(tshc_vcf_integrity_check, vcf_dir, check_result_df, check_state)
+            for vcf_dir in [vcf_dir_1, vcf_dir_2]
+        ]
+        content_units = []
+        if vcf_stats:
+            content_units = [
+                tshc_check_unit(tshc_vcf_content_check, vcf_dir, check_result_df, check_state, jobs)
+                for vcf_dir in [vcf_dir_1, vcf_dir_2]
+            ]
+        neg_bam_units = []
+        if bam_dirs:
+            neg_bam_units = [tshc_check_unit(
+                tshc_neg_bam_check, neg_rep, check_result_df, check_state, bam_dirs, coverage_bed,
+                xls_rep_1, jobs, inputs=bam_dirs + [xls_rep_1] + ([coverage_bed] if coverage_bed else []))]
+        kinship_unit = tshc_check_unit(tshc_kinship_check, kin_xls, check_result_df, check_state)
+        # run details
+        run_details_units = [
+            CheckUnit(
+                f'tshc_run_details:{cmd_log}',
+                lambda cmd_log=cmd_log, xls_rep=xls_rep: check_state.run(
+                    f'tshc_run_details:{cmd_log}', [cmd_log, xls_rep], (cmd_log, xls_rep),
+                    lambda: tshc_run_details(cmd_log, xls_rep, run_details_df)),
+                sheets=check_unit_sheets('tshc_run_details', xls_rep))
+            for cmd_log, xls_rep in [(cmd_log_1, xls_rep_1), (cmd_log_2, xls_rep_2)]
+        ]
 
-def assign_panel(ws_1, ws_2, sample_sheet):
+        results = run_checks(
+            check_units + integrity_units + content_units + neg_bam_units + [kinship_unit] +
+            run_details_units, jobs)
+        fastq_bam_results = {unit.name: results.pop(unit.name) for unit in fastq_bam_units}
+        integrity_results = [results[unit.name] for unit in integrity_units]
+        content_results = [results[unit.name] for unit in content_units]
+        neg_bam_results = [results[unit.name] for unit in neg_bam_units]
+        kinship_check_df, kinship_fail_df, kinship_summary_df = results[kinship_unit.name]
+        check_result_df = pd.concat(
+            [check_result_df] +
+            [fastq_bam_results[unit.name][0] if unit.name in fastq_bam_results else results[unit.name]
+             for unit in check_units] +
+            [result[0] for result in integrity_results + content_results + neg_bam_results] +
+            [kinship_check_df],
+            ignore_index=True)
+        (run_details_1, bed_1), (run_details_2, bed_2) = [
+            results[unit.name] for unit in run_details_units]
+        run_details_df = pd.concat([run_details_1, run_details_2], ignore_index=True)
+
+        # sort
+        check_result_df = check_result_df.sort_values(by=['Worksheet'])
+        run_details_df = run_details_df.sort_values(by=['Worksheet'])
+        trend_charts = ''
+        if metrics_db != None:
+            with profiler.stage('record_metrics'):
+                trend_charts = record_metrics(
+                    metrics_db, panel, run_details_df['Experiment name'].values[0],
+                    tshc_metrics([xls_rep_1, xls_rep_2], neg_rep, kin_xls),
+                    ws_names + ['_'.join(ws_names)])
+        # create static html output
+        with profiler.stage('tshc_generate_html_output'):
+            name, html_report = tshc_generate_html_output(
+                check_result_df, run_details_df, panel, bed_1, bed_2, kinship_fail_df,
+                kinship_summary_df, trend_charts)
+        html_report = profiler.add_html_table(html_report)
+
+        # save HTML report to ws_1 and ws_2 output directories
+        if out_dir == None:
+            print(f'Saving {name} report to {ws_1} and {ws_2}')
+            report_paths = [os.path.join(ws_1, name), os.path.join(ws_2, name)]
+        else:
+            # save HTML report to out dir specified
+            print(f'Saving {name} report to {out_dir}')
+            report_paths = [os.path.join(out_dir, name)]
+
+        for report_path in report_paths:
+            with open(report_path, 'w') as file:
+                file.write(html_report)
+        check_state.save()
+    finally:
+        # the read-ahead buffers are dropped even if a check fails
+        prefetcher.clear()
+
+    bed_files_df = pd.DataFrame([bed_1[2], bed_2[2]]).sort_values(by=['Worksheet'])
+    details = {
+        'bed_files': bed_files_df,
+        'kinship_fails': kinship_fail_df,
+        'kinship_summary': kinship_summary_df,
+        'vcf_integrity_fails': pd.concat(
+            [result[1] for result in integrity_results], ignore_index=True)
+    }
+    if neg_bam_results:
+        details['negative_bam_depth'] = neg_bam_results[0][1]
+    if fastq_dirs or bam_dirs:
+        details['read_count_verification'] = pd.concat(
+            [result[1] for result in fastq_bam_results.values()], ignore_index=True)
+    if content_results:
+        details['vcf_stats'] = pd.concat(
+            [result[1] for result in content_results], ignore_index=True)
+    qc_result = QCResult(panel, ws_names, report_paths, results_from_frame(check_result_df),
+                         run_details_df, details)
+    # export the bed file names in place of the report's bed table placeholder
+    bed_names = {bed[1]: ', '.join([bed[2]['Target bed'], bed[2]['Refined bed'], bed[2]['Coverage bed']])
+                 for bed in [bed_1, bed_2]}
+    export_run_details_df = run_details_df.assign(
+        **{'Bed files': run_details_df['Bed files'].map(bed_names)})
+    with profiler.stage('export_results'):
+        export_results(qc_result, export_run_details_df)
+
+    return qc_result
+
+
+def assign_panel(ws_1, ws_2, sample_sheet, out_dir=None, jobs=1, incremental=None,
+                 profile=None, cprofile_dir=None, metrics_db=None, vcf_stats=False,
+                 fastq_dirs=None, bam_dirs=None, coverage_bed=None):
     '''
     Assiging a panel and <panel>_main funtion to process pipeline output.
+    Returns a QCResult for the worksheet(s).
+
+    If profile is set ('json' or 'html') the time and workbook reads of each stage are
+    saved as <report>.profile.json; with 'html' a timing table is also added to the foot
+    of the report. If cprofile_dir is set a cProfile dump of each stage is saved there.
+    If metrics_db is set the QC metrics of the run are saved to that metrics store.
+    If vcf_stats is set the content of every VCF is checked (VCF content check). If
+    fastq_dirs/bam_dirs are set the TSHC FASTQ/BAM read counts are verified against the
+    FASTQs/BAMs in those directories. With bam_dirs the depth of the negative control BAM
+    over the coverage BED is checked (TSMP/CLL only if coverage_bed is set).
     '''
     panel = re.search(panel_regex, ws_1).group(1)
 
-    if panel == 'TSHC':
-        tshc_main(ws_1, ws_2)
-    elif panel == 'TSMP' or panel == 'CLL':
-        ho_main(panel, ws_1, sample_sheet)
-    else:
-        raise Exception('Error: Panel specified not recognised.')
+    if profile != None:
+        profiler.start(html_table=profile == 'html', cprofile_dir=cprofile_dir)
+    try:
+        if panel == 'TSHC':
+            qc_result = tshc_main(ws_1, ws_2, out_dir, incremental, jobs, metrics_db, vcf_stats,
+                                  fastq_dirs, bam_dirs, coverage_bed)
+        elif panel == 'TSMP' or panel == 'CLL':
+            qc_result = ho_main(panel, ws_1, sample_sheet, out_dir, jobs, incremental, metrics_db,
+                                vcf_stats, bam_dirs, coverage_bed)
+        else:
+            raise Exception('Error: Panel specified not recognised.')
+    finally:
+        run_profile = profiler.stop()
 
+    if run_profile != None:
+        profile_path = os.path.splitext(qc_result.report_paths[0])[0] + '.profile.json'
+        profiler.save(run_profile, profile_path)
+        print(f'Saving run profile to {profile_path}')
+    return qc_result
 
-def ho_main(panel, ws_1, sample_sheet):
+
+def read_batch_manifest(manifest):
+    '''
+    Read a batch manifest. Each line of the tab separated manifest describes one quality
+    check report:
+        ws_1    ws_2    samplesheet    out_dir
+    ws_2 is only required for TSHC pairs and the samplesheet only for TSMP/CLL
+    worksheets; unused or optional fields can be left empty or set to '-'. Blank lines
+    and lines starting with # are ignored.
+    '''
+    columns = ['ws_1', 'ws_2', 'sample_sheet', 'out_dir']
+    entries = []
+    with open(manifest, newline='') as file:
+        for line in csv.reader(file, delimiter='\t'):
+            if not line or not line[0].strip() or line[0].startswith('#'):
+                continue
+            fields = [field.strip() for field in line] + [''] * len(columns)
+            entry = {col: (None if field in ('', '-') else field)
+                     for col, field in zip(columns, fields)}
+            entries.append(entry)
+    if not entries:
+        raise Exception(f'No worksheets found in batch manifest: {manifest}')
+    return entries
+
+
+def run_batch(manifest, out_dir=None, jobs=1, incremental=None, profile=None,
+              cprofile_dir=None, metrics_db=None, vcf_stats=False, fastq_dirs=None,
+              bam_dirs=None, coverage_bed=None):
+    '''
+    Run the quality checks for every worksheet in a batch manifest within this process.
+    An error for one worksheet is recorded and does not stop the remaining worksheets.
+    A summary of outcomes and timings is printed and saved as <manifest>_summary.tsv
+    (in out_dir if specified). Returns the summary rows.
+    '''
+    summary = []
+    for entry in read_batch_manifest(manifest):
+        panel = re.search(panel_regex, entry['ws_1'] or '')
+        start = time.perf_counter()
+        try:
+            qc_result = assign_panel(
+                entry['ws_1'], entry['ws_2'], entry['sample_sheet'],
+                entry['out_dir'] or out_dir, jobs, incremental, profile, cprofile_dir,
+                metrics_db, vcf_stats, fastq_dirs, bam_dirs, coverage_bed)
+            outcome = 'OK'
+            message = ';'.join(qc_result.report_paths)
+        except Exception as error:
+            traceback.print_exc()
+            outcome = 'ERROR'
+            message = f'{type(error).__name__}: {error}'
+        finally:
+            # worksheets do not share workbooks, free memory between entries
+            workbook_cache.clear()
+            prefetcher.clear()
+
+        summary.append({
+            'ws_1': entry['ws_1'],
+            'ws_2': entry['ws_2'] or '',
+            'panel': panel.group(1) if panel else '',
+            'outcome': outcome,
+            'seconds': round(time.perf_counter() - start, 2),
+            'details': message.replace('\t', ' ').replace('\n', ' ')
+        })
+
+    summary_name = os.path.splitext(os.path.basename(manifest))[0] + '_summary.tsv'
+    summary_path = os.path.join(
+        out_dir or os.path.dirname(os.path.abspath(manifest)), summary_name)
+    with open(summary_path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(summary[0]), delimiter='\t')
+        writer.writeheader()
+        writer.writerows(summary)
+
+    num_failed = len([row for row in summary if row['outcome'] != 'OK'])
+    for row in summary:
+        print(f"{row['outcome']}\t{row['seconds']}s\t{row['ws_1']}")
+    print(f'Batch complete: {len(summary) - num_failed} OK, {num_failed} ERROR. '
+          f'Summary saved to {summary_path}')
+
+    return summary
+
+
+def ho_main(panel, ws_1, sample_sheet, out_dir=None, jobs=1, incremental=None, metrics_db=None,
+            vcf_stats=False, bam_dirs=None, coverage_bed=None):
     '''
     A function to organise the HO function calls
 
@@ -504,8 +1147,20 @@ def ho_main(panel, ws_1, sample_sheet):
 
     1. Assign variables for samples in worksheet (ho_sort_inputs)
     2. get_run details table 
-    3. Run 9 independent checks and create output df
-
+    3. Run 10 independent checks and create output df
+
+    When jobs > 1 the per-sample excel reports are parsed across a pool of processes
+    before the checks are run, and independent checks are run concurrently by the
+    check scheduler. Returns a QCResult including the path of the saved HTML
+    report (saved in the excel reports directory if out_dir is not specified).
+
+    If incremental is set ('stat' or 'hash') check results are stored alongside the
+    report and re-used on the next run for checks whose inputs have not changed. The
+    coverage and FLT3 checks are re-used per sample.
+    If metrics_db is set the QC metrics of the worksheet are saved to the metrics store
+    and trend charts added to the report. If vcf_stats is set every VCF is decompressed
+    for the VCF content check. If bam_dirs and coverage_bed are set the depth of the
+    negative control BAM over the coverage BED is checked.
     '''
     ho_check_df = pd.DataFrame(
         columns=['Worksheet', 'Check', 'Description', 'Result'])
@@ -516,37 +1171,140 @@ def ho_main(panel, ws_1, sample_sheet):
     if panel == 'CLL':
         gene_cov_thres = 300
     # Pipeline checks run details
-    ho_inp = ho_sort_inputs(panel, ws_1, sample_sheet)
-    run_details_df = ho_run_details(ho_inp)
-    # Pipeline check results
-    pipeline_check_df, file_size_df = ho_vcf_check(ho_inp, ho_check_df)
-    # QC summary check results
-    qcs_result_df, max_row_exon_df, ho_neg_table_df, alt_df = ho_neg_checks(
-        ho_inp, ho_check_df)
-    qcs_result_df, verify_fail_df = ho_verifybamid_check(ho_inp, qcs_result_df)
-    qcs_result_df = ho_sry_check(ho_inp, qcs_result_df)
-    # Pre analysis checks results
-    pac_result_df, flt3_fail_df = ho_flt3_check(ho_inp, ho_check_df)
-    pac_result_df, exon_fail_df, gene_fail_df = ho_coverage_check(
-        ho_inp, pac_result_df, gene_cov_thres)
-    file_size_df = file_size_df.transpose()
-    max_row_exon_df = max_row_exon_df.transpose()
-
-    # list of dicts and additional info used in modals and sub tables
-    extra_info_list = [
-        ho_neg_table_df, file_size_df, max_row_exon_df,
-        exon_fail_df, gene_fail_df, alt_df,
-        verify_fail_df, flt3_fail_df, gene_cov_thres
-    ]
+    with profiler.stage('ho_sort_inputs'):
+        ho_inp = ho_sort_inputs(panel, ws_1, sample_sheet)
+    if out_dir == None:
+        out_dir = ws_1 + f'excel_reports_{panel}_{ho_inp["worksheet"]}/'
+    # read the inputs ahead of the checks; with jobs > 1 the sample workbooks are parsed
+    # by worker processes, and workbooks in the sheet cache are not parsed at all
+    workbooks = [ho_inp['negative']]
+    if jobs <= 1:
+        workbooks += ho_inp['pat_results']
+    prefetcher.clear()
+    prefetcher.start([ho_inp['cmd_log_file']] +
+                     (workbooks if workbook_cache.disk_cache == None else []))
+    try:
+        check_state = CheckState()
+        if incremental != None:
+            state_path = os.path.join(
+                out_dir, f'{ho_inp["worksheet"]}_{panel}_quality_checks.html.state.pkl')
+            check_state = CheckState(state_path, content_hash=incremental == 'hash')
+        if jobs > 1:
+            with profiler.stage('load_sample_workbooks'):
+                workbook_cache.load_sheets(
+                    ho_inp['pat_results'], ho_sample_sheets(gene_cov_thres), jobs)
+        sample_sheets = ho_sample_sheets(gene_cov_thres)
+        sample_inputs = [(sample, sheet_name, columns)
+                         for sample in ho_inp['pat_results'] for sheet_name, columns in sample_sheets]
+
+        check_units = [
+            # Pipeline checks run details
+            CheckUnit('ho_run_details', lambda: check_state.run(
+                'ho_run_details', [ho_inp['cmd_log_file']], ho_inp, lambda: ho_run_details(ho_inp))),
+            # Pipeline check results
+            CheckUnit('ho_vcf_check', lambda: check_state.run_check(
+                ho_vcf_check, [ho_inp['sample_sheet'], ho_inp['vcf_directory']], ho_inp, ho_check_df)),
+            CheckUnit('ho_vcf_integrity_check', lambda: check_state.run_check(
+                ho_vcf_integrity_check, [ho_inp['vcf_directory']], ho_inp, ho_check_df)),
+            # QC summary check results
+            CheckUnit('ho_neg_checks', lambda: check_state.run_check(
+                ho_neg_checks, [ho_inp['negative']], ho_inp, ho_check_df),
+                sheets=check_unit_sheets('ho_neg_checks', ho_inp['negative'])),
+            CheckUnit('ho_verifybamid_check', lambda: check_state.run_check(
+                ho_verifybamid_check, [ho_inp['pat_results'][0]], ho_inp, ho_check_df),
+                sheets=check_unit_sheets('ho_verifybamid_check', ho_inp['pat_results'][0])),
+            CheckUnit('ho_sry_check', lambda: ho_sry_check(ho_inp, ho_check_df)),
+            # Pre analysis checks results
+            CheckUnit('ho_flt3_check', lambda: ho_flt3_check(ho_inp, ho_check_df, check_state),
+                      sheets=[inp for inp in sample_inputs if inp[1] == 'FLT3']),
+            CheckUnit('ho_coverage_check', lambda: ho_coverage_check(
+                ho_inp, ho_check_df, gene_cov_thres, check_state),
+                sheets=[inp for inp in sample_inputs if inp[1] != 'FLT3'])
+        ]
+        if vcf_stats:
+            check_units.append(CheckUnit('ho_vcf_content_check', lambda: check_state.run_check(
+                ho_vcf_content_check, [ho_inp['sample_sheet'], ho_inp['vcf_directory']], ho_inp,
+                ho_check_df, jobs)))
+        if bam_dirs and coverage_bed:
+            check_units.append(CheckUnit('ho_neg_bam_check', lambda: check_state.run_check(
+                ho_neg_bam_check, bam_dirs + [ho_inp['negative'], coverage_bed], ho_inp, ho_check_df,
+                bam_dirs, coverage_bed, jobs)))
+        results = run_checks(check_units, jobs)
+
+        run_details_df = results['ho_run_details']
+        vcf_check_df, file_size_df = results['ho_vcf_check']
+        integrity_check_df, vcf_integrity_fail_df = results['ho_vcf_integrity_check']
+        pipeline_check_dfs = [vcf_check_df, integrity_check_df]
+        if vcf_stats:
+            content_check_df, vcf_stats_df = results['ho_vcf_content_check']
+            pipeline_check_dfs.append(content_check_df)
+        pipeline_check_df = pd.concat(pipeline_check_dfs, ignore_index=True)
+        neg_check_df, max_row_exon_df, ho_neg_table_df, alt_df = results['ho_neg_checks']
+        verify_check_df, verify_fail_df = results['ho_verifybamid_check']
+        qcs_check_dfs = [ho_check_df, neg_check_df]
+        if 'ho_neg_bam_check' in results:
+            neg_bam_check_df, neg_bam_depth_df = results['ho_neg_bam_check']
+            qcs_check_dfs.append(neg_bam_check_df)
+        qcs_result_df = pd.concat(
+            qcs_check_dfs + [verify_check_df, results['ho_sry_check']], ignore_index=True)
+        flt3_check_df, flt3_fail_df = results['ho_flt3_check']
+        cov_check_df, exon_fail_df, gene_fail_df = results['ho_coverage_check']
+        pac_result_df = pd.concat(
+            [ho_check_df, flt3_check_df, cov_check_df], ignore_index=True)
+        file_size_df = file_size_df.transpose()
+        max_row_exon_df = max_row_exon_df.transpose()
+
+        # list of dicts and additional info used in modals and sub tables
+        extra_info_list = [
+            ho_neg_table_df, file_size_df, max_row_exon_df,
+            exon_fail_df, gene_fail_df, alt_df,
+            verify_fail_df, flt3_fail_df, gene_cov_thres
+        ]
 
-    ho_generate_html_output(
-        run_details_df,
-        qcs_result_df,
-        pipeline_check_df,
-        pac_result_df,
-        extra_info_list,
-        ho_inp
-    )
+        trend_charts = ''
+        if metrics_db != None:
+            with profiler.stage('record_metrics'):
+                trend_charts = record_metrics(
+                    metrics_db, panel, run_details_df['Experiment name'].values[0],
+                    ho_metrics(ho_inp, gene_cov_thres), [ho_inp['worksheet']])
+
+        with profiler.stage('ho_generate_html_output'):
+            report_path = ho_generate_html_output(
+                run_details_df,
+                qcs_result_df,
+                pipeline_check_df,
+                pac_result_df,
+                extra_info_list,
+                ho_inp,
+                out_dir,
+                trend_charts
+            )
+        check_state.save()
+    finally:
+        # the read-ahead buffers are dropped even if a check fails
+        prefetcher.clear()
+
+    checks = (results_from_frame(pipeline_check_df, HO_DESCRIPTION_SLOTS) +
+              results_from_frame(qcs_result_df, HO_DESCRIPTION_SLOTS) +
+              results_from_frame(pac_result_df, HO_DESCRIPTION_SLOTS))
+    details = {
+        'negative_summary': ho_neg_table_df,
+        'negative_alt_calls': alt_df,
+        'verify_fails': verify_fail_df,
+        'flt3_calls': flt3_fail_df,
+        'exon_fails': exon_fail_df,
+        'gene_fails': gene_fail_df,
+        'vcf_integrity_fails': vcf_integrity_fail_df
+    }
+    if vcf_stats:
+        details['vcf_stats'] = vcf_stats_df
+    if 'ho_neg_bam_check' in results:
+        details['negative_bam_depth'] = neg_bam_depth_df
+    qc_result = QCResult(panel, [ho_inp['worksheet']], [report_path], checks, run_details_df,
+                         details)
+    with profiler.stage('export_results'):
+        export_results(qc_result)
+    return qc_result
 
 
 def ho_sort_inputs(panel, ws_1, sample_sheet):
@@ -558,36 +1316,28 @@ def ho_sort_inputs(panel, ws_1, sample_sheet):
     if sample_sheet == None:
         raise Exception(
             "A samplesheet has not been provided... check the command")
-    # patients result
-    pat_results_list = []
-
-    excel_base = ws_1 + f'excel_reports_{panel}_{worksheet}/'
-    results_list = os.listdir(excel_base)
-    excel_df = pd.DataFrame(results_list, columns=['sample_name'])
+    # one inventory of the worksheet directory (and its excel reports and VCFs)
+    excel_name = f'excel_reports_{panel}_{worksheet}'
+    scan_worksheet(ws_1, [excel_name, f'vcfs_{panel}_{worksheet}'])
 
     # sort all results
-    neg_xls = excel_df[excel_df['sample_name'].str.contains('Neg|NEG')]
-    pat_results = excel_df[~excel_df['sample_name'].str.contains(
-        'Neg|NEG|-fastq-bam-check|merged-variants|SRY')]
-    sry_xls = excel_df[excel_df['sample_name'].str.contains('SRY')]
-    merged_xls = excel_df[excel_df['sample_name'].str.contains(
-        'merged-variants')]
-
-    # get abs path for each df
-    neg_xls = f'{excel_base}' + neg_xls['sample_name'].squeeze()
-    pat_results = pat_results.squeeze().to_list()
-    for res in pat_results:
-        res_path = f'{excel_base}' + res
-        pat_results_list.append(res_path)
+    excel_base = ws_1 + excel_name + '/'
+    excel_files = dir_inventory(excel_base).classify(ho_excel_classes)
+    if not excel_files['negative']:
+        raise Exception('Error the negative sample is not present!')
+    neg_xls = f'{excel_base}' + excel_files['negative'][0]
+    pat_results_list = [f'{excel_base}' + res for res in excel_files['results']]
     cmd_log_file = os.path.abspath(
         ws_1) + f'/{worksheet}.commandline_usage_logfile'
     vcf_dir = os.path.abspath(ws_1) + f'/vcfs_{panel}_{worksheet}/'
-    if sry_xls.empty == True:
+    if not excel_files['sry']:
         sry_xls = None
     else:
-        sry_xls = f'{excel_base}' + f'{sry_xls.squeeze()}'
+        sry_xls = f'{excel_base}' + excel_files['sry'][0]
 
-    merged_xls = f'{excel_base}' + merged_xls['sample_name'].squeeze()
+    merged_xls = None
+    if excel_files['merged']:
+        merged_xls = f'{excel_base}' + excel_files['merged'][0]
 
     ho_inp = {
         'panel': panel,
@@ -598,12 +1348,27 @@ def ho_sort_inputs(panel, ws_1, sample_sheet):
         'vcf_directory': vcf_dir,
         'sry_excel': sry_xls,
         'merged_variant_xls': merged_xls,
-        'sample_sheet': sample_sheet
+        'sample_sheet': sample_sheet,
+        # parsed once for the checks of the worksheet
+        'samplesheet': read_samplesheet(sample_sheet)
     }
 
     return ho_inp
 
 
+def ho_sample_sheets(gene_cov_thres):
+    '''
+    Sheets (and the columns used from them) read from each sample's excel report by
+    ho_flt3_check and ho_coverage_check
+    '''
+    return [
+        ('Coverage-gene', ['Worksheet', 'Sample',
+                           'Gene', f'pct>{gene_cov_thres}x']),
+        ('Coverage-details', ['SAMPLE', 'GENE', 'Exon', 'Min_depth']),
+        ('FLT3', ['AD', 'ALT-REF', 'Grouped AR (ALT-REF)', 'Grouped AB (ALT-REF)'])
+    ]
+
+
 def ho_run_details(ho_inp):
     '''
     Retrieve run details information from command line log file
@@ -612,7 +1377,7 @@ def ho_run_details(ho_inp):
     panel = ho_inp['panel']
     cmd = ho_inp['cmd_log_file']
     worksheet = ho_inp['worksheet']
-    with open(cmd, 'r') as file:
+    with open_input(cmd, 'r') as file:
         cmd_text = file.read()
     # Regex to pull out experiment name and pipeline version from commandline file.
     # Worksheet name escaped to enable the running of CLL validation runs
@@ -628,16 +1393,17 @@ def ho_run_details(ho_inp):
     check_title = 'Run details'
     run_details_des = 'Manual check of the worksheet number, panel, pipeline version and experiment name.'
 
-    ho_run_details_df = pd.DataFrame(columns=[
-                                     'Worksheet', 'Check', 'Panel', 'Pipeline version', 'Experiment name', 'Description'])
+    ho_run_details = RowCollector([
+        'Worksheet', 'Check', 'Panel', 'Pipeline version', 'Experiment name', 'Description'])
 
-    ho_details_df = ho_run_details_df.append({'Worksheet': worksheet,
-                                              'Check': check_title,
-                                              'Panel': panel,
-                                              'Pipeline version': pipe_version,
-                                              'Experiment name': exp_name,
-                                              'Description': run_details_des
-                                              }, ignore_index=True)
+    ho_run_details.add({'Worksheet': worksheet,
+                        'Check': check_title,
+                        'Panel': panel,
+                        'Pipeline version': pipe_version,
+                        'Experiment name': exp_name,
+                        'Description': run_details_des
+                        })
+    ho_details_df = ho_run_details.frame()
 
     return ho_details_df
 
@@ -656,6 +1422,8 @@ def create_samplesheet_df(ss_path):
     This function creates a samplesheet dataframe excluding all samplesheet
     headers (ie. that info which is above h1,h2... in the example above) and
     returns the df along with the list of actual column headers used in the df.
+    The samplesheet is parsed in memory (samplesheet.read_samplesheet); checks
+    use the SampleSheet itself for indexed sample lookups.
 
     Args:
         ss_path (str): path to desired samplesheet for data extraction.
@@ -664,30 +1432,23 @@ def create_samplesheet_df(ss_path):
         column_list (list): list of [Data] headers included in the given ss
         samplesheet_df: a pandas.DataFrame containing samplesheet [Data] data
     """
-    with open(ss_path, 'r') as f_in:
-        # fetch all lines from samplesheet
-        lines = f_in.readlines()
-
-    data_lines = None
-    for i in range(len(lines)):
-        # seek through file to find the data lines and make new list of them
-        if not '[Data]' in lines[i]: continue
-        data_lines = lines[i+1:]
-        break
-    assert data_lines, f"No [Data] lines found in SampleSheet at:\n {ss_path}"
-
-    # use tempfile as this is deleted outside of the context manager
-    with tempfile.NamedTemporaryFile(mode='wt', suffix='.csv') as f_temp:
-        # create temp ss file with only the [Data] table, excluding [Data] line
-        f_temp.writelines(data_lines)
-        f_temp.seek(0)
-        # extract data as dataframe
-        sample_df = pd.read_csv(f_temp.name)
+    samplesheet = read_samplesheet(ss_path)
+    sample_df = pd.DataFrame(samplesheet.rows, columns=samplesheet.columns)
     column_list = sample_df.columns
 
     return column_list, sample_df
 
 
+def listed_samples(samples, limit=5):
+    '''
+    The first limit samples joined with '; ' (and the number of others not listed)
+    '''
+    listed = '; '.join(samples[:limit])
+    if len(samples) > limit:
+        listed += f'; and {len(samples) - limit} more'
+    return listed
+
+
 def ho_vcf_check(ho_inp, qcs_result_df):
     '''
     A check to determine if the number of VCFs generated
@@ -697,50 +1458,70 @@ def ho_vcf_check(ho_inp, qcs_result_df):
     vcf_dir_path = ho_inp['vcf_directory']
 
     # TC 21/12/21: add support for W10 samplesheet lacking commas
-    column_list, sample_df = create_samplesheet_df(ho_inp['sample_sheet'])
-
-    sample_df.columns = column_list
-    num_sample = sample_df['Sample_ID'].count()
+    samplesheet = ho_inp['samplesheet']
+    num_sample = len(samplesheet)
 
     # The number of vcfs present in the VCF output folder should be 2x number 
     # of samples on samplesheet
     num_exp = num_sample * 2
 
-    vcf_search = vcf_dir_path + '*.vcf*'
-    vcf_files = glob.glob(vcf_search)
+    # as glob('*.vcf*'), hidden files are not matched
+    vcf_inventory = dir_inventory(vcf_dir_path)
+    vcf_files = [name for name in vcf_inventory.stats
+                 if '.vcf' in name and not name.startswith('.')]
 
     file_size = []
     for file in vcf_files:
         if file.endswith('.gz'):
-            size = os.stat(file).st_size
+            size = vcf_inventory.stats[file].st_size
             file_size.append(size)
     # Get the min and max file size of vcfs
     min_file = convert_unit(min(file_size))
     max_file = convert_unit(max(file_size))
-    file_size_df = pd.DataFrame(columns=['Min', 'Max'])
-    file_size_df = file_size_df.append({
+    file_size_df = pd.DataFrame([{
         'Min': min_file,
         'Max': max_file
-    }, ignore_index=True)
+    }], columns=['Min', 'Max'])
 
     worksheet = ho_inp['worksheet']
     vcf_check = 'VCF count check'
     vcf_check_des = 'The number of VCFs produced must be 2 times the number of \
-    samples present on the samplesheet. _vcf_min_max_'
+    samples present on the samplesheet.'
 
-    if num_exp != len(vcf_files):
+    # samplesheet samples without a VCF (VCFs are named after the Sample_ID)
+    no_vcf = samplesheet.missing(vcf_files)
+    if no_vcf:
+        vcf_check_des += f' {len(no_vcf)} samples have no VCF ({listed_samples(no_vcf)}).'
+    vcf_check_des += ' _vcf_min_max_'
+
+    if num_exp != len(vcf_files) or no_vcf:
         vcf_check_res = 'FAIL'
     else:
         vcf_check_res = 'PASS'
 
-    qcs_result_df = qcs_result_df.append({'Check': vcf_check,
-                                          'Description': vcf_check_des,
-                                          'Result': vcf_check_res,
-                                          'Worksheet': worksheet}, ignore_index=True)
+    qcs_result_df = add_results(qcs_result_df, [
+        CheckResult(vcf_check, vcf_check_des, vcf_check_res, worksheet)])
 
     return qcs_result_df, file_size_df
 
 
+def ho_vcf_integrity_check(ho_inp, qcs_result_df):
+    '''
+    VCF integrity check (vcf_integrity_check) of the worksheet's VCF directory
+    '''
+    return vcf_integrity_check(ho_inp['vcf_directory'], ho_inp['worksheet'], qcs_result_df)
+
+
+def ho_vcf_content_check(ho_inp, qcs_result_df, jobs=1):
+    '''
+    VCF content check (vcf_content_check) of the worksheet's VCF directory against the
+    samplesheet
+    '''
+    sample_ids = set(ho_inp['samplesheet'].sample_ids)
+    return vcf_content_check(
+        ho_inp['vcf_directory'], ho_inp['worksheet'], sample_ids, qcs_result_df, jobs)
+
+
 def convert_unit(size_in_bytes):
     '''
     A function to convert size of VCFs from bytes to KB. Clinical Scientists
@@ -771,9 +1552,10 @@ def ho_neg_checks(ho_inp, qcs_result_df):
     else:
         raise Exception('This panel has not been added to this script.')
 
-    xls = pd.ExcelFile(ho_inp['negative'])
-    neg_exon_df = pd.read_excel(xls, 'Coverage-exon')
-    neg_call_df = pd.read_excel(xls, 'Variants-all-data')
+    neg_exon_df = read_sheet(ho_inp['negative'], 'Coverage-exon', sheet_columns(
+        'ho_neg_checks', 'Coverage-exon'))
+    neg_call_df = read_sheet(ho_inp['negative'], 'Variants-all-data', sheet_columns(
+        'ho_neg_checks', 'Variants-all-data'))
     num_exons = neg_exon_df['Max'].count()
 
     worksheet = ho_inp['worksheet']
@@ -826,22 +1608,21 @@ def ho_neg_checks(ho_inp, qcs_result_df):
     sensitivity = f'Max reads in negative = {max_num_exons}. Analyse to {sensitivity}'
     max_row_exon['Sensitivity'] = sensitivity
 
-    qcs_result_df = qcs_result_df.append({'Check': neg_exon_check,
-                                          'Description': neg_exon_check_des,
-                                          'Result': neg_exon_res,
-                                          'Worksheet': worksheet}, ignore_index=True)
+    qcs_result_df = add_results(qcs_result_df, [
+        CheckResult(neg_exon_check, neg_exon_check_des, neg_exon_res, worksheet),
+        CheckResult(neg_depth_check, neg_depth_check_des, neg_depth_res, worksheet),
+        CheckResult(neg_calls_check, neg_calls_check_des, neg_zero_res, worksheet)])
 
-    qcs_result_df = qcs_result_df.append({'Check': neg_depth_check,
-                                          'Description': neg_depth_check_des,
-                                          'Result': neg_depth_res,
-                                          'Worksheet': worksheet}, ignore_index=True)
+    return qcs_result_df, max_row_exon, ho_neg_table_df, alt_df
 
-    qcs_result_df = qcs_result_df.append({'Check': neg_calls_check,
-                                          'Description': neg_calls_check_des,
-                                          'Result': neg_zero_res,
-                                          'Worksheet': worksheet}, ignore_index=True)
 
-    return qcs_result_df, max_row_exon, ho_neg_table_df, alt_df
+def ho_neg_bam_check(ho_inp, qcs_result_df, bam_dirs, coverage_bed, jobs=1):
+    '''
+    Negative control BAM depth check (neg_bam_depth_check) of the worksheet: the max
+    depth of each region must not exceed 30 reads
+    '''
+    return neg_bam_depth_check(ho_inp['negative'], ho_inp['worksheet'], bam_dirs, coverage_bed,
+                               30, qcs_result_df, jobs)
 
 
 def ho_verifybamid_check(ho_inp, qcs_result_df):
@@ -854,8 +1635,8 @@ def ho_verifybamid_check(ho_inp, qcs_result_df):
     # pick the first sample results xls as verifybamid information common across samples
     xls_path = ho_inp['pat_results'][0]
 
-    xls = pd.ExcelFile(xls_path)
-    verifybamid_df = pd.read_excel(xls, 'VerifyBamId')
+    verifybamid_df = read_sheet(xls_path, 'VerifyBamId', sheet_columns(
+        'ho_verifybamid_check', 'VerifyBamId'))
 
     max_cont = verifybamid_df['%CONT'].max()
 
@@ -874,10 +1655,8 @@ def ho_verifybamid_check(ho_inp, qcs_result_df):
     verify_fail_df = verifybamid_df[verifybamid_df['%CONT'] > 10.0]
     verify_fail_df = verify_fail_df.replace(
         to_replace=r'.*(D\d\d-\d{5}).*', value=r'\1', regex=True)
-    qcs_result_df = qcs_result_df.append({'Check': verifybamid_check,
-                                          'Description': verifybamid_check_des,
-                                          'Result': verifybamid_res,
-                                          'Worksheet': worksheet}, ignore_index=True)
+    qcs_result_df = add_results(qcs_result_df, [
+        CheckResult(verifybamid_check, verifybamid_check_des, verifybamid_res, worksheet)])
 
     return qcs_result_df, verify_fail_df
 
@@ -899,38 +1678,51 @@ def ho_sry_check(ho_inp, qcs_result_df):
     else:
         sry_check_res = 'PASS'
 
-    qcs_result_df = qcs_result_df.append({'Check': sry_check,
-                                          'Description': sry_check_des,
-                                          'Result': sry_check_res,
-                                          'Worksheet': worksheet}, ignore_index=True)
+    qcs_result_df = add_results(qcs_result_df, [
+        CheckResult(sry_check, sry_check_des, sry_check_res, worksheet)])
 
     return qcs_result_df
 
 
-def ho_flt3_check(ho_inp, qcs_result_df):
+def ho_sample_flt3(sample):
+    '''
+    Variants on the FLT3 tab of a sample's excel report (None if there are none).
+    A ValueError is raised if the FLT3 tab is not present.
+    '''
+    flt3_cols = dict(ho_sample_sheets(None))['FLT3']
+    flt3_df = read_sheet(sample, 'FLT3', flt3_cols)
+    if flt3_df.empty:
+        return None
+    sample_name = re.search(r'D\d\d-\d{5}', sample)[0]
+    flt3 = flt3_df[['AD', 'ALT-REF',
+                    'Grouped AR (ALT-REF)', 'Grouped AB (ALT-REF)']]
+    flt3 = flt3_df.assign(Sample=f'{sample_name}')
+    return flt3
+
+
+def ho_flt3_check(ho_inp, qcs_result_df, check_state=None):
     '''
     If any variants are present on FLT3 tab then the check will pass. FLT3 tab is only present for TSMP panels.
     This check will always return a 'FAIL' for CLL QC reports.
+    FLT3 variants are read per sample through check_state so unchanged samples can be re-used.
     '''
+    if check_state == None:
+        check_state = CheckState()
     cll_ws_check = False
     sample_list = ho_inp['pat_results']
     flt3_check_res = None
-    flt3_fail_df = pd.DataFrame(columns=['Sample', 'AD', 'ALT-REF'])
+    flt3_fail = RowCollector(['Sample', 'AD', 'ALT-REF'])
 
     # try except block handles when FLT3 tab not present e.g. CLL panel
     for sample in sample_list:
-        xls = pd.ExcelFile(sample)
         try:
-            flt3_df = pd.read_excel(xls, 'FLT3')
-            if not flt3_df.empty:
-                sample_name = re.search(r'D\d\d-\d{5}', sample)[0]
-                flt3 = flt3_df[['AD', 'ALT-REF',
-                                'Grouped AR (ALT-REF)', 'Grouped AB (ALT-REF)']]
-                flt3 = flt3_df.assign(Sample=f'{sample_name}')
-                flt3_fail_df = flt3_fail_df.append(
-                    flt3, ignore_index=True, sort=True)
+            flt3 = check_state.run(
+                f'ho_sample_flt3:{sample}', [sample], sample, lambda: ho_sample_flt3(sample))
+            if flt3 is not None:
+                flt3_fail.add_frame(flt3)
         except:
             cll_ws_check = True
+    flt3_fail_df = flt3_fail.frame(sort=True)
 
     # Handle scenario where FLT3 tab is empty for TSMP worksheets
     if flt3_fail_df.empty == False:
@@ -948,42 +1740,69 @@ def ho_flt3_check(ho_inp, qcs_result_df):
     else:
         raise Exception("Error- Check FLT3 tabs!")
 
-    qcs_result_df = qcs_result_df.append({'Check': flt3_check,
-                                          'Description': flt3_check_des,
-                                          'Result': flt3_check_res,
-                                          'Worksheet': worksheet}, ignore_index=True)
+    qcs_result_df = add_results(qcs_result_df, [
+        CheckResult(flt3_check, flt3_check_des, flt3_check_res, worksheet)])
 
     return qcs_result_df, flt3_fail_df
 
 
-def ho_coverage_check(ho_inp, qcs_result_df, gene_cov_thres):
+def ho_sample_coverage(sample, gene_cov_thres):
+    '''
+    Gene coverage (Coverage-gene tab) and exon coverage (Coverage-details tab) of a
+    sample's excel report
+    '''
+    pct_header = f'pct>{gene_cov_thres}x'
+    sample_sheets = dict(ho_sample_sheets(gene_cov_thres))
+
+    gene_cov_df = read_sheet(
+        sample, 'Coverage-gene', sample_sheets['Coverage-gene'])
+    # drop NaN values from bottom of sheet
+    gene_cov_df = gene_cov_df.dropna(subset=['Worksheet', 'Sample'])
+    gene_cov_df = gene_cov_df[['Sample', 'Gene', f'{pct_header}']]
+
+    exon_cov_df = read_sheet(
+        sample, 'Coverage-details', sample_sheets['Coverage-details'])
+    # drop NaN values from bottom of sheet
+    exon_cov_df = exon_cov_df.dropna(subset=['SAMPLE'])
+    exon_cov_df = exon_cov_df[['SAMPLE', 'GENE', 'Exon', 'Min_depth']]
+
+    return gene_cov_df, exon_cov_df
+
+
+def ho_coverage_check(ho_inp, qcs_result_df, gene_cov_thres, check_state=None):
     '''
     1. Merge all gene coverage and exon coverage in one
     2. Check if >80% for Coverage-gene in Coverage-gene tab (assign PASS/FAIL)
     3. Check if min_depth value in Coverage-details tab is <100 (assign PASS/FAIL)
     4. Return gene and exon fails as df
+    5. Check every samplesheet sample has a results excel report with Coverage-gene rows
+    (assign PASS/FAIL, the negative control has its own report and no gene coverage)
+    Coverage is read per sample through check_state so unchanged samples can be re-used.
     '''
+    if check_state == None:
+        check_state = CheckState()
     sample_list = ho_inp['pat_results']
     gene_cov_data = []
     exon_cov_data = []
     pct_header = f'pct>{gene_cov_thres}x'
 
     for sample in sample_list:
-        gene_cov_df = pd.read_excel(sample, 'Coverage-gene')
-        # drop NaN values from bottom of sheet
-        gene_cov_df = gene_cov_df.dropna(subset=['Worksheet', 'Sample'])
-        gene_cov_df = gene_cov_df[['Sample', 'Gene', f'{pct_header}']]
-
-        exon_cov_df = pd.read_excel(sample, 'Coverage-details')
-        # drop NaN values from bottom of sheet
-        exon_cov_df = exon_cov_df.dropna(subset=['SAMPLE'])
-        exon_cov_df = exon_cov_df[['SAMPLE', 'GENE', 'Exon', 'Min_depth']]
+        gene_cov_df, exon_cov_df = check_state.run(
+            f'ho_sample_coverage:{sample}', [sample], (sample, gene_cov_thres),
+            lambda: ho_sample_coverage(sample, gene_cov_thres))
         gene_cov_data.append(gene_cov_df)
         exon_cov_data.append(exon_cov_df)
 
     ws_gene_cov_df = pd.concat(gene_cov_data, ignore_index=True)
     ws_exon_cov_df = pd.concat(exon_cov_data, ignore_index=True)
 
+    samplesheet = ho_inp['samplesheet']
+    negative = os.path.basename(ho_inp['negative'])
+    no_results = samplesheet.missing(
+        [os.path.basename(sample) for sample in sample_list] + [negative])
+    no_coverage = [sample for sample in samplesheet.missing(ws_gene_cov_df['Sample'].astype(str))
+                   if sample not in no_results and sample != samplesheet.sample_of(negative)]
+
     # Show only Dnumbers in final table
     ws_gene_cov_df['Sample'] = ws_gene_cov_df['Sample'].str.extract(
         r'(D\d\d-\d{5})', expand=True)
@@ -1012,29 +1831,67 @@ def ho_coverage_check(ho_inp, qcs_result_df, gene_cov_thres):
     else:
         cov_exon_check_res = 'PASS'
 
-    qcs_result_df = qcs_result_df.append({'Check': cov_gene_check,
-                                          'Description': cov_gene_check_des,
-                                          'Result': cov_gene_check_res,
-                                          'Worksheet': worksheet}, ignore_index=True)
+    # a row of its own as the gene check description keys the low coverage genes modal
+    ss_check = 'Samplesheet sample check'
+    ss_check_des = 'All samples on the samplesheet have a results excel report with gene coverage.'
+    if no_results:
+        ss_check_des += (f' {len(no_results)} samples have no results excel report '
+                         f'({listed_samples(no_results)}).')
+    if no_coverage:
+        ss_check_des += (f' {len(no_coverage)} samples have no gene coverage rows '
+                         f'({listed_samples(no_coverage)}).')
+
+    if no_results or no_coverage:
+        ss_check_res = 'FAIL'
+    else:
+        ss_check_res = 'PASS'
 
-    qcs_result_df = qcs_result_df.append({'Check': cov_exon_check,
-                                          'Description': cov_exon_check_des,
-                                          'Result': cov_exon_check_res,
-                                          'Worksheet': worksheet}, ignore_index=True)
+    qcs_result_df = add_results(qcs_result_df, [
+        CheckResult(cov_gene_check, cov_gene_check_des, cov_gene_check_res, worksheet),
+        CheckResult(cov_exon_check, cov_exon_check_des, cov_exon_check_res, worksheet),
+        CheckResult(ss_check, ss_check_des, ss_check_res, worksheet)])
 
     return [qcs_result_df, exon_fail_df, gene_fail_df]
 
 
+def ho_metrics(ho_inp, gene_cov_thres):
+    '''
+    QC metrics of a TSMP/CLL worksheet for the metrics store, as (worksheet, sample,
+    feature, metric, value) records: %CONT and gene pct>{gene_cov_thres}x of each sample
+    and the max depth and singleton count of the negative sample
+    '''
+    worksheet = ho_inp['worksheet']
+    pct_header = f'pct>{gene_cov_thres}x'
+    records = []
+
+    verifybamid_df = read_sheet(ho_inp['pat_results'][0], 'VerifyBamId', sheet_columns(
+        'ho_verifybamid_check', 'VerifyBamId'))
+    records += [(worksheet, sample_id(sample), None, '%CONT', value)
+                for sample, value in zip(verifybamid_df['SAMPLE'], verifybamid_df['%CONT'])]
+
+    negative = sample_id(os.path.basename(ho_inp['negative']))
+    neg_exon_df = read_sheet(ho_inp['negative'], 'Coverage-exon', sheet_columns(
+        'ho_neg_checks', 'Coverage-exon'))
+    records.append((worksheet, negative, None, 'neg_max_depth', neg_exon_df['Max'].max()))
+    variants_all_df = read_sheet(ho_inp['negative'], 'Variants-all-data')
+    singletons = variants_all_df['FILTER'].str.contains('singleton', na=False).sum()
+    records.append((worksheet, negative, None, 'neg_singletons', singletons))
+
+    for sample in ho_inp['pat_results']:
+        gene_cov_df, _ = ho_sample_coverage(sample, gene_cov_thres)
+        records += [(worksheet, sample_id(sample_name), gene, pct_header, pct)
+                    for sample_name, gene, pct in zip(
+                        gene_cov_df['Sample'], gene_cov_df['Gene'], gene_cov_df[pct_header])]
+    return records
+
+
 def ho_neg_summary_table(ho_inp):
     '''
     A summary table to display information required for the negative sample
     This function also captures information to be added to a separate xls
     '''
 
-    ho_neg_table_df = pd.DataFrame(columns=['Singletons', 'ALT reads'])
-
-    xls = pd.ExcelFile(ho_inp['negative'])
-    variants_all_df = pd.read_excel(xls, 'Variants-all-data')
+    variants_all_df = read_sheet(ho_inp['negative'], 'Variants-all-data')
 
     # singleton summary
     singleton = variants_all_df[variants_all_df['FILTER'].str.contains(
@@ -1050,19 +1907,21 @@ def ho_neg_summary_table(ho_inp):
     # Show only SAMPLE -> AB columns for modal
     alt_df = alt_df.loc[:, 'SAMPLE':'AB']
 
-    ho_neg_table_df = ho_neg_table_df.append({'Singletons': singleton_res,
-                                              'ALT reads': alt_var_res,
-                                              }, ignore_index=True)
+    ho_neg_table_df = pd.DataFrame([{'Singletons': singleton_res,
+                                     'ALT reads': alt_var_res,
+                                     }], columns=['Singletons', 'ALT reads'])
 
     return [ho_neg_table_df, alt_df, alt_var]
 
 
 def ho_generate_html_output(
         run_details_df, qcs_result_df, pipeline_check_df,
-        pac_result_df, extra_info_list, ho_inp):
+        pac_result_df, extra_info_list, ho_inp, out_dir, trend_charts=''):
     '''
     Creating a static HTML file to display the results to the Clinical Scientist reviewing the quality check report.
     This process involves changes directly to the html.
+    trend_charts (QC metric trend charts from the metrics store) are added to the foot of the report.
+    The report is saved to out_dir and the path to the report returned.
     '''
     # assign additional variables
     ho_neg_table_df = extra_info_list[0]
@@ -1077,100 +1936,65 @@ def ho_generate_html_output(
 
     css_classes = ['table', 'table-striped']
 
-    # Create main HTML tables from dfs
-    run_details_html = run_details_df.to_html(
-        classes=css_classes, table_id='run_details_table', index=False, justify='left', border=0)
-    pipeline_check_html = pipeline_check_df.to_html(
-        classes=css_classes, table_id='run_details_check_table', index=False, justify='left', border=0)
-    qcs_results_html = qcs_result_df.to_html(
-        classes=css_classes, table_id='check_table', index=False, justify='left', border=0)
-    pac_results_html = pac_result_df.to_html(
-        classes=css_classes, table_id='check_pac_table', index=False, justify='left', border=0)
-
     # Create modal table and handle when dfs are empty- place holder text will be added to the modal.
     if gene_df.empty == True:
-        gene_df = pd.DataFrame(columns=['Message'])
         gene_mess = f'All samples in this worksheet have genes at >80% {gene_cov_thres}x.'
-        gene_df = gene_df.append({'Message': gene_mess}, ignore_index=True)
-        gene_html = gene_df.to_html(classes=css_classes, header=False,
-                                    index=False, justify='left', table_id='gene_fail_table', border=0)
+        gene_df = pd.DataFrame({'Message': [gene_mess]})
+        gene_html = render_table(
+            gene_df, cells=HO_CELL_STYLES, classes=css_classes, header=False, index=False, justify='left', table_id='gene_fail_table', border=0)
+    elif len(gene_df) > COMPACT_TABLE_ROWS:
+        # large fail lists: low coverage genes per sample, rows shown when the modal is opened
+        gene_summary_df = gene_df.groupby('Sample', dropna=False).agg(**{
+            'Low coverage genes': ('Gene', 'size'),
+            f'Lowest pct>{gene_cov_thres}x': (f'pct>{gene_cov_thres}x', 'min')}).reset_index()
+        gene_html = render_compact_table(
+            gene_df, gene_summary_df, 'gene_fail_table', cells=HO_CELL_STYLES, classes=css_classes, index=False, justify='left', table_id='gene_fail_summary_table', border=0)
     else:
-        gene_html = gene_df.to_html(classes=css_classes, header=True,
-                                    index=False, justify='left', table_id='gene_fail_table', border=0)
+        gene_html = render_table(
+            gene_df, cells=HO_CELL_STYLES, classes=css_classes, header=True, index=False, justify='left', table_id='gene_fail_table', border=0)
 
     if exon_df.empty == True:
-        exon_df = pd.DataFrame(columns=['Message'])
         exon_mess = 'All samples in this worksheet have exon coverage at 100X.'
-        exon_df = exon_df.append({'Message': exon_mess}, ignore_index=True)
-        exon_html = exon_df.to_html(classes=css_classes, header=False,
-                                    index=False, justify='left', table_id='exon_fail_table', border=0)
+        exon_df = pd.DataFrame({'Message': [exon_mess]})
+        exon_html = render_table(
+            exon_df, cells=HO_CELL_STYLES, classes=css_classes, header=False, index=False, justify='left', table_id='exon_fail_table', border=0)
+    elif len(exon_df) > COMPACT_TABLE_ROWS:
+        # large fail lists: failed exons and genes per sample, rows shown when the modal is opened
+        exon_summary_df = exon_df.groupby('SAMPLE', dropna=False).agg(**{
+            'Failed exons': ('Exon', 'size'),
+            'Genes': ('GENE', 'nunique'),
+            'Lowest Min_depth': ('Min_depth', 'min')}).reset_index()
+        exon_html = render_compact_table(
+            exon_df, exon_summary_df, 'exon_fail_table', cells=HO_CELL_STYLES, classes=css_classes, index=False, justify='left', table_id='exon_fail_summary_table', border=0)
     else:
-        exon_html = exon_df.to_html(classes=css_classes, header=True,
-                                    index=False, justify='left', table_id='exon_fail_table', border=0)
+        exon_html = render_table(
+            exon_df, cells=HO_CELL_STYLES, classes=css_classes, header=True, index=False, justify='left', table_id='exon_fail_table', border=0)
     if alt_df.empty == True:
-        alt_df = pd.DataFrame(columns=['Message'])
         alt_mess = 'The negative sample for this worksheet does not contain any variants with >= 10 alt reads.'
-        alt_df = alt_df.append({'Message': alt_mess}, ignore_index=True)
-        alt_html = alt_df.to_html(classes=css_classes, header=False,
-                                  index=False, justify='left', table_id='alt_fail_table', border=0)
+        alt_df = pd.DataFrame({'Message': [alt_mess]})
+        alt_html = render_table(
+            alt_df, cells=HO_CELL_STYLES, classes=css_classes, header=False, index=False, justify='left', table_id='alt_fail_table', border=0)
     else:
-        alt_html = alt_df.to_html(classes=css_classes, header=True,
-                                  index=False, justify='left', table_id='alt_fail_table', border=0)
+        alt_html = render_table(
+            alt_df, cells=HO_CELL_STYLES, classes=css_classes, header=True, index=False, justify='left', table_id='alt_fail_table', border=0)
     if verify_fail_df.empty == True:
-        verify_fail_df = pd.DataFrame(columns=['Message'])
         verify_fail_mess = 'All samples in this worksheet have a %CONT score < 10%.'
-        verify_fail_df = verify_fail_df.append(
-            {'Message': verify_fail_mess}, ignore_index=True)
-        verify_fail_html = verify_fail_df.to_html(
-            classes=css_classes, header=False, index=False, justify='left', table_id='verify_fail_table', border=0)
+        verify_fail_df = pd.DataFrame({'Message': [verify_fail_mess]})
+        verify_fail_html = render_table(
+            verify_fail_df, cells=HO_CELL_STYLES, classes=css_classes, header=False, index=False, justify='left', table_id='verify_fail_table', border=0)
     else:
-        verify_fail_html = verify_fail_df.to_html(
-            classes=css_classes, header=True, index=False, justify='left', table_id='verify_fail_table', border=0)
+        verify_fail_html = render_table(
+            verify_fail_df, cells=HO_CELL_STYLES, classes=css_classes, header=True, index=False, justify='left', table_id='verify_fail_table', border=0)
     if flt3_fail_df.empty == True:
-        flt3_fail_df = pd.DataFrame(columns=['Message'])
         flt3_fail_mess = 'No FLT3 ITD variants have been called.'
-        flt3_fail_df = flt3_fail_df.append(
-            {'Message': flt3_fail_mess}, ignore_index=True)
-        flt3_fail_html = flt3_fail_df.to_html(
-            classes=css_classes, header=False, index=False, justify='left', table_id='flt3_fail_table', border=0)
+        flt3_fail_df = pd.DataFrame({'Message': [flt3_fail_mess]})
+        flt3_fail_html = render_table(
+            flt3_fail_df, cells=HO_CELL_STYLES, classes=css_classes, header=False, index=False, justify='left', table_id='flt3_fail_table', border=0)
     else:
-        flt3_fail_html = flt3_fail_df.to_html(
-            classes=css_classes, header=True, index=False, justify='left', table_id='flt3_fail_table', border=0)
-
-    # create non-modal tables. These tables will be present within the description section of the checks table.
-    neg_details_html = ho_neg_table_df.to_html(
-        classes=css_classes, table_id='neg_table', index=False, justify='left', border=0)
-    file_size_html = file_size_df.to_html(
-        classes=css_classes, header=None, justify='left', table_id='file_size_table', border=0)
-    max_exon_html = max_row_exon_df.to_html(
-        classes=css_classes, header=None, justify='left', table_id='max_exon_table', border=0)
-
-    # read in html base file
-    with open('HO_base.html', 'r') as file:
-        base = file.read()
-
-    # Add panel name to title
-    panel = ho_inp['panel']
-    base = re.sub(r'_panel_name_', panel, base)
-    # Add main tables
-    sub_table_replace = [
-        (r'{run_details_html}', f'{run_details_html}'),
-        (r'{pipeline_check_html}', f'{pipeline_check_html}'),
-        (r'{qcs_results_html}', f'{qcs_results_html}'),
-        (r'{pac_results_html}', f'{pac_results_html}'),
-        (r'_vcf_min_max_', f'{file_size_html}'),
-        (r'_neg_exon_depth_', f'{max_exon_html}'),
-        (r'_neg_calls_', f'{neg_details_html}')
-    ]
-    for old, new in sub_table_replace:
-        base = re.sub(old, new, base)
-
-    html_report = base
-
-    # get modal template
-    with open('modal_base.html') as file:
-        modal_base = file.read()
+        flt3_fail_html = render_table(
+            flt3_fail_df, cells=HO_CELL_STYLES, classes=css_classes, header=True, index=False, justify='left', table_id='flt3_fail_table', border=0)
 
+    # set alt_call_num for html report
     modal_tables = [
         gene_html,
         exon_html,
@@ -1178,40 +2002,73 @@ def ho_generate_html_output(
         verify_fail_html,
         flt3_fail_html
     ]
-    # set alt_call_num for html report
     alt_call_num = int(
         re.search(r'(\d+) calls', ho_neg_table_df['ALT reads'].values[0]).group(1))
-    # add modals to html report
-    html_report = ho_add_modals(
-        html_report, modal_base, modal_tables, alt_call_num, gene_cov_thres)
-    # add PASS/FAIL colour
-    colour_replace = [
-        ("<td>PASS</td>", "<td style='color:green;'>PASS</td>"),
-        ("<td>FAIL</td>", "<td style='color:red;'>FAIL</td>")
-    ]
-    for old, new in colour_replace:
-        html_report = re.sub(old, new, html_report)
+    # cells of the check tables the modals are added to
+    with profiler.stage('modals'):
+        modal_cells = ho_modal_cells(modal_tables, alt_call_num, gene_cov_thres)
+    # PASS/FAIL colour is added as each table is rendered
+    cells = {**HO_CELL_STYLES, **modal_cells}
+
+    # create non-modal tables. These tables will be present within the description section of the checks table.
+    neg_details_html = render_table(
+        ho_neg_table_df, cells=cells, classes=css_classes, table_id='neg_table', index=False, justify='left', border=0)
+    file_size_html = render_table(
+        file_size_df, cells=cells, classes=css_classes, header=None, justify='left', table_id='file_size_table', border=0)
+    max_exon_html = render_table(
+        max_row_exon_df, cells=cells, classes=css_classes, header=None, justify='left', table_id='max_exon_table', border=0)
+    sub_tables = {
+        '_vcf_min_max_': file_size_html,
+        '_neg_exon_depth_': max_exon_html,
+        '_neg_calls_': neg_details_html
+    }
+
+    # Create main HTML tables from dfs
+    run_details_html = render_table(
+        run_details_df, cells=cells, slots=sub_tables, classes=css_classes, table_id='run_details_table', index=False, justify='left', border=0)
+    pipeline_check_html = render_table(
+        pipeline_check_df, cells=cells, slots=sub_tables, classes=css_classes, table_id='run_details_check_table', index=False, justify='left', border=0)
+    qcs_results_html = render_table(
+        qcs_result_df, cells=cells, slots=sub_tables, classes=css_classes, table_id='check_table', index=False, justify='left', border=0)
+    pac_results_html = render_table(
+        pac_result_df, cells=cells, slots=sub_tables, classes=css_classes, table_id='check_pac_table', index=False, justify='left', border=0)
+
+    # read in html base file and add panel name to title and main tables
+    panel = ho_inp['panel']
+    base = load_template(os.path.join(script_dir, 'HO_base.html'), (
+        '_panel_name_', '{run_details_html}', '{pipeline_check_html}',
+        '{qcs_results_html}', '{pac_results_html}', '{report_foot}', '{report_scripts}'))
+    # script showing the rows of compact detail tables
+    report_scripts = ''
+    if 'class="compact_table"' in gene_html + exon_html:
+        report_scripts = compact_table_script(os.path.join(script_dir, 'compact_table.js'))
+    with profiler.stage('templates'):
+        html_report = base.render({
+            '_panel_name_': panel,
+            '{run_details_html}': run_details_html,
+            '{pipeline_check_html}': pipeline_check_html,
+            '{qcs_results_html}': qcs_results_html,
+            '{pac_results_html}': pac_results_html,
+            '{report_foot}': trend_charts,
+            '{report_scripts}': report_scripts
+        })
+    html_report = profiler.add_html_table(html_report)
 
     worksheet_num = run_details_df['Worksheet'].squeeze()
     html_name = f'{worksheet_num}_{panel}_quality_checks.html'
 
-    ws_1_out = args.ws_1 + f'excel_reports_{panel}_{worksheet_num}/'
-    # save HTML report into excel reports directory
-    if args.out_dir == None:
-        os.chdir(ws_1_out)
-        print(f'Saving {html_name} report to {ws_1_out}')
-        with open(html_name, 'w') as file:
-            file.write(html_report)
-    else:
-        # save HTML report into specified out dir
-        print(f'Saving {html_name} report to {args.out_dir}')
-        os.chdir(args.out_dir)
-        with open(html_name, 'w') as file:
-            file.write(html_report)
+    # save HTML report into excel reports directory or specified out dir
+    print(f'Saving {html_name} report to {out_dir}')
+    report_path = os.path.join(out_dir, html_name)
+    with open(report_path, 'w') as file:
+        file.write(html_report)
+
+    return report_path
 
-def ho_add_modals(html_report, modal_base, modal_tables, alt_call_num, gene_cov_thres):
+def ho_modal_cells(modal_tables, alt_call_num, gene_cov_thres):
     '''
-    A df to modals and modals to html_report
+    A df to modals. Returns the check table cells the modals are added to, as
+    {cell html: cell html with modal} (see render_table).
     '''
     gene_modal_name = 'Low_coverage_genes'
     exon_modal_name = 'Failed_exons'
@@ -1233,23 +2090,27 @@ def ho_add_modals(html_report, modal_base, modal_tables, alt_call_num, gene_cov_
         (flt3_modal_name, flt3_modal_title, modal_tables[4])
     ]
 
+    modal_base = load_template(os.path.join(script_dir, 'modal_base.html'), (
+        '_modal_name_', '_modal_title_', '_modal_table_', 'modal-dialog', 'btn pull-right'))
     add_modal_list = []
     # creating each model for html report
     for modal in modal_list:
-        sub_mod = modal_base
-        modal_replace = [
-            (r'_modal_name_', f'{modal[0]}'),
-            (r'_modal_title_', f'{modal[1]}'),
-            (r'_modal_table_', f'{modal[2]}')
-        ]
-        for old, new in modal_replace:
-            sub_mod = re.sub(old, new, sub_mod)
+        modal_replace = {
+            '_modal_name_': modal[0],
+            '_modal_title_': modal[1],
+            '_modal_table_': modal[2],
+            'modal-dialog': 'modal-dialog',
+            'btn pull-right': 'btn pull-right'
+        }
         # add large modal for alt, verify and flt3
         if modal[0] == 'Low_coverage_genes' or modal[0] == 'Failed_exons':
             pass
         else:
-            sub_mod = re.sub(r'modal-dialog', 'modal-dialog modal-lg', sub_mod)
-        add_modal_list.append(sub_mod)
+            modal_replace['modal-dialog'] = 'modal-dialog modal-lg'
+        # alt variants modal button is not floated right
+        if modal[0] == 'alt_variants':
+            modal_replace['btn pull-right'] = 'btn'
+        add_modal_list.append(modal_base.render(modal_replace))
 
     failed_gene_modal = add_modal_list[0]
     failed_exon_modal = add_modal_list[1]
@@ -1257,33 +2118,154 @@ def ho_add_modals(html_report, modal_base, modal_tables, alt_call_num, gene_cov_
     verify_fail_modal = add_modal_list[3]
     flt3_fail_modal = add_modal_list[4]
 
-    des_modal_pos = [
-        (rf'<td>All samples in this worksheet have genes at &gt;80% {gene_cov_thres}x.</td>',
-         f'<td>All samples in this worksheet have genes at &gt;80% {gene_cov_thres}x.{failed_gene_modal}</td>'),
-        (r'<td>All samples in this worksheet have exon coverage at 100x.</td>',
-         f'<td>All samples in this worksheet have exon coverage at 100x.{failed_exon_modal}</td>'),
-        (f'<td>{alt_call_num} calls &gt;= 10 alt reads</td>',
-         f'<td>{alt_call_num} calls &gt;= 10 alt reads {alt_var_modal}</td>'),
-        (r'<td>Percentage contamination is below 10%.</td>',
-         f'<td>Percentage contamination is below 10%. {verify_fail_modal}</td>'),
-        (r'<td>FLT3 ITD variants are present on the FLT3 tab for samples on this worksheet.</td>',
-         f'<td>FLT3 ITD variants are present on the FLT3 tab for samples on this worksheet. {flt3_fail_modal}</td>'),
-        ('<button type="button" class="btn pull-right" data-toggle="modal" data-target="#alt_variants">Details</button>',
-         '<button type="button" class="btn" data-toggle="modal" data-target="#alt_variants">Details</button>')
-    ]
+    return {
+        f'<td>All samples in this worksheet have genes at &gt;80% {gene_cov_thres}x.</td>':
+            f'<td>All samples in this worksheet have genes at &gt;80% {gene_cov_thres}x.{failed_gene_modal}</td>',
+        '<td>All samples in this worksheet have exon coverage at 100x.</td>':
+            f'<td>All samples in this worksheet have exon coverage at 100x.{failed_exon_modal}</td>',
+        f'<td>{alt_call_num} calls &gt;= 10 alt reads</td>':
+            f'<td>{alt_call_num} calls &gt;= 10 alt reads {alt_var_modal}</td>',
+        '<td>Percentage contamination is below 10%.</td>':
+            f'<td>Percentage contamination is below 10%. {verify_fail_modal}</td>',
+        '<td>FLT3 ITD variants are present on the FLT3 tab for samples on this worksheet.</td>':
+            f'<td>FLT3 ITD variants are present on the FLT3 tab for samples on this worksheet. {flt3_fail_modal}</td>'
+    }
 
-    for old, new in des_modal_pos:
-        html_report = re.sub(old, new, html_report)
 
-    return html_report
+def use_sheet_cache(cache_dir):
+    '''
+    Load and save parsed excel sheets in an on-disk cache (see sheet_cache.py)
+    '''
+    # pyarrow is only imported when the sheet cache is used
+    from sheet_cache import SheetDiskCache
+    workbook_cache.disk_cache = SheetDiskCache(cache_dir)
 
 
-# Generic regex used to extact ws_num etc
-panel_regex = r'\/(TSHC|TSMP|CLL)_(\d{6})_(v[\.]?\d\.\d\.\d)\/'
-# define inputs
-ws_1 = args.ws_1
-ws_2 = args.ws_2
-sample_sheet = args.s
+def run_qc(ws_1, ws_2=None, sample_sheet=None, out_dir=None, jobs=1, incremental=None,
+           cache_dir=None, profile=None, cprofile_dir=None, metrics_db=None, vcf_stats=False,
+           fastq_dirs=None, bam_dirs=None, coverage_bed=None):
+    '''
+    Run the quality checks for a worksheet (TSMP/CLL, sample_sheet required) or a pair of
+    worksheets (TSHC) and save the HTML report. Returns a QCResult with the report paths
+    and the result of each check, e.g.
+
+        from quality_check import run_qc
+        qc = run_qc('/path/to/TSMP_000001_v1.0.3/', sample_sheet='/path/to/SampleSheet.csv')
+        qc.passed, qc.failed, qc.report_paths
+    '''
+    if cache_dir != None:
+        use_sheet_cache(cache_dir)
+    return assign_panel(ws_1, ws_2, sample_sheet, out_dir, jobs, incremental, profile,
+                        cprofile_dir, metrics_db, vcf_stats, fastq_dirs, bam_dirs, coverage_bed)
+
+
+def run_precheck(ws_1, ws_2=None, sample_sheet=None):
+    '''
+    Run only the file-level gates (VCF counts and sizes, SRY report, kinship report,
+    command log and negative sample report) for a worksheet or TSHC pair. No excel
+    reports are read and pandas is not imported. Returns a list of CheckResult records.
+    '''
+    run_info = re.search(panel_regex, ws_1)
+    if run_info == None:
+        raise Exception('Run information not available! Check regex pattern.')
+    panel, worksheet = run_info.group(1), run_info.group(2)
+
+    if panel == 'TSHC':
+        ws_2_info = re.search(panel_regex, ws_2 or '')
+        if ws_2_info == None:
+            raise Exception('A second TSHC worksheet (-ws_2) is required.')
+        return tshc_precheck(panel, ws_1, ws_2, [worksheet, ws_2_info.group(2)])
+    if sample_sheet == None:
+        raise Exception(
+            "A samplesheet has not been provided... check the command")
+    return ho_precheck(panel, ws_1, worksheet, sample_sheet)
+
+
+def print_precheck(results):
+    '''
+    Print pre-check results (tab separated) and return True if all gates passed
+    '''
+    for result in results:
+        print(f'{result.result}\t{result.worksheet}\t{result.check}\t{result.description}')
+    return all(result.result == 'PASS' for result in results)
+
+
+def parse_args(argv=None):
+    '''
+    Command line arguments
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-ws_1', action='store',
+                        help='Path to worksheet 1 output files (TSHC/TSMP/CLL) include TSHC_<ws>_version dir')
+    parser.add_argument('-ws_2', action='store',
+                        help='Path to worksheet 2 output files (TSHC) include TSHC_<ws>_version dir')
+    parser.add_argument('-out_dir', action='store',
+                        help='Specifing an output directory to store html reports')
+    parser.add_argument('-s', action='store',
+                        help='SampleSheet required for HO panel quality checks')
+    parser.add_argument('-jobs', '--jobs', action='store', type=int, default=1,
+                        help='Number of processes used to read per-sample excel reports (TSMP/CLL) and threads used to run independent checks')
+    parser.add_argument('-cache_dir', '--cache_dir', action='store',
+                        help='Optional directory to cache parsed excel sheets between runs (requires pyarrow)')
+    parser.add_argument('-incremental', '--incremental', nargs='?', const='stat', choices=['stat', 'hash'],
+                        help='Re-use stored results for checks whose inputs are unchanged (by size/mtime, or content hash)')
+    parser.add_argument('-batch', '--batch', action='store',
+                        help='Manifest (tsv) of worksheets to check in a single run: ws_1, ws_2, samplesheet, out_dir')
+    parser.add_argument('-precheck', '--precheck', action='store_true',
+                        help='Only run the file-level gates (no excel reports are read). Exits with status 1 if any gate fails')
+    parser.add_argument('-profile', '--profile', nargs='?', const='json', choices=['json', 'html'],
+                        help='Save the time and workbook reads of each stage as <report>.profile.json (html: also add a timing table to the report)')
+    parser.add_argument('-cprofile_dir', '--cprofile_dir', action='store',
+                        help='Save a cProfile dump of each stage to this directory (implies -profile)')
+    parser.add_argument('-metrics_db', '--metrics_db', action='store',
+                        help='SQLite database to save the QC metrics of each run to (trend charts are added to the report)')
+    parser.add_argument('-vcf_stats', '--vcf_stats', action='store_true',
+                        help='Decompress every VCF (across -jobs processes) to check its sample and record count (VCF content check)')
+    parser.add_argument('-fastq_dir', '--fastq_dir', nargs='+',
+                        help='Directories (searched recursively) of the TSHC FASTQs, used to verify the FASTQ read counts of the fastq-bam-check workbooks')
+    parser.add_argument('-bam_dir', '--bam_dir', nargs='+',
+                        help='Directories (searched recursively) of the TSHC BAMs, used to verify the BAM read counts of the fastq-bam-check workbooks from the BAM indexes')
+    parser.add_argument('-coverage_bed', '--coverage_bed', action='store',
+                        help='Coverage BED for the negative control BAM depth check (with -bam_dir). TSHC default: coverage_regions of the pipeline config')
+    args = parser.parse_args(argv)
+    if args.ws_1 == None and args.batch == None:
+        parser.error('one of the arguments -ws_1 or -batch is required')
+    if args.cprofile_dir != None and args.profile == None:
+        args.profile = 'json'
+    return args
+
+
+def main(argv=None):
+    '''
+    Command line entry point
+    '''
+    args = parse_args(argv)
+    if args.precheck:
+        if args.batch != None:
+            results = []
+            for entry in read_batch_manifest(args.batch):
+                try:
+                    results += run_precheck(entry['ws_1'], entry['ws_2'], entry['sample_sheet'])
+                except Exception as error:
+                    # an error for one worksheet does not stop the remaining worksheets
+                    results.append(CheckResult(
+                        'Pre-check', f'{type(error).__name__}: {error}', 'FAIL', entry['ws_1']))
+        else:
+            results = run_precheck(args.ws_1, args.ws_2, args.s)
+        sys.exit(0 if print_precheck(results) else 1)
+
+    # Assign panel and start workflow (or run all worksheets in a batch manifest)
+    if args.batch != None:
+        if args.cache_dir != None:
+            use_sheet_cache(args.cache_dir)
+        run_batch(args.batch, args.out_dir, args.jobs, args.incremental, args.profile,
+                  args.cprofile_dir, args.metrics_db, args.vcf_stats, args.fastq_dir, args.bam_dir,
+                  args.coverage_bed)
+    else:
+        run_qc(args.ws_1, args.ws_2, args.s, args.out_dir, args.jobs, args.incremental,
+               args.cache_dir, args.profile, args.cprofile_dir, args.metrics_db, args.vcf_stats,
+               args.fastq_dir, args.bam_dir, args.coverage_bed)
+
 
-# Assign panel and start workflow
-assign_panel(ws_1, ws_2, sample_sheet)
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+'''
+Machine-readable export of the quality check results, saved alongside the HTML report
+so downstream systems (e.g. a LIMS) do not need to parse the report:
+
+    <report>.json                  run details, every check result and the detail tables
+    <report>.<detail>.parquet      each detail table (only if pyarrow is installed)
+'''
+import os
+import json
+
+
+EXPORT_VERSION = 1
+
+
+def frame_records(df):
+    '''
+    DataFrame rows as JSON compatible dicts (numpy values converted, NaN as None)
+    '''
+    return json.loads(df.to_json(orient='records', date_format='iso'))
+
+
+def write_parquet(df, path):
+    '''
+    Save a detail table as Parquet. Columns of mixed types (e.g. a depth column holding
+    a message) are saved as strings.
+    '''
+    import pyarrow as pa
+    import pyarrow.parquet
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].map(lambda value: None if value is None else str(value))
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    pyarrow.parquet.write_table(table, path)
+
+
+def parquet_available():
+    '''
+    True if pyarrow is installed. It is only imported when results are exported, so
+    importing quality_check (and -precheck) does not pay its import cost.
+    '''
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+
+def export_results(qc_result, run_details_df=None):
+    '''
+    Save the JSON (and Parquet) export of a QCResult next to each of its HTML reports.
+    run_details_df replaces qc_result.run_details in the export if the report table
+    differs from the values (e.g. TSHC bed files). Returns the paths of the JSON exports.
+    '''
+    parquet = parquet_available()
+    if run_details_df is None:
+        run_details_df = qc_result.run_details
+    document = {
+        'version': EXPORT_VERSION,
+        'panel': qc_result.panel,
+        'worksheets': qc_result.worksheets,
+        'passed': qc_result.passed,
+        'run_details': frame_records(run_details_df),
+        'checks': [{'worksheet': check.worksheet, 'check': check.check,
+                    'description': check.description, 'result': check.result}
+                   for check in qc_result.checks],
+        'details': {name: frame_records(df) for name, df in qc_result.details.items()}
+    }
+
+    export_paths = []
+    for report_path in qc_result.report_paths:
+        base_path = os.path.splitext(report_path)[0]
+        document['report_path'] = report_path
+        document['parquet'] = {}
+        if parquet:
+            for name, df in qc_result.details.items():
+                if df.empty:
+                    continue
+                parquet_path = f'{base_path}.{name}.parquet'
+                write_parquet(df, parquet_path)
+                document['parquet'][name] = parquet_path
+
+        export_path = base_path + '.json'
+        with open(export_path, 'w') as file:
+            json.dump(document, file, indent=2)
+        export_paths.append(export_path)
+    return export_paths
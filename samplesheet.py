@@ -0,0 +1,108 @@
+'''
+In-memory model of the [Data] section of a W7/W10 samplesheet. W7 samplesheets are true
+CSVs (blank lines and short lines are padded with commas) whereas W10 samplesheets skip
+the commas, so each row is padded or cut to the number of [Data] columns. Rows are
+indexed on Sample_ID and D number for constant time lookups of a sample (or a file
+named after a sample) without pandas.
+'''
+import re
+import csv
+from prefetch import open_input
+
+
+D_NUMBER = re.compile(r'D\d\d-\d{5,6}')
+# characters a sample name is followed by in the name of a file of the sample
+FILE_NAME_SEPARATORS = re.compile(r'[._-]')
+
+
+class SampleSheet:
+    '''
+    Samples of a samplesheet: columns (the [Data] header), rows (a dict of column to
+    value for each row with a Sample_ID, in samplesheet order) and an index of row
+    number keyed on Sample_ID and on D number (the first row with a D number if it is
+    repeated).
+    '''
+
+    def __init__(self, columns, rows, path=None):
+        self.columns = columns
+        self.rows = rows
+        self.path = path
+        self.index = {}
+        for i, row in enumerate(rows):
+            self.index.setdefault(row['Sample_ID'], i)
+            d_number = D_NUMBER.search(row['Sample_ID'])
+            if d_number:
+                self.index.setdefault(d_number.group(0), i)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __repr__(self):
+        return f'SampleSheet({self.path!r})'
+
+    @property
+    def sample_ids(self):
+        return [row['Sample_ID'] for row in self.rows]
+
+    def row(self, key):
+        '''
+        Row of a sample by Sample_ID or D number, None if not on the samplesheet
+        '''
+        i = self.index.get(key)
+        return None if i == None else self.rows[i]
+
+    def sample_of(self, name):
+        '''
+        Sample_ID of the sample a file name belongs to: the longest prefix of the name
+        ending at a '.', '_' or '-' which is a Sample_ID (e.g. the sample of
+        <sample>.v1.0.3-results.xlsx), None if the file is not of a samplesheet sample
+        '''
+        ends = [match.start() for match in FILE_NAME_SEPARATORS.finditer(name)] + [len(name)]
+        for end in reversed(ends):
+            i = self.index.get(name[:end])
+            if i != None and self.rows[i]['Sample_ID'] == name[:end]:
+                return name[:end]
+        return None
+
+    def missing(self, names):
+        '''
+        Sample_IDs (in samplesheet order) of the samples with none of the file names
+        '''
+        found = {self.sample_of(name) for name in names}
+        return [sample for sample in self.sample_ids if sample not in found]
+
+
+def parse_samplesheet(lines, path=None):
+    '''
+    SampleSheet of the lines of a W7/W10 samplesheet. Rows without a Sample_ID (e.g.
+    the comma only blank lines of W7 samplesheets) are not samples.
+    '''
+    for i, line in enumerate(lines):
+        if '[Data]' in line:
+            data_lines = lines[i + 1:]
+            break
+    else:
+        raise Exception(f'No [Data] lines found in SampleSheet at:\n {path}')
+
+    data = csv.reader(data_lines)
+    columns = next(data, [])
+    if 'Sample_ID' not in columns:
+        raise Exception(f'No Sample_ID column in the [Data] section of SampleSheet at:\n {path}')
+    rows = []
+    for values in data:
+        values = (values + [''] * len(columns))[:len(columns)]
+        row = dict(zip(columns, values))
+        if row['Sample_ID'].strip() != '':
+            rows.append(row)
+    return SampleSheet(columns, rows, path)
+
+
+def read_samplesheet(path):
+    '''
+    SampleSheet of a samplesheet file
+    '''
+    with open_input(path, newline='') as file:
+        return parse_samplesheet(file.read().splitlines(), path)
@@ -0,0 +1,158 @@
+import os
+import re
+import time
+import hashlib
+import argparse
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+
+class SheetDiskCache:
+    '''
+    Opt-in on-disk cache of parsed workbook sheets, stored as uncompressed Arrow IPC
+    files so later runs can memory-map them instead of re-parsing the excel report.
+
+    Files are keyed by a content hash of the workbook, so re-running the quality checks
+    on an unchanged worksheet re-uses the sheets from a previous run while a regenerated
+    workbook is parsed again:
+        <cache_dir>/<hash[:2]>/<hash>/<sheet>[-<columns hash>].arrow
+    A sheet absent from the workbook is recorded with a .missing marker file.
+    '''
+
+    def __init__(self, cache_dir):
+        if pa is None:
+            raise Exception('pyarrow is required to use the sheet cache (-cache_dir)')
+        self.cache_dir = os.path.abspath(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hashes = {}
+
+    def content_hash(self, key):
+        '''
+        blake2b hash of the workbook content. key is the (path, size, mtime) workbook
+        key used by WorkbookCache and the hash is calculated once per key.
+        '''
+        if key not in self.hashes:
+            digest = hashlib.blake2b(digest_size=20)
+            with open(key[0], 'rb') as file:
+                for block in iter(lambda: file.read(1024 ** 2), b''):
+                    digest.update(block)
+            self.hashes[key] = digest.hexdigest()
+        return self.hashes[key]
+
+    def sheet_path(self, key, sheet_name, columns):
+        '''
+        Path to the cached sheet (without extension)
+        '''
+        content_hash = self.content_hash(key)
+        name = re.sub(r'[^\w.-]', '_', sheet_name)
+        if columns is not None:
+            cols_hash = hashlib.blake2b(
+                '\t'.join(map(str, columns)).encode(), digest_size=6).hexdigest()
+            name = f'{name}-{cols_hash}'
+        return os.path.join(self.cache_dir, content_hash[:2], content_hash, name)
+
+    def load(self, key, sheet_name, columns):
+        '''
+        Returns (found, DataFrame). The DataFrame is None if the sheet was recorded as
+        missing from the workbook.
+        '''
+        path = self.sheet_path(key, sheet_name, columns)
+        if os.path.exists(path + '.missing'):
+            os.utime(path + '.missing')
+            return True, None
+        if not os.path.exists(path + '.arrow'):
+            return False, None
+
+        with pa.memory_map(path + '.arrow') as source:
+            sheet_df = pa.ipc.open_file(source).read_all().to_pandas()
+        # access time recorded on the file mtime for pruning
+        os.utime(path + '.arrow')
+        return True, sheet_df
+
+    def save(self, key, sheet_name, columns, sheet_df):
+        '''
+        Write a sheet to the cache. Sheets which cannot be stored losslessly in Arrow
+        (e.g. columns of mixed types) are not cached.
+        '''
+        path = self.sheet_path(key, sheet_name, columns)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if sheet_df is None:
+            open(path + '.missing', 'w').close()
+            return
+        if not all(isinstance(col, str) for col in sheet_df.columns):
+            return
+        try:
+            table = pa.Table.from_pandas(sheet_df)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            return
+
+        # write to a temporary file so an interrupted run cannot leave a partial sheet
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path + '.arrow')
+
+
+def cache_files(cache_dir):
+    '''
+    List (path, size, mtime) for every file in the cache
+    '''
+    files = []
+    for root, _, names in os.walk(cache_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            files.append((path, stat.st_size, stat.st_mtime))
+    return files
+
+
+def prune_cache(cache_dir, max_bytes=None, max_age_days=None):
+    '''
+    Remove cached sheets not used within max_age_days, then remove the least recently
+    used sheets until the cache is no larger than max_bytes.
+    Returns the number of files and bytes removed.
+    '''
+    files = sorted(cache_files(cache_dir), key=lambda file: file[2])
+    remove = []
+
+    if max_age_days is not None:
+        cutoff = time.time() - max_age_days * 24 * 60 * 60
+        remove = [file for file in files if file[2] < cutoff]
+        files = [file for file in files if file[2] >= cutoff]
+
+    if max_bytes is not None:
+        total = sum(file[1] for file in files)
+        for file in files:
+            if total <= max_bytes:
+                break
+            remove.append(file)
+            total -= file[1]
+
+    for path, _, _ in remove:
+        os.remove(path)
+    # tidy up empty workbook directories
+    for root, dirs, names in os.walk(cache_dir, topdown=False):
+        if root != cache_dir and not dirs and not names:
+            os.rmdir(root)
+
+    return len(remove), sum(file[1] for file in remove)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Prune the quality check sheet cache by size and/or age')
+    parser.add_argument('cache_dir', help='Path to the sheet cache directory')
+    parser.add_argument('-max_size_mb', '--max_size_mb', type=float,
+                        help='Remove least recently used sheets until the cache is below this size')
+    parser.add_argument('-max_age_days', '--max_age_days', type=float,
+                        help='Remove sheets not used within this many days')
+    args = parser.parse_args()
+
+    max_bytes = None if args.max_size_mb is None else int(args.max_size_mb * 1024 ** 2)
+    num_files, num_bytes = prune_cache(args.cache_dir, max_bytes, args.max_age_days)
+    print(f'Removed {num_files} files ({round(num_bytes / 1024 ** 2, 1)} MB) from {args.cache_dir}')
@@ -0,0 +1,46 @@
+'''
+Builders of tiny BAM files (BGZF blocks of alignment records) for the tests
+'''
+import struct
+import zlib
+
+
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+CIGAR_OPS = {'M': 0, 'I': 1, 'D': 2, 'N': 3, 'S': 4, '=': 7, 'X': 8}
+
+
+def bgzf_block(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    return (b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00' +
+            struct.pack('<H', len(compressed) + 25) + compressed +
+            struct.pack('<II', zlib.crc32(data), len(data)))
+
+
+def bam_record(ref, pos, flag, cigar=((4, 'M'),)):
+    '''
+    An alignment record of a read at pos (0-based) with a CIGAR of (length, op) pairs
+    '''
+    name = b'r\0'
+    operations = [(length << 4) | CIGAR_OPS[op] for length, op in cigar]
+    seq_len = sum(length for length, op in cigar if op in 'MIS=X')
+    body = struct.pack('<iiBBHHHiiii', ref, pos, len(name), 60, 4680, len(operations), flag,
+                       seq_len, -1, -1, 0)
+    body += name + struct.pack(f'<{len(operations)}I', *operations)
+    body += b'\x11' * ((seq_len + 1) // 2) + b'\x1e' * seq_len
+    return struct.pack('<i', len(body)) + body
+
+
+def bam_data(references, records, records_per_block=4):
+    '''
+    A BAM of references ((name, length) pairs) and records, with the header and every
+    records_per_block records in a BGZF block of their own
+    '''
+    text = b'@HD\tVN:1.6\n'
+    header = b'BAM\x01' + struct.pack('<i', len(text)) + text + struct.pack('<i', len(references))
+    for name, length in references:
+        name = name.encode()
+        header += struct.pack('<i', len(name) + 1) + name + b'\0' + struct.pack('<i', length)
+    blocks = [header] + [b''.join(records[i:i + records_per_block])
+                         for i in range(0, len(records), records_per_block)]
+    return b''.join(bgzf_block(block) for block in blocks) + BGZF_EOF
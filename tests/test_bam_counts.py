@@ -0,0 +1,106 @@
+'''
+Read counts from tiny BAI and CSI indexes (and the BAMs they index) with known mapped,
+unmapped and unplaced counts
+'''
+import gzip
+import struct
+import pytest
+from bam_counts import bai_counts, csi_counts, read_index_counts, bam_counts
+from bam_fixtures import bam_data, bam_record
+
+
+MAPPED = [5, 0, 2]
+UNMAPPED = [1, 3, 0]
+UNPLACED = 4
+
+
+def bam_counts_data(mapped, unmapped, unplaced):
+    '''
+    A BAM (one BGZF block per 4 records) of len(mapped) references
+    '''
+    records = []
+    for ref in range(len(mapped)):
+        records += [bam_record(ref, 0, 0)] * mapped[ref] + [bam_record(ref, 0, 4)] * unmapped[ref]
+    records += [bam_record(-1, -1, 4)] * unplaced
+    references = [(f'chr{i + 1}', 1000) for i in range(len(mapped))]
+    return bam_data(references, records)
+
+
+def bai_data(mapped, unmapped, unplaced):
+    '''
+    A BAI with a pseudo-bin between ordinary bins of each reference
+    '''
+    data = b'BAI\x01' + struct.pack('<i', len(mapped))
+    for ref_mapped, ref_unmapped in zip(mapped, unmapped):
+        bins = [(4681, [(100, 200), (300, 400)]), (37450, [(1, 2), (ref_mapped, ref_unmapped)]),
+                (4682, [(500, 600)])]
+        data += struct.pack('<i', len(bins))
+        for bin_id, chunks in bins:
+            data += struct.pack('<Ii', bin_id, len(chunks))
+            data += b''.join(struct.pack('<QQ', *chunk) for chunk in chunks)
+        data += struct.pack('<i', 3) + struct.pack('<QQQ', 1, 2, 3)
+    return data + struct.pack('<Q', unplaced)
+
+
+def csi_data(mapped, unmapped, unplaced, depth=5):
+    '''
+    A (decompressed) CSI of the given depth with auxiliary data
+    '''
+    pseudo_bin = ((1 << ((depth + 1) * 3)) - 1) // 7 + 1
+    aux = b'abc'
+    data = b'CSI\x01' + struct.pack('<iii', 14, depth, len(aux)) + aux
+    data += struct.pack('<i', len(mapped))
+    for ref_mapped, ref_unmapped in zip(mapped, unmapped):
+        bins = [(9, [(100, 200)]), (pseudo_bin, [(1, 2), (ref_mapped, ref_unmapped)])]
+        data += struct.pack('<i', len(bins))
+        for bin_id, chunks in bins:
+            data += struct.pack('<IQi', bin_id, 77, len(chunks))
+            data += b''.join(struct.pack('<QQ', *chunk) for chunk in chunks)
+    return data + struct.pack('<Q', unplaced)
+
+
+def assert_counts(counts, source):
+    assert counts.mapped == MAPPED
+    assert counts.unmapped == UNMAPPED
+    assert counts.unplaced == UNPLACED
+    assert (counts.total_mapped, counts.total_unmapped, counts.total) == (7, 8, 15)
+    assert counts.source == source
+
+
+def test_bai_counts():
+    assert_counts(bai_counts(bai_data(MAPPED, UNMAPPED, UNPLACED)), 'index')
+
+
+def test_csi_counts():
+    assert_counts(csi_counts(csi_data(MAPPED, UNMAPPED, UNPLACED)), 'index')
+    counts = csi_counts(csi_data(MAPPED, UNMAPPED, UNPLACED, depth=6))
+    assert counts.mapped == MAPPED and counts.unmapped == UNMAPPED
+
+
+def test_index_without_unplaced_count():
+    counts = bai_counts(bai_data(MAPPED, UNMAPPED, 0)[:-8])
+    assert counts.mapped == MAPPED and counts.unplaced == 0
+
+
+def test_bad_index_magic():
+    with pytest.raises(Exception, match='Not a BAI index'):
+        bai_counts(b'CSI\x01')
+    with pytest.raises(Exception, match='Not a CSI index'):
+        csi_counts(b'BAI\x01')
+
+
+def test_read_index_counts(tmp_path):
+    bai = tmp_path / 'sample.bam.bai'
+    bai.write_bytes(bai_data(MAPPED, UNMAPPED, UNPLACED))
+    csi = tmp_path / 'sample.bam.csi'
+    csi.write_bytes(gzip.compress(csi_data(MAPPED, UNMAPPED, UNPLACED)))
+    assert_counts(read_index_counts(str(bai)), 'index')
+    assert_counts(read_index_counts(str(csi)), 'index')
+
+
+def test_bam_counts_index_and_scan(tmp_path):
+    bam = tmp_path / 'sample.bam'
+    bam.write_bytes(bam_counts_data(MAPPED, UNMAPPED, UNPLACED))
+    assert_counts(bam_counts(str(bam), threads=2), 'scan')
+    (tmp_path / 'sample.bai').write_bytes(bai_data(MAPPED, UNMAPPED, UNPLACED))
+    assert_counts(bam_counts(str(bam)), 'index')
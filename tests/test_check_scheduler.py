@@ -0,0 +1,85 @@
+'''
+Check scheduler: results in registration order whatever the completion order,
+dependencies run first, sheets loaded once, and a failing dependency
+'''
+import threading
+import time
+import pytest
+import check_scheduler
+from check_scheduler import CheckUnit, run_checks
+
+
+def recording_unit(name, order, result=None, delay=0, depends=(), sheets=()):
+    def run():
+        time.sleep(delay)
+        order.append(name)
+        return name if result == None else result
+    return CheckUnit(name, run, sheets=sheets, depends=depends)
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_results_in_registration_order(jobs):
+    order = []
+    units = [recording_unit('slow', order, delay=0.2),
+             recording_unit('fast', order),
+             recording_unit('after_slow', order, depends=['slow'])]
+    results = run_checks(units, jobs)
+    assert list(results) == ['slow', 'fast', 'after_slow']
+    assert order.index('after_slow') > order.index('slow')
+    if jobs > 1:
+        assert order == ['fast', 'slow', 'after_slow']
+
+
+def test_failing_dependency_result_in_order():
+    # a dependency whose check FAILs (a result, not an error) does not stop its dependents
+    order = []
+    units = [recording_unit('report', order, depends=['integrity']),
+             recording_unit('integrity', order, result='FAIL', delay=0.1),
+             recording_unit('other', order)]
+    results = run_checks(units, jobs=3)
+    assert list(results.items()) == [('report', 'report'), ('integrity', 'FAIL'),
+                                     ('other', 'other')]
+    assert order.index('report') > order.index('integrity')
+
+
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_dependency_error_raised(jobs):
+    order = []
+
+    def broken():
+        raise ValueError('unreadable input')
+
+    units = [CheckUnit('broken', broken), recording_unit('dependent', order, depends=['broken']),
+             recording_unit('other', order)]
+    with pytest.raises(ValueError, match='unreadable input'):
+        run_checks(units, jobs)
+    # the dependent of the failed check is never started
+    assert 'dependent' not in order
+
+
+def test_sheets_loaded_once(monkeypatch):
+    loads = []
+    lock = threading.Lock()
+
+    def load_sheet(path, sheet_name, columns):
+        with lock:
+            loads.append((path, sheet_name))
+
+    monkeypatch.setattr(check_scheduler, 'load_sheet', load_sheet)
+    order = []
+    sheet = ('a.xlsx', 'Coverage-gene', ['Sample'])
+    units = [recording_unit('one', order, sheets=[sheet]),
+             recording_unit('two', order, sheets=[sheet, ('b.xlsx', 'FLT3', None)])]
+    assert list(run_checks(units, jobs=2)) == ['one', 'two']
+    assert sorted(loads) == [('a.xlsx', 'Coverage-gene'), ('b.xlsx', 'FLT3')]
+
+
+def test_registration_errors():
+    order = []
+    with pytest.raises(Exception, match='must be unique'):
+        run_checks([recording_unit('a', order), recording_unit('a', order)], jobs=2)
+    with pytest.raises(Exception, match='depends on unknown check'):
+        run_checks([recording_unit('a', order, depends=['missing'])], jobs=2)
+    with pytest.raises(Exception, match='cannot be resolved'):
+        run_checks([recording_unit('a', order, depends=['b']),
+                    recording_unit('b', order, depends=['a'])], jobs=2)
@@ -0,0 +1,97 @@
+'''
+Incremental check state: results re-used while the inputs are unchanged, invalidated by
+a change to a file in an input directory (at any depth), by the content hash and by a
+state format mismatch
+'''
+import os
+import pandas as pd
+import check_state
+from check_state import CheckState, fingerprint
+
+
+def counting_check(calls):
+    def check():
+        calls.append(1)
+        return len(calls)
+    return check
+
+
+def rerun(state_path, inputs, params='params', content_hash=False):
+    '''
+    Run a check in a new CheckState loaded from state_path. Returns the result and the
+    names of the re-used checks.
+    '''
+    state = CheckState(str(state_path), content_hash)
+    calls = []
+    result = state.run('check', inputs, params, counting_check(calls))
+    state.save()
+    return result, state.reused
+
+
+def test_reused_until_nested_file_changes(tmp_path):
+    nested = tmp_path / 'fastqs' / 'run1' / 'lane1'
+    nested.mkdir(parents=True)
+    fastq = nested / 's1.fastq'
+    fastq.write_text('@r\nACGT\n+\nIIII\n')
+    state_path = tmp_path / 'report.state.pkl'
+    inputs = [str(tmp_path / 'fastqs')]
+
+    assert rerun(state_path, inputs) == (1, [])
+    assert rerun(state_path, inputs) == (1, ['check'])
+    fastq.write_text('@r\nACGTA\n+\nIIIII\n')
+    assert rerun(state_path, inputs) == (1, [])
+    (nested / 's2.fastq').write_text('')
+    assert rerun(state_path, inputs) == (1, [])
+    assert rerun(state_path, inputs) == (1, ['check'])
+    # a change of params is a different key
+    assert rerun(state_path, inputs, 'other params') == (1, [])
+
+
+def test_content_hash(tmp_path):
+    path = tmp_path / 'input.txt'
+    path.write_text('aaaa')
+    state_path = tmp_path / 'report.state.pkl'
+    rerun(state_path, [str(path)], content_hash=True)
+    stat = os.stat(path)
+    # same size and modification time, different content
+    path.write_text('bbbb')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert rerun(state_path, [str(path)]) == (1, [])
+    assert rerun(state_path, [str(path)], content_hash=True) == (1, [])
+    assert rerun(state_path, [str(path)], content_hash=True) == (1, ['check'])
+
+
+def test_missing_input(tmp_path):
+    assert fingerprint(str(tmp_path / 'missing')) == (str(tmp_path / 'missing'), None)
+    assert fingerprint(None) == (None, None)
+
+
+def test_state_version_mismatch(tmp_path, monkeypatch):
+    state_path = tmp_path / 'report.state.pkl'
+    rerun(state_path, [])
+    assert rerun(state_path, []) == (1, ['check'])
+    monkeypatch.setattr(check_state, 'STATE_VERSION', check_state.STATE_VERSION + 1)
+    assert CheckState(str(state_path)).previous == {}
+    assert rerun(state_path, []) == (1, [])
+    assert rerun(state_path, []) == (1, ['check'])
+
+
+def test_unreadable_state(tmp_path):
+    state_path = tmp_path / 'report.state.pkl'
+    state_path.write_bytes(b'not a pickle')
+    assert CheckState(str(state_path)).previous == {}
+
+
+def test_run_check_rows_and_extras(tmp_path):
+    def check(path, check_df, threshold):
+        rows = pd.DataFrame([['000001', 'Check', path, 'PASS']], columns=check_df.columns)
+        return [pd.concat([check_df, rows], ignore_index=True), threshold]
+
+    check_df = pd.DataFrame([['000001', 'Earlier', '', 'FAIL']],
+                            columns=['Worksheet', 'Check', 'Description', 'Result'])
+    state = CheckState(str(tmp_path / 'report.state.pkl'))
+    result_df, threshold = state.run_check(check, [], 'a.xlsx', check_df, 0.5)
+    assert result_df['Check'].tolist() == ['Earlier', 'Check'] and threshold == 0.5
+    # stored per input with its own rows only
+    assert list(state.current) == ['check:a.xlsx']
+    assert len(state.current['check:a.xlsx']['result'][0]) == 1
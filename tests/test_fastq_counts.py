@@ -0,0 +1,67 @@
+'''
+FASTQ read counts of gzipped and plain FASTQs, summed across the lanes and reads of each
+sample, and their verification against the fastq-bam-check workbook counts
+'''
+import gzip
+import pandas as pd
+from fastq_counts import count_fastq_reads, find_fastqs, count_sample_reads
+from quality_check import fastq_bam_verification
+
+
+def fastq_text(reads):
+    return ''.join(f'@read{num}\nACGT\n+\nIIII\n' for num in range(reads)).encode()
+
+
+def write_fastq(path, reads):
+    data = fastq_text(reads)
+    path.write_bytes(gzip.compress(data) if path.name.endswith('.gz') else data)
+    return path
+
+
+def test_count_fastq_reads(tmp_path):
+    path = write_fastq(tmp_path / 's1.fastq.gz', 1001)
+    for block_size in (7, 1024, 16 * 1024 ** 2):
+        assert count_fastq_reads(str(path), block_size) == 1001
+    # a final line without a newline is counted
+    plain = tmp_path / 's2.fq'
+    plain.write_bytes(fastq_text(3).rstrip(b'\n'))
+    assert count_fastq_reads(str(plain)) == 3
+    assert count_fastq_reads(str(write_fastq(tmp_path / 'empty.fastq.gz', 0))) == 0
+
+
+def sample_fastqs(tmp_path):
+    '''
+    FASTQs of S1 (2 lanes of R1 and R2, in two directories) and S10; none of S2
+    '''
+    run_1, run_2 = tmp_path / 'run1', tmp_path / 'run2' / 'nested'
+    run_2.mkdir(parents=True)
+    run_1.mkdir()
+    for lane, directory in [(1, run_1), (2, run_2)]:
+        for read in (1, 2):
+            write_fastq(directory / f'S1_S1_L00{lane}_R{read}_001.fastq.gz', 10 * lane + read)
+    write_fastq(run_1 / 'S10_S10_L001_R1_001.fastq.gz', 5)
+    write_fastq(run_1 / 'S1.notes.txt', 100)
+    return [str(run_1), str(tmp_path / 'run2')]
+
+
+def test_count_sample_reads_across_lanes_and_reads(tmp_path):
+    fastqs = find_fastqs(sample_fastqs(tmp_path), ['S1', 'S10', 'S2'])
+    assert len(fastqs['S1']) == 4 and len(fastqs['S10']) == 1 and fastqs['S2'] == []
+    assert count_sample_reads(fastqs, jobs=3) == {'S1': 11 + 12 + 21 + 22, 'S10': 5, 'S2': None}
+
+
+def test_count_sample_reads_unreadable(tmp_path):
+    path = write_fastq(tmp_path / 'S1_R1.fastq.gz', 10)
+    path.write_bytes(path.read_bytes()[:-10])
+    counts = count_sample_reads({'S1': [str(path)]})
+    assert counts['S1'].startswith('EOFError')
+
+
+def test_fastq_bam_verification(tmp_path):
+    fastq_dirs = sample_fastqs(tmp_path)
+    fastq_bam_df = pd.DataFrame({'Sample': ['S1', 'S10', 'S2'], 'FASTQ': [66, 6, 1],
+                                 'BAM': [66, 6, 1], 'Result': ['PASS'] * 3})
+    verify_df = fastq_bam_verification(fastq_bam_df, '000001', fastq_dirs).set_index('Sample')
+    assert verify_df['Counted FASTQ reads'].tolist() == [66, 5, 'No FASTQs found']
+    assert verify_df['Result'].tolist() == ['PASS', 'FAIL', 'FAIL']
+    assert verify_df.loc['S10', 'Differences'] == 'FASTQ 6 in workbook, 5 counted'
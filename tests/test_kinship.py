@@ -0,0 +1,77 @@
+'''
+Kinship analysis and check of TSHC worksheet pairs: the 0.48 threshold boundary,
+NaN/inf kinship values and a pair with one failing sample
+'''
+import numpy as np
+import pandas as pd
+import pytest
+import quality_check
+from quality_check import kinship_analysis, tshc_kinship_check
+
+
+def kinship_df(pairs):
+    return pd.DataFrame(pairs, columns=['ID1', 'ID2', 'Kinship'])
+
+
+def test_threshold_boundary():
+    fail_df, summary_df = kinship_analysis(kinship_df([
+        ('S1', 'S2', 0.48), ('S1', 'S3', 0.47999), ('S2', 'S3', -0.1)]))
+    assert fail_df[['ID1', 'ID2']].values.tolist() == [['S1', 'S2']]
+    assert fail_df['Reason'].tolist() == ['Kinship >= 0.48']
+    assert kinship_analysis(kinship_df([('S1', 'S2', 0.48)]), threshold=0.5)[0].empty
+
+
+def test_nan_and_inf_kinship():
+    fail_df, _ = kinship_analysis(kinship_df([
+        ('S1', 'S2', np.nan), ('S1', 'S3', np.inf), ('S2', 'S3', -np.inf),
+        ('S3', 'S4', 'n/a'), ('S1', 'S4', 0.1)]))
+    reasons = dict(zip(zip(fail_df['ID1'], fail_df['ID2']), fail_df['Reason']))
+    assert reasons == {('S1', 'S2'): 'NaN', ('S1', 'S3'): 'inf', ('S2', 'S3'): 'inf',
+                       ('S3', 'S4'): 'NaN'}
+    # NaN pairs are listed first
+    assert fail_df['Reason'].tolist()[:2] == ['NaN', 'NaN']
+
+
+def test_summary_of_one_failing_sample():
+    fail_df, summary_df = kinship_analysis(kinship_df([
+        ('S1', 'S2', 0.5), ('S1', 'S3', 0.01), ('S2', 'S3', 0.02), ('S3', 'S4', 0.0)]))
+    assert len(fail_df) == 1
+    summary = summary_df.set_index('Sample')
+    assert summary.loc['S1', 'Related samples'] == 'S2'
+    assert summary.loc['S2', 'Related samples'] == 'S1'
+    assert summary.loc['S3', 'Offending pairs'] == 0 and summary.loc['S3', 'Pairs'] == 3
+    assert summary.loc['S3', 'Related samples'] == ''
+    assert summary.loc['S1', 'Max kinship'] == 0.5
+    # samples with offending pairs first
+    assert set(summary_df['Sample'][:2]) == {'S1', 'S2'}
+
+
+def test_pairs_of_several_reports():
+    df = kinship_df([('S1', 'S2', 0.5), ('S1', 'S2', 0.1)])
+    df['Pair'] = ['000001_000002', '000003_000004']
+    fail_df, summary_df = kinship_analysis(df)
+    assert fail_df['Pair'].tolist() == ['000001_000002']
+    assert len(summary_df) == 4
+
+
+def kinship_check(tmp_path, pairs):
+    path = tmp_path / '000001_000002.king.xlsx'
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        kinship_df(pairs).to_excel(writer, sheet_name='Kinship', index=False)
+    check_df = pd.DataFrame(columns=['Worksheet', 'Check', 'Description', 'Result'])
+    check_df, fail_df, _ = tshc_kinship_check(str(path), check_df)
+    quality_check.workbook_cache.clear()
+    return check_df.iloc[0], fail_df
+
+
+@pytest.mark.parametrize('pairs, result, fails', [
+    ([('S1', 'S2', 0.1), ('S1', 'S3', 0.47)], 'PASS', 0),
+    ([('S1', 'S2', 0.1), ('S1', 'S3', 0.48), ('S2', 'S3', 0.2)], 'FAIL', 1),
+    ([('S1', 'S2', 0.1), ('S1', 'S3', 'nan')], 'FAIL', 1),
+    ([], 'FAIL', 0)])
+def test_kinship_check(tmp_path, pairs, result, fails):
+    check, fail_df = kinship_check(tmp_path, pairs)
+    assert (check['Worksheet'], check['Result']) == ('000001_000002', result)
+    assert len(fail_df) == fails
+    if fails:
+        assert check['Description'].endswith(f'({fails} pairs fail, see Kinship below)')
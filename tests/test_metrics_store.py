@@ -0,0 +1,86 @@
+'''
+Metrics store: runs replaced on re-insert, run and sample queries, rolling statistics
+and the run date of an experiment name (and the fallback when it has none)
+'''
+import datetime
+import math
+import pytest
+from metrics_store import MetricsStore, rolling_stats, run_date, sample_id
+from quality_check import record_metrics
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MetricsStore(str(tmp_path / 'metrics.db'))
+    yield store
+    store.close()
+
+
+def test_add_run_replaces_worksheet(store):
+    assert store.add_run('TSMP', '2026-01-02', [
+        ('000001', 'D21-00001', None, '%CONT', 1.0),
+        ('000001', 'D21-00002', None, '%CONT', 3.0),
+        ('000001', 'D21-00003', None, '%CONT', 'n/a'),
+        ('000001', 'D21-00004', None, '%CONT', math.nan)]) == 2
+    store.add_run('TSMP', '2026-01-05', [('000002', 'D21-00005', None, '%CONT', 2.0)])
+    # a re-run of 000001 replaces all of its metrics (and date)
+    store.add_run('TSMP', '2026-01-03', [('000001', 'D21-00001', None, '%CONT', 5.0)])
+    assert store.run_values('%CONT', 'TSMP') == [('2026-01-03', '000001', 5.0),
+                                                 ('2026-01-05', '000002', 2.0)]
+    # the same worksheet number of another panel is not replaced
+    store.add_run('CLL', '2026-01-04', [('000001', 'D21-00009', None, '%CONT', 9.0)])
+    assert len(store.sample_values('%CONT')) == 3
+    assert store.metric_names() == [('CLL', '%CONT', 1, '2026-01-04', '2026-01-04'),
+                                    ('TSMP', '%CONT', 2, '2026-01-03', '2026-01-05')]
+
+
+def test_run_and_sample_queries(store):
+    for day in range(1, 6):
+        store.add_run('TSHC', f'2026-02-0{day}', [
+            (f'00000{day}', 'D21-00001', None, '%CONT', day),
+            (f'00000{day}', 'D21-00002', None, '%CONT', 10 * day)])
+    assert [run[2] for run in store.run_values('%CONT', aggregate='max')] == [10, 20, 30, 40, 50]
+    assert store.run_values('%CONT', aggregate='mean', limit=2) == [
+        ('2026-02-04', '000004', 22.0), ('2026-02-05', '000005', 27.5)]
+    assert [run[1] for run in store.run_values('%CONT', since='2026-02-02', until='2026-02-03')] == [
+        '000002', '000003']
+    assert [record[3] for record in store.sample_values('%CONT', above=35)] == [
+        'D21-00002', 'D21-00002']
+    assert len(store.sample_values('%CONT', sample='D21-00001', below=3)) == 2
+
+
+def test_rolling_stats():
+    stats = rolling_stats([1, 2, 3, 4, 10], window=3)
+    assert [mean for mean, _ in stats] == [1, 1.5, 2, 3, pytest.approx(17 / 3)]
+    assert stats[0][1] == None
+    assert stats[1][1] == pytest.approx(0.7071, abs=1e-4)
+    assert stats[4][1] == pytest.approx(3.7859, abs=1e-4)
+    # a window of 1 has no SD and a window longer than the values uses all of them
+    assert rolling_stats([1, 2], 1) == [(1, None), (2, None)]
+    assert rolling_stats([1, 2, 3], 10)[2] == (2, 1.0)
+
+
+def test_run_date():
+    assert run_date('260102_M00123_0001_000000000-ABCDE') == '2026-01-02'
+    assert run_date('261340_M00123') == None
+    assert run_date('M00123_260102') == None
+    assert run_date(None) == None
+    assert sample_id('000001-D21-12345-AB') == 'D21-12345'
+    assert sample_id('NEG') == 'NEG'
+
+
+def test_record_metrics_run_date_fallback(tmp_path, capsys):
+    metrics_db = str(tmp_path / 'metrics.db')
+    record_metrics(metrics_db, 'TSMP', '260102_M00123', [('000001', 'D21-1', None, '%CONT', 1)],
+                   ['000001'])
+    assert 'Warning' not in capsys.readouterr().out
+    record_metrics(metrics_db, 'TSMP', 'Experiment 12', [('000002', 'D21-2', None, '%CONT', 2)],
+                   ['000002'])
+    today = datetime.date.today().isoformat()
+    assert f"no run date in experiment name 'Experiment 12'" in capsys.readouterr().out
+    store = MetricsStore(metrics_db)
+    try:
+        assert store.run_values('%CONT') == [('2026-01-02', '000001', 1.0),
+                                             (today, '000002', 2.0)]
+    finally:
+        store.close()
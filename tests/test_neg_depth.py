@@ -0,0 +1,102 @@
+'''
+Depth of a tiny BAM over the regions of a coverage BED: reads overlapping region edges,
+a zero depth region and the max/mean depth against a naive per-base count
+'''
+import random
+import pandas as pd
+import pytest
+from bam_fixtures import bam_data, bam_record
+from neg_depth import read_bed, region_depths
+from quality_check import neg_bam_depth_check
+
+
+REFERENCES = [('chr1', 1000), ('chr2', 1000)]
+# 0-based, end exclusive; R4 has no reads and R3 overlaps R2
+REGIONS = [('1', 100, 120, 'R1'), ('1', 200, 210, 'R2'), ('1', 205, 230, 'R3'),
+           ('1', 500, 510, 'R4'), ('chr2', 0, 50, 'R5'), ('chr3', 0, 10, 'R6')]
+READS = [
+    (0, 95, 0, ((10, 'M'),)),                   # over the start of R1 (100-104)
+    (0, 115, 0, ((10, 'M'),)),                  # over the end of R1 (115-119)
+    (0, 90, 0, ((40, 'M'),)),                   # spans R1
+    (0, 102, 0, ((3, 'M'), (5, 'D'), (3, 'M'))),  # deletion adds no depth
+    (0, 100, 0, ((2, 'S'), (4, '='), (300, 'N'), (2, 'X'))),  # skip, then 2 bases at 404
+    (0, 100, 0x400, ((20, 'M'),)),              # duplicate
+    (0, 100, 0x100, ((20, 'M'),)),              # secondary
+    (0, 100, 0x4, ((20, 'M'),)),                # unmapped with a position
+    (0, 198, 0, ((1, 'M'), (2, 'I'), (20, 'M'))),  # R2 and R3
+    (1, 45, 0, ((10, 'M'),)),                   # over the end of R5
+    (-1, -1, 0x4, ((4, 'M'),)),                 # unplaced
+]
+
+
+def naive_depths(reads, regions):
+    '''
+    Max and mean depth of each region counted base by base
+    '''
+    chroms = {'1': 0, 'chr1': 0, '2': 1, 'chr2': 1}
+    bases = {}
+    for ref, pos, flag, cigar in reads:
+        if flag & 0x704 or ref < 0:
+            continue
+        for length, op in cigar:
+            if op in 'M=X':
+                for base in range(pos, pos + length):
+                    bases[ref, base] = bases.get((ref, base), 0) + 1
+            if op in 'MDN=X':
+                pos += length
+    depths = []
+    for chrom, start, end, _ in regions:
+        depth = [bases.get((chroms.get(chrom), base), 0) for base in range(start, end)]
+        depths.append((max(depth), sum(depth) / len(depth)))
+    return depths
+
+
+def write_bam(path, reads):
+    path.write_bytes(bam_data(REFERENCES, [bam_record(*read) for read in reads]))
+    return str(path)
+
+
+def test_region_depths(tmp_path):
+    depths = region_depths(write_bam(tmp_path / 'neg.bam', READS), REGIONS)
+    assert depths == pytest.approx(naive_depths(READS, REGIONS))
+    # bases 102 and 103 of R1 are covered by 4 reads
+    assert depths[0][0] == 4
+    # no reads over R4 and no BAM reference for R6
+    assert depths[3] == (0, 0.0) and depths[5] == (0, 0.0)
+
+
+def test_region_depths_random_reads(tmp_path):
+    rng = random.Random(1)
+    reads = []
+    for _ in range(300):
+        cigar = [(rng.randint(1, 30), rng.choice('MMMDNI=X')) for _ in range(rng.randint(1, 4))]
+        reads.append((rng.randint(0, 1), rng.randint(0, 600), rng.choice([0, 0, 0, 0x400]),
+                      tuple(cigar)))
+    regions = [('chr1' if i % 2 else '2', start, start + rng.randint(1, 80), f'R{i}')
+               for i, start in enumerate(rng.sample(range(700), 25))]
+    depths = region_depths(write_bam(tmp_path / 'neg.bam', reads), regions, threads=2)
+    assert depths == pytest.approx(naive_depths(reads, regions))
+
+
+def test_neg_bam_depth_check(tmp_path):
+    bam_dir = tmp_path / 'bams'
+    bam_dir.mkdir()
+    write_bam(bam_dir / 'NEG-001_S7.bam', READS)
+    bed = tmp_path / 'coverage.bed'
+    bed.write_text(''.join(f'{chrom}\t{start}\t{end}\t{name}\n'
+                           for chrom, start, end, name in REGIONS))
+    assert read_bed(str(bed)) == REGIONS
+    check_df = pd.DataFrame(columns=['Worksheet', 'Check', 'Description', 'Result'])
+
+    def check(max_depth):
+        result_df, depth_df = neg_bam_depth_check(
+            '/excel/NEG-001_S7.v1.0.3-results.xlsx', '000003', [str(bam_dir)], str(bed),
+            max_depth, check_df)
+        return result_df.iloc[0], depth_df
+
+    result, depth_df = check(4)
+    assert result['Result'] == 'PASS'
+    assert depth_df['Max depth'].tolist() == [4, 1, 1, 0, 1, 0]
+    result, _ = check(0)
+    assert result['Result'] == 'FAIL'
+    assert result['Description'].endswith('4 exceed (R1: 4; R2: 1; R3: 1; R5: 1)')
@@ -0,0 +1,52 @@
+'''
+The -precheck command line gates on a small generated TSMP worksheet, run in a fresh
+interpreter to check pandas, numpy and pyarrow are not imported
+'''
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, 'benchmarks'))
+import generate_worksheets
+
+
+PRECHECK = '''
+import json, sys
+import quality_check
+try:
+    quality_check.main(sys.argv[1:])
+except SystemExit as exit:
+    status = exit.code
+modules = [name for name in ('pandas', 'numpy', 'pyarrow', 'openpyxl') if name in sys.modules]
+print(json.dumps({'status': status, 'modules': modules}))
+'''
+
+
+def run_precheck(ws_1, sample_sheet):
+    '''
+    Exit status of -precheck and the heavy modules imported, with the printed gates
+    '''
+    process = subprocess.run(
+        [sys.executable, '-c', PRECHECK, '-precheck', '-ws_1', ws_1, '-s', sample_sheet],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    lines = process.stdout.splitlines()
+    return json.loads(lines[-1]), lines[:-1]
+
+
+def test_precheck_imports_no_pandas_or_pyarrow(tmp_path):
+    args = generate_worksheets.parse_args([
+        str(tmp_path), '-panels', 'TSMP', '-ho_samples', '2', '-genes', '2', '-exons', '3',
+        '-variants', '1', '-extra_columns', '0', '-vcf_records', '1'])
+    [(ws_1, _, sample_sheet)] = generate_worksheets.generate(str(tmp_path), args)
+
+    result, gates = run_precheck(ws_1, sample_sheet)
+    assert result == {'status': 0, 'modules': []}
+    assert gates and all(gate.startswith('PASS\t') for gate in gates)
+
+    vcf_dir = os.path.join(ws_1, 'vcfs_TSMP_000003')
+    os.remove(os.path.join(vcf_dir, sorted(os.listdir(vcf_dir))[0]))
+    result, gates = run_precheck(ws_1, sample_sheet)
+    assert result == {'status': 1, 'modules': []}
+    assert any(gate.startswith('FAIL\t000003\tVCF count check') for gate in gates)
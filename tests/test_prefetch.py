@@ -0,0 +1,60 @@
+'''
+Read-ahead of a run's inputs: files read from memory once prefetched, the memory cap,
+and the buffers dropped when a run fails
+'''
+import os
+import sys
+import pytest
+from prefetch import Prefetcher, prefetcher
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'benchmarks'))
+import generate_worksheets
+import quality_check
+
+
+def test_open_input_from_memory(tmp_path):
+    path = tmp_path / 'a.txt'
+    path.write_text('line 1\r\nline 2\n')
+    reads = Prefetcher(threads=2)
+    reads.start([str(path), None, str(tmp_path / 'missing.txt')])
+    # wait for the read, then open from memory only
+    assert reads.content(str(path)) == b'line 1\r\nline 2\n'
+    assert reads.content(str(tmp_path / 'missing.txt')) == None
+    os.remove(path)
+    with reads.open_input(str(path), newline='') as file:
+        assert file.read() == 'line 1\r\nline 2\n'
+    with reads.open_input(str(path), 'rb') as file:
+        assert file.read() == b'line 1\r\nline 2\n'
+    assert reads.workbook(str(tmp_path / 'other.xlsx')) == str(tmp_path / 'other.xlsx')
+    reads.clear()
+    assert reads.content(str(path)) == None
+
+
+def test_memory_cap(tmp_path):
+    paths = []
+    for name in ('a', 'b'):
+        path = tmp_path / name
+        path.write_bytes(b'x' * 10)
+        paths.append(str(path))
+    reads = Prefetcher(max_bytes=15)
+    reads.start(paths)
+    assert reads.content(paths[0]) == b'x' * 10
+    assert reads.content(paths[1]) == None
+    reads.clear()
+
+
+def test_buffers_cleared_when_a_check_fails(tmp_path, monkeypatch):
+    args = generate_worksheets.parse_args([
+        str(tmp_path), '-panels', 'TSMP', '-ho_samples', '2', '-genes', '2', '-exons', '3',
+        '-variants', '1', '-extra_columns', '0', '-vcf_records', '1'])
+    [(ws_1, _, sample_sheet)] = generate_worksheets.generate(str(tmp_path), args)
+
+    def failing_check(*args):
+        assert prefetcher.futures
+        raise ValueError('check failed')
+
+    monkeypatch.setattr(quality_check, 'ho_coverage_check', failing_check)
+    with pytest.raises(ValueError, match='check failed'):
+        quality_check.run_qc(ws_1, sample_sheet=sample_sheet, out_dir=str(tmp_path) + '/')
+    assert prefetcher.futures == {} and prefetcher.executor == None
@@ -0,0 +1,37 @@
+'''
+JSON export of the quality check results of a small generated TSMP worksheet
+'''
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'benchmarks'))
+import generate_worksheets
+import quality_check
+
+
+# a placeholder of the HTML report, e.g. _vcf_min_max_
+SLOT = re.compile(r'(^|\s)_[a-z0-9_]+_(\s|$)')
+
+
+def test_exported_descriptions_have_no_html_slots(tmp_path):
+    args = generate_worksheets.parse_args([
+        str(tmp_path), '-panels', 'TSMP', '-ho_samples', '2', '-genes', '2', '-exons', '3',
+        '-variants', '1', '-extra_columns', '0', '-vcf_records', '1'])
+    [(ws_1, _, sample_sheet)] = generate_worksheets.generate(str(tmp_path), args)
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+    qc_result = quality_check.run_qc(ws_1, sample_sheet=sample_sheet, out_dir=str(out_dir) + '/')
+
+    with open(out_dir / '000003_TSMP_quality_checks.json') as file:
+        document = json.load(file)
+    descriptions = {check['check']: check['description'] for check in document['checks']}
+    assert len(descriptions) == len(qc_result.checks)
+    assert [check for check, description in descriptions.items() if SLOT.search(description)] == []
+    assert descriptions['Negative calls check'] == 'There are no calls in the negative control.'
+    # the slots are still replaced by the detail tables in the HTML report
+    with open(out_dir / '000003_TSMP_quality_checks.html') as file:
+        html = file.read()
+    assert 'file_size_table' in html and '_vcf_min_max_' not in html
@@ -0,0 +1,119 @@
+'''
+Samplesheet parsing and sample lookups, and the samplesheet sample check of a small
+generated TSMP worksheet (whose negative control is on the samplesheet)
+'''
+import os
+import sys
+import pandas as pd
+import pytest
+from samplesheet import parse_samplesheet, read_samplesheet
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'benchmarks'))
+import generate_worksheets
+import quality_check
+
+
+W7_LINES = [
+    '[Header]', 'IEMFileVersion,5', ',,', '[Reads]', '151', '', '[Data]',
+    'Sample_ID,Sample_Name,index,Description',
+    '000003-01-D21-52492-AB-Jones-001_S1,name1,ACGT,',
+    '000003-10-D21-11111-AB-Jones-001_S10,name10,TTTT,',
+    ',,,',
+    '000003-11-NEG-001_S11,neg,GGGG,']
+
+# W10 samplesheets skip the commas of empty trailing values
+W10_LINES = ['[Header]', 'IEMFileVersion,5', '[Data]', 'Sample_ID,Sample_Name,index,Description',
+             'S1', 'S10,name10', 'S2,name2,ACGT,desc,extra']
+
+
+def test_parse_w7():
+    samplesheet = parse_samplesheet(W7_LINES, 'SampleSheet.csv')
+    assert len(samplesheet) == 3
+    assert samplesheet.sample_ids == [
+        '000003-01-D21-52492-AB-Jones-001_S1', '000003-10-D21-11111-AB-Jones-001_S10',
+        '000003-11-NEG-001_S11']
+    assert samplesheet.row('D21-11111')['Sample_Name'] == 'name10'
+    assert samplesheet.row('D21-99999') == None
+    assert 'D21-52492' in samplesheet and '000003-11-NEG-001_S11' in samplesheet
+    assert repr(samplesheet) == "SampleSheet('SampleSheet.csv')"
+
+
+def test_parse_w10_rows_padded_and_cut():
+    samplesheet = parse_samplesheet(W10_LINES)
+    assert samplesheet.columns == ['Sample_ID', 'Sample_Name', 'index', 'Description']
+    assert samplesheet.row('S1') == {'Sample_ID': 'S1', 'Sample_Name': '', 'index': '',
+                                     'Description': ''}
+    assert samplesheet.row('S2')['Description'] == 'desc'
+    assert len(samplesheet.row('S2')) == 4
+
+
+def test_parse_errors():
+    with pytest.raises(Exception, match=r'No \[Data\] lines'):
+        parse_samplesheet(['[Header]', 'Sample_ID'])
+    with pytest.raises(Exception, match='No Sample_ID column'):
+        parse_samplesheet(['[Data]', 'Sample_Name', 'S1'])
+
+
+def test_sample_of_prefix_boundaries():
+    samplesheet = parse_samplesheet(W10_LINES)
+    # S1 is a prefix of S10 but only matches at a separator
+    assert samplesheet.sample_of('S10.vcf.gz') == 'S10'
+    assert samplesheet.sample_of('S1.vcf.gz') == 'S1'
+    assert samplesheet.sample_of('S1_R1_001.fastq.gz') == 'S1'
+    assert samplesheet.sample_of('S1-results.xlsx') == 'S1'
+    assert samplesheet.sample_of('S1') == 'S1'
+    assert samplesheet.sample_of('S100.vcf.gz') == None
+    assert samplesheet.sample_of('S3.vcf.gz') == None
+    assert samplesheet.missing(['S10.vcf.gz', 'S2_R1.fastq.gz']) == ['S1']
+
+
+def test_sample_of_not_d_number():
+    # a D number is an index key of the row but not the Sample_ID of a file
+    samplesheet = parse_samplesheet(W7_LINES)
+    assert samplesheet.sample_of('D21-52492.vcf.gz') == None
+    assert samplesheet.sample_of(
+        '000003-01-D21-52492-AB-Jones-001_S1.v1.0.3-results.xlsx') == (
+        '000003-01-D21-52492-AB-Jones-001_S1')
+
+
+def test_read_samplesheet(tmp_path):
+    path = tmp_path / 'SampleSheet.csv'
+    path.write_text('\n'.join(W7_LINES) + '\n')
+    assert read_samplesheet(str(path)).sample_ids == parse_samplesheet(W7_LINES).sample_ids
+
+
+def samplesheet_check(ho_inp):
+    '''
+    Description and result of the samplesheet sample check (and the gene check
+    description) of ho_coverage_check
+    '''
+    check_df = pd.DataFrame(columns=['Worksheet', 'Check', 'Description', 'Result'])
+    result_df = quality_check.ho_coverage_check(ho_inp, check_df, 200)[0].set_index('Check')
+    return (result_df.loc['Samplesheet sample check', 'Description'],
+            result_df.loc['Samplesheet sample check', 'Result'],
+            result_df.loc['Gene 200x check', 'Description'])
+
+
+def test_coverage_check_negative_on_samplesheet(tmp_path):
+    args = generate_worksheets.parse_args([
+        str(tmp_path), '-panels', 'TSMP', '-ho_samples', '2', '-genes', '2', '-exons', '3',
+        '-variants', '1', '-extra_columns', '0', '-vcf_records', '1'])
+    [(ws_1, _, sample_sheet)] = generate_worksheets.generate(str(tmp_path), args)
+    ho_inp = quality_check.ho_sort_inputs('TSMP', ws_1, sample_sheet)
+    negative = os.path.basename(ho_inp['negative']).split('.')[0]
+    assert negative in ho_inp['samplesheet']
+
+    description, result, gene_description = samplesheet_check(ho_inp)
+    assert result == 'PASS'
+    assert negative not in description
+    # the low coverage genes modal is keyed on the gene check description
+    assert gene_description == 'All samples in this worksheet have genes at >80% 200x.'
+
+    os.remove(ho_inp['pat_results'][1])
+    ho_inp = quality_check.ho_sort_inputs('TSMP', ws_1, sample_sheet)
+    description, result, gene_description = samplesheet_check(ho_inp)
+    assert result == 'FAIL'
+    assert ho_inp['samplesheet'].sample_ids[1] in description
+    assert negative not in description
+    assert gene_description == 'All samples in this worksheet have genes at >80% 200x.'
@@ -0,0 +1,86 @@
+'''
+Integrity checks of small VCFs: a good BGZF VCF with an index, truncated and plain gzip
+VCFs, a missing or stale index and uncompressed VCFs
+'''
+import gzip
+import os
+import struct
+import zlib
+from vcf_integrity import BGZF_EOF, check_vcf, check_vcfs
+
+
+VCF_TEXT = b'##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n'
+
+
+def bgzf_block(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    return (b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00' +
+            struct.pack('<H', len(compressed) + 25) + compressed +
+            struct.pack('<II', zlib.crc32(data), len(data)))
+
+
+def write_vcf(directory, name, data, index=True):
+    path = directory / name
+    path.write_bytes(data)
+    if index:
+        (directory / (name + '.tbi')).write_bytes(b'TBI\x01')
+    return str(path)
+
+
+def test_good_vcf(tmp_path):
+    path = write_vcf(tmp_path, 'good.vcf.gz', bgzf_block(VCF_TEXT) + BGZF_EOF)
+    assert check_vcf(path) == []
+
+
+def test_truncated_vcf(tmp_path):
+    # a VCF truncated while being written has no BGZF EOF block
+    path = write_vcf(tmp_path, 'truncated.vcf.gz', bgzf_block(VCF_TEXT))
+    assert check_vcf(path) == ['no BGZF EOF block (truncated)']
+
+
+def test_vcf_shorter_than_eof_block(tmp_path):
+    path = write_vcf(tmp_path, 'short.vcf.gz', bgzf_block(VCF_TEXT)[:20])
+    assert 'no BGZF EOF block' in check_vcf(path)
+
+
+def test_plain_gzip_vcf(tmp_path):
+    path = write_vcf(tmp_path, 'plain.vcf.gz', gzip.compress(VCF_TEXT))
+    problems = check_vcf(path)
+    assert 'not BGZF compressed' in problems
+    assert 'no VCF header' not in problems
+
+
+def test_no_vcf_header(tmp_path):
+    path = write_vcf(tmp_path, 'text.vcf.gz', bgzf_block(b'chr1\t1\n') + BGZF_EOF)
+    assert check_vcf(path) == ['no VCF header']
+
+
+def test_index_missing_or_older(tmp_path):
+    path = write_vcf(tmp_path, 'noindex.vcf.gz', bgzf_block(VCF_TEXT) + BGZF_EOF, index=False)
+    assert check_vcf(path) == ['no .tbi/.csi index']
+    (tmp_path / 'noindex.vcf.gz.csi').write_bytes(b'CSI\x01')
+    assert check_vcf(path) == []
+    os.utime(path + '.csi', ns=(0, 0))
+    assert check_vcf(path) == ['index older than VCF']
+
+
+def test_uncompressed_vcf(tmp_path):
+    assert check_vcf(write_vcf(tmp_path, 'good.vcf', VCF_TEXT, index=False)) == []
+    assert check_vcf(write_vcf(tmp_path, 'bad.vcf', b'chr1\t1\n', index=False)) == [
+        'no VCF header']
+
+
+def test_check_vcfs_with_stats(tmp_path):
+    good = write_vcf(tmp_path, 'good.vcf.gz', bgzf_block(VCF_TEXT) + BGZF_EOF)
+    truncated = write_vcf(tmp_path, 'truncated.vcf.gz', bgzf_block(VCF_TEXT))
+    stats = {entry.name: entry.stat() for entry in os.scandir(tmp_path)}
+    expected = {'truncated.vcf.gz': ['no BGZF EOF block (truncated)']}
+    assert check_vcfs([good, truncated], threads=2) == expected
+    assert check_vcfs([good, truncated], threads=2, stats=stats) == expected
+    assert check_vcfs([]) == {}
+
+
+def test_unreadable_vcf(tmp_path):
+    problems = check_vcf(str(tmp_path / 'missing.vcf.gz'))
+    assert len(problems) == 1 and problems[0].startswith('unreadable')
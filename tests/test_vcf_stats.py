@@ -0,0 +1,100 @@
+'''
+VCF content statistics and problems: record counts read across chunks, an outlier
+record count, sample columns not matching the file name or samplesheet, and the VCF
+content check of a small VCF directory
+'''
+import gzip
+import pandas as pd
+from vcf_stats import (vcf_stats, collect_vcf_stats, record_count_outliers, matches_file_name,
+                       vcf_problems)
+from quality_check import vcf_content_check
+
+
+def vcf_text(sample, records, chrom='chr1', filter_value='PASS'):
+    lines = ['##fileformat=VCFv4.2',
+             f'#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t{sample}']
+    lines += [f'{chrom}\t{pos + 1}\t.\tA\tT\t50\t{filter_value}\tDP=10\tGT\t0/1'
+              for pos in range(records)]
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def write_vcf(directory, name, sample, records):
+    path = directory / name
+    path.write_bytes(gzip.compress(vcf_text(sample, records)))
+    return str(path)
+
+
+def test_vcf_stats_across_chunks(tmp_path):
+    path = tmp_path / 's1.vcf.gz'
+    data = vcf_text('s1', 7) + vcf_text('s1', 3, 'chr2', 'LowQual').split(b'\n', 2)[2]
+    path.write_bytes(gzip.compress(data.rstrip(b'\n')))
+    for chunk_size in (5, 64, 1024 ** 2):
+        stats = vcf_stats(str(path), chunk_size)
+        assert stats == {'records': 10, 'chromosomes': {'chr1': 7, 'chr2': 3},
+                         'filters': {'PASS': 7, 'LowQual': 3}, 'samples': ['s1'], 'error': None}
+
+
+def test_vcf_stats_truncated(tmp_path):
+    path = tmp_path / 's1.vcf.gz'
+    path.write_bytes(gzip.compress(vcf_text('s1', 100))[:-20])
+    stats = vcf_stats(str(path))
+    assert stats['error'].startswith('EOFError')
+
+
+def test_record_count_outliers():
+    assert record_count_outliers([100, 101, 99, 100, 500]) == [4]
+    assert record_count_outliers([100, 101, 99, 100, 102]) == []
+    # a MAD of 0 falls back to the mean absolute deviation
+    assert record_count_outliers([100, 100, 100, 100, 130]) == [4]
+    assert record_count_outliers([100] * 6) == []
+    # too few VCFs to call outliers
+    assert record_count_outliers([100, 100, 100, 5000]) == []
+
+
+def test_matches_file_name():
+    assert matches_file_name('s1', '000001-s1.vcf.gz')
+    assert matches_file_name('s1', 's1_sv.vcf.gz')
+    assert matches_file_name('s1', 's1.vcf')
+    assert not matches_file_name('s1', '000001-s10.vcf.gz')
+
+
+def test_vcf_problems(tmp_path):
+    paths = [write_vcf(tmp_path, f'000001-s{num}.vcf.gz', f's{num}', 100 + num)
+             for num in range(1, 6)]
+    paths.append(write_vcf(tmp_path, '000001-s6.vcf.gz', 's6', 1000))
+    # the sample of s7's VCF is s8
+    paths.append(write_vcf(tmp_path, '000001-s7.vcf.gz', 's8', 102))
+    stats = collect_vcf_stats(paths, jobs=2)
+    assert [vcf['records'] for vcf in stats] == [101, 102, 103, 104, 105, 1000, 102]
+
+    problems = vcf_problems(paths, stats)
+    # s7's VCF is not of the same type as the others (its sample is not in its name)
+    assert problems[5] == ['record count 1000 is an outlier (median 103.5)']
+    assert problems[6] == ['sample s8 does not match the file name']
+    assert problems[:5] == [[]] * 5
+
+    sample_ids = {f's{num}' for num in range(1, 8)}
+    problems = vcf_problems(paths, stats, sample_ids)
+    assert problems[6] == ['sample s8 is not on the samplesheet']
+
+
+def test_vcf_content_check(tmp_path):
+    vcf_dir = tmp_path / 'vcfs_TSHC_000001'
+    vcf_dir.mkdir()
+    for num in range(1, 6):
+        write_vcf(vcf_dir, f'000001-s{num}.vcf.gz', f's{num}', 100)
+    check_df = pd.DataFrame(columns=['Worksheet', 'Check', 'Description', 'Result'])
+    result_df, stats_df = vcf_content_check(str(vcf_dir), '000001', None, check_df)
+    assert result_df['Result'].tolist() == ['PASS']
+    assert stats_df['Records'].tolist() == [100] * 5
+
+    write_vcf(vcf_dir, '000001-s6.vcf.gz', 's9', 100)
+    result_df, stats_df = vcf_content_check(str(vcf_dir), '000001', None, check_df)
+    assert result_df['Result'].tolist() == ['FAIL']
+    assert result_df['Description'][0].endswith(
+        '1 VCFs fail (000001-s6.vcf.gz: sample s9 does not match the file name)')
+
+    (tmp_path / 'empty').mkdir()
+    result_df, _ = vcf_content_check(str(tmp_path / 'empty'), '000001', None, check_df)
+    assert result_df['Result'].tolist() == ['FAIL']
+    assert result_df['Description'][0].endswith('No VCFs found')
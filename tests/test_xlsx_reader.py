@@ -0,0 +1,111 @@
+'''
+XlsxReader.read_columns against pd.read_excel on small workbooks: one written with
+openpyxl (shared strings, numbers, booleans, empty cells and sparse columns) and one
+with inline strings and cells without references
+'''
+import os
+import sys
+import zipfile
+import numpy as np
+import pandas as pd
+import pytest
+from xlsx_reader import XlsxReader
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'benchmarks'))
+import generate_worksheets
+
+
+INLINE_SHEET = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>
+<row r="1"><c r="A1" t="inlineStr"><is><t>Sample</t></is></c><c r="B1" t="inlineStr"><is><t>Depth</t></is></c><c r="D1" t="inlineStr"><is><t>Pass</t></is></c></row>
+<row r="2"><c t="inlineStr"><is><t>S1</t></is></c><c><v>12</v></c><c/><c t="b"><v>1</v></c></row>
+<row r="4"><c r="A4" t="inlineStr"><is><r><t>S</t></r><r><t>3</t></r></is></c><c r="B4"><v>2.5</v></c><c r="D4" t="b"><v>0</v></c></row>
+<row r="5"><c r="B5"><v>1.0E2</v></c></row>
+<row r="6"><c r="A6" t="e"><v>#N/A</v></c></row>
+<row r="7"><c r="A7"/></row>
+</sheetData></worksheet>'''
+
+WORKBOOK_PARTS = {
+    '[Content_Types].xml': '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>''',
+    '_rels/.rels': '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>''',
+    'xl/workbook.xml': '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Inline" sheetId="1" r:id="rId1"/></sheets></workbook>''',
+    'xl/_rels/workbook.xml.rels': '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>''',
+    'xl/worksheets/sheet1.xml': INLINE_SHEET
+}
+
+
+def assert_parity(path, sheet_name, columns):
+    with XlsxReader(str(path)) as reader:
+        df = reader.read_columns(sheet_name, columns)
+    expected = pd.read_excel(path, sheet_name=sheet_name)
+    expected = expected[[col for col in columns if col in expected.columns]]
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+    return df
+
+
+@pytest.fixture
+def generated_workbook(tmp_path):
+    path = tmp_path / 'results.xlsx'
+    generate_worksheets.write_workbook(str(path), {
+        'Coverage-gene': pd.DataFrame({
+            'Sample': ['S1', 'S2', None, 'S4'],
+            'Gene': ['GENE1', 'GENE2', 'GENE2', None],
+            'pct>200x': [99.5, 80, np.nan, 1e-3],
+            'Flag': [True, False, None, True],
+            'Count': [1, 2, 3, 4]}),
+        # a sparse column: values on a few rows only, and trailing empty rows
+        'Sparse': pd.DataFrame({
+            'ID': list(range(6)),
+            'Note': [None, 'a', None, None, 'b', None],
+            'Max': [None, None, 5, None, None, None]})})
+    return path
+
+
+def test_shared_strings_numbers_and_booleans(generated_workbook):
+    df = assert_parity(generated_workbook, 'Coverage-gene', ['Sample', 'pct>200x', 'Flag', 'Count'])
+    assert df['Sample'].tolist()[:2] == ['S1', 'S2']
+    assert df['Count'].tolist() == [1, 2, 3, 4]
+
+
+def test_column_order_and_missing_columns(generated_workbook):
+    df = assert_parity(generated_workbook, 'Coverage-gene', ['Count', 'Gene', 'Absent'])
+    assert list(df.columns) == ['Count', 'Gene']
+
+
+def test_sparse_columns(generated_workbook):
+    assert_parity(generated_workbook, 'Sparse', ['ID', 'Note', 'Max'])
+    assert_parity(generated_workbook, 'Sparse', ['Max'])
+
+
+def test_inline_strings(tmp_path):
+    path = tmp_path / 'inline.xlsx'
+    with zipfile.ZipFile(path, 'w') as zip_file:
+        for part, xml in WORKBOOK_PARTS.items():
+            zip_file.writestr(part, xml)
+    df = assert_parity(path, 'Inline', ['Sample', 'Depth', 'Pass'])
+    # row 3 is missing from the sheet XML and row 7 has only an empty cell
+    assert len(df) == 5
+    assert df['Sample'][[0, 2]].tolist() == ['S1', 'S3']
+    assert df['Depth'].tolist()[2:4] == [2.5, 100]
+
+
+def test_unknown_sheet(generated_workbook):
+    with XlsxReader(str(generated_workbook)) as reader:
+        assert reader.sheet_names == ['Coverage-gene', 'Sparse']
+        with pytest.raises(ValueError, match='not found'):
+            reader.read_columns('Absent', ['Sample'])
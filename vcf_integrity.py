@@ -0,0 +1,102 @@
+'''
+Integrity checks of the VCFs in a pipeline output directory which read only a few bytes
+of each file (the BGZF header, the start of the first block and the 28 byte BGZF EOF
+block) rather than decompressing the VCF:
+
+    - the file starts with a BGZF block header (gzip magic with the 'BC' extra subfield)
+    - the decompressed text starts with the VCF header line (##fileformat=VCF)
+    - the file ends with the BGZF EOF block (a VCF truncated while being written does not)
+    - a tabix (.tbi) or CSI (.csi) index exists and is not older than the VCF
+
+Uncompressed VCFs are checked for the VCF header line only. Files are checked
+concurrently on a pool of threads.
+'''
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+VCF_MAGIC = b'##fileformat=VCF'
+INDEX_SUFFIXES = ('.tbi', '.csi')
+# compressed bytes read from the start of a file, enough to decompress the header line
+HEADER_BYTES = 1024
+VCF_CHECK_THREADS = 16
+
+
+def is_bgzf_header(header):
+    '''
+    True if header starts with a BGZF block header: gzip magic, deflate, FEXTRA flag and
+    a 'BC' extra subfield of length 2
+    '''
+    return (len(header) >= 18 and header[:4] == b'\x1f\x8b\x08\x04' and
+            header[12:14] == b'BC' and header[14:16] == b'\x02\x00')
+
+
+def vcf_header_text(start, compressed):
+    '''
+    The first bytes of a VCF's text, decompressing the start of the file if compressed
+    '''
+    if not compressed:
+        return start[:len(VCF_MAGIC)]
+    try:
+        return zlib.decompressobj(zlib.MAX_WBITS | 16).decompress(start, len(VCF_MAGIC))
+    except zlib.error:
+        return b''
+
+
+def check_vcf(path, stats=None):
+    '''
+    Integrity check of a single VCF. Returns a list of problems found (empty if none).
+    stats is an optional dict of the stat results of the files in the VCF's directory
+    keyed on name (e.g. a directory inventory) used instead of a stat of the VCF and
+    its indexes.
+    '''
+    compressed = path.endswith('.gz')
+    name = os.path.basename(path)
+    problems = []
+    try:
+        stat = stats[name] if stats != None and name in stats else os.stat(path)
+        with open(path, 'rb') as file:
+            start = file.read(HEADER_BYTES)
+            if compressed:
+                if not is_bgzf_header(start):
+                    problems.append('not BGZF compressed')
+                if stat.st_size < len(BGZF_EOF):
+                    problems.append('no BGZF EOF block')
+                else:
+                    file.seek(-len(BGZF_EOF), os.SEEK_END)
+                    if file.read(len(BGZF_EOF)) != BGZF_EOF:
+                        problems.append('no BGZF EOF block (truncated)')
+    except OSError as error:
+        return [f'unreadable ({error.strerror})']
+
+    if vcf_header_text(start, compressed) != VCF_MAGIC:
+        problems.append('no VCF header')
+
+    if compressed:
+        if stats != None:
+            index_mtimes = [stats[name + suffix].st_mtime_ns for suffix in INDEX_SUFFIXES
+                            if name + suffix in stats]
+        else:
+            index_mtimes = [os.stat(path + suffix).st_mtime_ns for suffix in INDEX_SUFFIXES
+                            if os.path.exists(path + suffix)]
+        if not index_mtimes:
+            problems.append('no .tbi/.csi index')
+        elif max(index_mtimes) < stat.st_mtime_ns:
+            problems.append('index older than VCF')
+    return problems
+
+
+def check_vcfs(paths, threads=VCF_CHECK_THREADS, stats=None):
+    '''
+    Integrity check of each VCF in paths, run concurrently. stats are the stat results
+    of the files of the VCFs' directory (check_vcf). Returns a dict of the problems
+    found keyed on the name of each failing file.
+    '''
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(threads, len(paths))) as executor:
+        results = executor.map(check_vcf, paths, [stats] * len(paths))
+        return {os.path.basename(path): problems
+                for path, problems in zip(paths, results) if problems}
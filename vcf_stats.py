@@ -0,0 +1,161 @@
+'''
+Content statistics of the VCFs in a pipeline output directory: the number of records,
+records per chromosome, FILTER values and the sample columns of each VCF. VCFs are
+decompressed as a stream in fixed size chunks (a VCF is never held in memory) and
+spread across a pool of processes.
+'''
+import os
+import re
+import gzip
+import zlib
+import statistics
+from collections import Counter
+from operator import itemgetter
+
+
+CHUNK_SIZE = 4 * 1024 ** 2
+# modified z-score (median/MAD) above which a VCF's record count is an outlier
+OUTLIER_Z = 3.5
+# fewer VCFs than this are too few to call outliers
+MIN_OUTLIER_VCFS = 5
+CHROM_FILTER = itemgetter(0, 6)
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    '''
+    Yield the (decompressed) content of a VCF in chunks of chunk_size bytes
+    '''
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            yield chunk
+
+
+def count_records(lines, counts):
+    '''
+    Add the (CHROM, FILTER) of each record line (header and blank lines are skipped) to
+    the counts Counter. Lines with fewer than 7 fields are not counted.
+    '''
+    records = [line.split(b'\t', 7) for line in lines if line[:1] not in (b'#', b'')]
+    try:
+        counts.update(Counter(map(CHROM_FILTER, records)))
+    except IndexError:
+        counts.update(CHROM_FILTER(fields) for fields in records if len(fields) >= 7)
+
+
+def vcf_stats(path, chunk_size=CHUNK_SIZE):
+    '''
+    Statistics of a single VCF: a dict of records, chromosomes (records per CHROM),
+    filters (records per FILTER value), samples (sample column names) and error (a
+    message if the VCF could not be read to the end, otherwise None).
+    '''
+    counts = Counter()
+    samples = []
+    in_header = True
+    error = None
+    partial = b''
+    try:
+        for chunk in read_chunks(path, chunk_size):
+            lines = (partial + chunk).split(b'\n')
+            # the last line of a chunk may continue in the next chunk
+            partial = lines.pop()
+            if in_header:
+                for line in lines:
+                    if not line.startswith(b'#'):
+                        in_header = False
+                        break
+                    if line.startswith(b'#CHROM'):
+                        samples = line.rstrip(b'\r').split(b'\t')[9:]
+            count_records(lines, counts)
+        count_records([partial], counts)
+    except (OSError, EOFError, zlib.error) as read_error:
+        error = f'{type(read_error).__name__}: {read_error}'
+
+    chromosomes = Counter()
+    filters = Counter()
+    for (chrom, filter_value), count in counts.items():
+        chromosomes[chrom.decode(errors='replace')] += count
+        filters[filter_value.decode(errors='replace')] += count
+    return {
+        'records': sum(counts.values()),
+        'chromosomes': dict(chromosomes),
+        'filters': dict(filters),
+        'samples': [sample.decode(errors='replace') for sample in samples],
+        'error': error
+    }
+
+
+def collect_vcf_stats(paths, jobs=1):
+    '''
+    vcf_stats of each VCF in paths (in the same order), run across a pool of jobs
+    processes (one VCF per task)
+    '''
+    if jobs <= 1 or len(paths) <= 1:
+        return [vcf_stats(path) for path in paths]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as executor:
+        return list(executor.map(vcf_stats, paths))
+
+
+def record_count_outliers(counts, threshold=OUTLIER_Z):
+    '''
+    Indices of the counts which are outliers within counts by the modified z-score
+    (0.6745 * |count - median| / MAD). If the MAD is 0 the mean absolute deviation
+    (scaled by 0.7979) is used instead; if that is also 0 there are no outliers.
+    '''
+    if len(counts) < MIN_OUTLIER_VCFS:
+        return []
+    median = statistics.median(counts)
+    deviations = [abs(count - median) for count in counts]
+    scale = statistics.median(deviations) / 0.6745
+    if scale == 0:
+        scale = statistics.mean(deviations) / 0.7979
+    if scale == 0:
+        return []
+    return [i for i, deviation in enumerate(deviations) if deviation / scale > threshold]
+
+
+def matches_file_name(sample, name):
+    '''
+    True if the sample name is the VCF file name (without the .vcf extension) or a '-'
+    or '_' separated part of it (e.g. sample s1 of 000001-s1.vcf.gz but not of
+    000001-s10.vcf.gz)
+    '''
+    stem = name.split('.vcf')[0]
+    return re.search(rf'(^|[-_]){re.escape(sample)}($|[-_])', stem) != None
+
+
+def vcf_problems(paths, stats, sample_ids=None):
+    '''
+    Problems found in each VCF from its stats: a list of messages per VCF (empty if
+    none). Sample columns must be in sample_ids (e.g. the samplesheet Sample_IDs) or,
+    if sample_ids is None, must match the VCF file name. Record counts are compared
+    between VCFs of the same type (file name without the sample name).
+    '''
+    problems = [[] for _ in paths]
+    groups = {}
+    for i, (path, vcf) in enumerate(zip(paths, stats)):
+        name = os.path.basename(path)
+        if vcf['error'] != None:
+            problems[i].append(f'unreadable ({vcf["error"]})')
+            continue
+        if not vcf['samples']:
+            problems[i].append('no sample columns')
+        for sample in vcf['samples']:
+            if sample_ids == None:
+                if not matches_file_name(sample, name):
+                    problems[i].append(f'sample {sample} does not match the file name')
+            elif sample not in sample_ids:
+                problems[i].append(f'sample {sample} is not on the samplesheet')
+        vcf_type = name
+        if vcf['samples'] and matches_file_name(vcf['samples'][0], name):
+            vcf_type = name.replace(vcf['samples'][0], '', 1)
+        groups.setdefault(vcf_type, []).append(i)
+
+    for indices in groups.values():
+        counts = [stats[i]['records'] for i in indices]
+        median = statistics.median(counts) if counts else 0
+        for outlier in record_count_outliers(counts):
+            problems[indices[outlier]].append(
+                f'record count {counts[outlier]} is an outlier (median {median:g})')
+    return problems
@@ -0,0 +1,259 @@
+import os
+import threading
+from collections import OrderedDict
+from itertools import repeat
+from lazy_import import LazyModule
+from xlsx_reader import XlsxReader
+from prefetch import prefetcher
+import profiler
+
+pd = LazyModule('pandas')
+
+
+class WorkbookCache:
+    '''
+    Parsed pipeline workbooks shared by every quality check in a run.
+
+    The same excel report is read by several checks (e.g. the negative workbook is
+    read by ho_neg_checks and ho_neg_summary_table). Sheets are parsed once and held
+    in memory, keyed by the workbook path, size and modification time so a workbook
+    regenerated mid-run is parsed again. The least recently used sheets are evicted
+    once the memory cap (bytes) is reached.
+
+    If a disk_cache (sheet_cache.SheetDiskCache) is set, sheets parsed in a previous
+    run are loaded from it and newly parsed sheets are written to it.
+
+    The cache is thread safe. Each workbook is parsed by one thread at a time, so
+    checks running concurrently that need the same sheet share a single parse.
+    '''
+
+    def __init__(self, max_bytes=512 * 1024 ** 2):
+        self.disk_cache = None
+        self.max_bytes = max_bytes
+        self.sheets = OrderedDict()
+        self.missing = set()
+        self.lock = threading.RLock()
+        self.workbook_locks = {}
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def workbook_key(path):
+        '''
+        Key a workbook on absolute path, size and mtime
+        '''
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    def _workbook_lock(self, key):
+        '''
+        Lock held while a workbook is being parsed
+        '''
+        with self.lock:
+            return self.workbook_locks.setdefault(key, threading.Lock())
+
+    def _store(self, sheet_key, sheet_df):
+        '''
+        Add a parsed sheet to the cache and evict the least recently used sheets
+        '''
+        size = int(sheet_df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if sheet_key in self.sheets:
+                self.cached_bytes -= self.sheets.pop(sheet_key)[1]
+            self.sheets[sheet_key] = (sheet_df, size)
+            self.cached_bytes += size
+            while self.cached_bytes > self.max_bytes:
+                _, (_, old_size) = self.sheets.popitem(last=False)
+                self.cached_bytes -= old_size
+
+    def _cached(self, key, sheet_name, columns):
+        '''
+        Return a cached sheet (or None), moving it to the most recently used position.
+        A projection is taken from the full sheet if another check has already parsed it.
+        A ValueError is raised if the sheet is known to be missing from the workbook.
+        '''
+        with self.lock:
+            if key + (sheet_name,) in self.missing:
+                self.hits += 1
+                raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+            for sheet_key in [key + (sheet_name, column_key(columns)), key + (sheet_name, None)]:
+                if sheet_key in self.sheets:
+                    self.hits += 1
+                    self.sheets.move_to_end(sheet_key)
+                    return project_columns(self.sheets[sheet_key][0], columns)
+        return None
+
+    def read_sheet(self, path, sheet_name, columns=None):
+        '''
+        Return a copy of the sheet as a DataFrame, parsing the workbook only if it has
+        not been read (or has changed) since it was last cached. If columns is given
+        only those columns are returned (and cached).
+        A ValueError is raised if the sheet is not present (as with pd.read_excel).
+        '''
+        key = self.workbook_key(path)
+
+        sheet_df = self._cached(key, sheet_name, columns)
+        if sheet_df is not None:
+            return sheet_df.copy()
+
+        with self._workbook_lock(key):
+            # another thread may have parsed the sheet while waiting for the lock
+            sheet_df = self._cached(key, sheet_name, columns)
+            if sheet_df is None:
+                sheet_df = self._parse(key, sheet_name, columns)
+
+        return sheet_df.copy()
+
+    def _parse(self, key, sheet_name, columns):
+        '''
+        Load a sheet from the disk cache or parse it from the workbook, and cache it
+        '''
+        if self.disk_cache is not None:
+            found, sheet_df = self.disk_cache.load(key, sheet_name, columns)
+            if found:
+                self.hits += 1
+                self.prime(key, sheet_name, columns, sheet_df)
+                if sheet_df is None:
+                    raise ValueError(f"Worksheet named '{sheet_name}' not found")
+                return sheet_df
+
+        self.misses += 1
+        try:
+            if columns is None:
+                with pd.ExcelFile(prefetcher.workbook(key[0])) as xls:
+                    sheet_df = pd.read_excel(xls, sheet_name)
+                num_bytes = key[1]
+            else:
+                # stream only the projected columns from the sheet xml (from memory if
+                # the workbook was prefetched)
+                with XlsxReader(prefetcher.workbook(key[0])) as reader:
+                    sheet_df = reader.read_columns(sheet_name, columns)
+                    num_bytes = reader.bytes_read
+        except ValueError:
+            with XlsxReader(prefetcher.workbook(key[0])) as reader:
+                if sheet_name not in reader.sheet_names:
+                    self.prime(key, sheet_name, columns, None)
+                    if self.disk_cache is not None:
+                        self.disk_cache.save(key, sheet_name, columns, None)
+            raise
+        profiler.record_sheet(key[0], len(sheet_df), num_bytes)
+        self._store(key + (sheet_name, column_key(columns)), sheet_df)
+        if self.disk_cache is not None:
+            self.disk_cache.save(key, sheet_name, columns, sheet_df)
+
+        return sheet_df
+
+    def prime(self, key, sheet_name, columns, sheet_df):
+        '''
+        Add a sheet parsed elsewhere (e.g. in a worker process) to the cache.
+        A sheet_df of None records that the sheet is not present in the workbook.
+        '''
+        if sheet_df is None:
+            with self.lock:
+                self.missing.add(key + (sheet_name,))
+        else:
+            self._store(key + (sheet_name, column_key(columns)), sheet_df)
+
+    def load_sheets(self, paths, sheet_requests, jobs):
+        '''
+        Parse the requested sheets of each workbook across a pool of jobs processes and
+        add them to the cache. sheet_requests is a list of (sheet_name, columns) tuples;
+        workers only return the projected columns to keep inter-process transfer small.
+        Results are added in the order of paths so the cache contents (and any report
+        built from it) match a serial run.
+        '''
+        # the process pool (and multiprocessing) is only imported when jobs > 1
+        from concurrent.futures import ProcessPoolExecutor
+        keys = [self.workbook_key(path) for path in paths]
+
+        # workbooks with every requested sheet in the disk cache are not re-parsed
+        if self.disk_cache is not None:
+            uncached_keys = []
+            for key in keys:
+                cached = [(sheet_name, columns) + self.disk_cache.load(key, sheet_name, columns)
+                          for sheet_name, columns in sheet_requests]
+                if all(found for _, _, found, _ in cached):
+                    for sheet_name, columns, _, sheet_df in cached:
+                        self.prime(key, sheet_name, columns, sheet_df)
+                else:
+                    uncached_keys.append(key)
+            keys = uncached_keys
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(
+                extract_sheets, [key[0] for key in keys], repeat(sheet_requests))
+            for key, sheets in zip(keys, results):
+                for sheet_name, columns, sheet_df, num_bytes in sheets:
+                    if sheet_df is not None:
+                        profiler.record_sheet(key[0], len(sheet_df), num_bytes)
+                    self.prime(key, sheet_name, columns, sheet_df)
+                    if self.disk_cache is not None:
+                        self.disk_cache.save(key, sheet_name, columns, sheet_df)
+
+    def clear(self):
+        '''
+        Drop all cached sheets
+        '''
+        with self.lock:
+            self.sheets.clear()
+            self.missing.clear()
+            self.workbook_locks.clear()
+            self.cached_bytes = 0
+
+
+def column_key(columns):
+    '''
+    Hashable representation of a column projection (None for all columns)
+    '''
+    if columns is None:
+        return None
+    return tuple(columns)
+
+
+def project_columns(sheet_df, columns):
+    '''
+    Keep only the requested columns which are present in the sheet. Missing columns
+    are left for the calling check to report (as it would for a full sheet). This
+    matches the projection applied by XlsxReader.read_columns.
+    '''
+    if columns is None:
+        return sheet_df
+    return sheet_df[[col for col in columns if col in sheet_df.columns]]
+
+
+def extract_sheets(path, sheet_requests):
+    '''
+    Worker function for WorkbookCache.load_sheets. Returns a list of
+    (sheet_name, columns, DataFrame, bytes read) tuples, with None for sheets not in
+    the workbook.
+    '''
+    sheets = []
+    with XlsxReader(path) as reader:
+        for sheet_name, columns in sheet_requests:
+            num_bytes = 0
+            if sheet_name not in reader.sheet_names:
+                sheet_df = None
+            elif columns is None:
+                sheet_df = pd.read_excel(path, sheet_name)
+                num_bytes = os.path.getsize(path)
+            else:
+                start_bytes = reader.bytes_read
+                sheet_df = reader.read_columns(sheet_name, columns)
+                num_bytes = reader.bytes_read - start_bytes
+            sheets.append((sheet_name, columns, sheet_df, num_bytes))
+    return sheets
+
+
+# cache shared by all checks in this process
+workbook_cache = WorkbookCache()
+
+
+def read_sheet(path, sheet_name, columns=None):
+    '''
+    Read a sheet from a pipeline workbook through the shared workbook cache
+    '''
+    return workbook_cache.read_sheet(path, sheet_name, columns)
@@ -0,0 +1,255 @@
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from lazy_import import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+CELL_REF = re.compile(r'([A-Z]+)(\d+)')
+
+
+def column_index(letters):
+    '''
+    Convert a column reference (e.g. 'A', 'AB') to a 0-based column index
+    '''
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def local_tag(tag):
+    '''
+    Tag name without the XML namespace
+    '''
+    return tag.rsplit('}', 1)[-1]
+
+
+class SharedStrings:
+    '''
+    The shared strings table of a workbook, parsed lazily. The table is only streamed as
+    far as the highest index requested so far, and not opened at all for sheets that
+    contain no shared string cells in the projected columns.
+    '''
+
+    def __init__(self, zip_file, part):
+        self.zip_file = zip_file
+        self.part = part
+        self.strings = []
+        self.events = None
+        self.bytes_read = 0
+
+    def _iter_strings(self):
+        if self.part not in self.zip_file.namelist():
+            return
+        self.bytes_read += self.zip_file.getinfo(self.part).compress_size
+        with self.zip_file.open(self.part) as xml:
+            for _, elem in ET.iterparse(xml, events=('end',)):
+                if local_tag(elem.tag) != 'si':
+                    continue
+                # plain (<t>) and rich text (<r><t>) strings, phonetic runs ignored
+                text = []
+                for child in elem:
+                    tag = local_tag(child.tag)
+                    if tag == 't':
+                        text.append(child.text or '')
+                    elif tag == 'r':
+                        for run in child:
+                            if local_tag(run.tag) == 't':
+                                text.append(run.text or '')
+                elem.clear()
+                yield ''.join(text)
+
+    def __getitem__(self, index):
+        if self.events is None:
+            self.events = self._iter_strings()
+        while index >= len(self.strings):
+            try:
+                self.strings.append(next(self.events))
+            except StopIteration:
+                raise IndexError(f'Shared string {index} not present in workbook')
+        return self.strings[index]
+
+
+class XlsxReader:
+    '''
+    Streaming reader for pipeline .xlsx reports which decodes only the requested
+    columns of a sheet. The sheet XML is read with iterparse directly from the zip,
+    rows are discarded once processed and cells outside the projection are skipped
+    without being converted.
+
+    Values are converted as pd.read_excel (openpyxl) would convert them, with the
+    exception of date formatted cells which are returned as Excel serial numbers; it
+    is intended for the numeric and text columns read by the quality checks.
+    '''
+
+    def __init__(self, path):
+        # a path or a file object of the workbook (e.g. an in-memory io.BytesIO)
+        self.path = path
+        self.zip_file = zipfile.ZipFile(path)
+        # compressed bytes of the parts read from the zip (excluding shared strings)
+        self.parts_read = 0
+        self.sheet_parts, shared_strings_part = self._read_workbook()
+        self.shared_strings = SharedStrings(self.zip_file, shared_strings_part)
+
+    def _read_workbook(self):
+        '''
+        Map sheet names to their XML part within the zip
+        '''
+        rels_xml = ET.fromstring(self._read_part('xl/_rels/workbook.xml.rels'))
+        targets = {}
+        shared_strings_part = 'xl/sharedStrings.xml'
+        for rel in rels_xml.iter(f'{{{PKG_REL_NS}}}Relationship'):
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join('xl', target))
+            targets[rel.get('Id')] = target
+            if rel.get('Type', '').endswith('/sharedStrings'):
+                shared_strings_part = target
+
+        workbook_xml = ET.fromstring(self._read_part('xl/workbook.xml'))
+        sheet_parts = {}
+        for elem in workbook_xml.iter():
+            if local_tag(elem.tag) == 'sheet':
+                sheet_parts[elem.get('name')] = targets[elem.get(f'{{{REL_NS}}}id')]
+
+        return sheet_parts, shared_strings_part
+
+    def _open_part(self, part):
+        self.parts_read += self.zip_file.getinfo(part).compress_size
+        return self.zip_file.open(part)
+
+    def _read_part(self, part):
+        with self._open_part(part) as file:
+            return file.read()
+
+    @property
+    def bytes_read(self):
+        '''
+        Compressed bytes read from the workbook so far
+        '''
+        return self.parts_read + self.shared_strings.bytes_read
+
+    @property
+    def sheet_names(self):
+        return list(self.sheet_parts)
+
+    def _sheet_part(self, sheet_name):
+        if sheet_name not in self.sheet_parts:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        return self.sheet_parts[sheet_name]
+
+    def _cell_value(self, cell, cell_type, ns):
+        '''
+        Convert a <c> element to a python value, as pandas does for openpyxl cells
+        ('' for empty cells, NaN for errors, integral floats as int).
+        '''
+        if cell_type == 'inlineStr':
+            return ''.join(t.text or '' for t in cell.iter(f'{ns}t'))
+        value = cell.findtext(f'{ns}v')
+        if not value:
+            return ''
+        if cell_type == 's':
+            return self.shared_strings[int(value)]
+        if cell_type == 'str' or cell_type == 'd':
+            return value
+        if cell_type == 'b':
+            return bool(int(value))
+        if cell_type == 'e':
+            return np.nan
+        if '.' in value or 'E' in value or 'e' in value:
+            number = float(value)
+            if number.is_integer():
+                return int(number)
+            return number
+        return int(value)
+
+    def read_columns(self, sheet_name, columns):
+        '''
+        Return a DataFrame of the requested columns (matched on the header in the first
+        row) of a sheet. Requested columns not present in the sheet are omitted.
+        '''
+        part = self._sheet_part(sheet_name)
+        wanted = {}
+        rows = []
+        last_row_with_data = -1
+        header_read = False
+        ns = ''
+        row_tag = 'row'
+
+        with self._open_part(part) as xml:
+            for event, elem in ET.iterparse(xml, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag.endswith('sheetData'):
+                        sheet_data = elem
+                        ns = elem.tag[:-len('sheetData')]
+                        row_tag = f'{ns}row'
+                    continue
+                if elem.tag != row_tag:
+                    continue
+
+                row_num = elem.get('r')
+                row_num = int(row_num) - 1 if row_num else len(rows)
+                values = {}
+                has_data = False
+                position = 0
+                for cell in elem:
+                    ref = cell.get('r')
+                    col = column_index(CELL_REF.match(ref).group(1)) if ref else position
+                    position = col + 1
+                    if not header_read or col in wanted:
+                        value = self._cell_value(cell, cell.get('t'), ns)
+                        values[col] = value
+                        if not isinstance(value, str) or value != '':
+                            has_data = True
+                    elif not has_data and (cell.findtext(f'{ns}v') or
+                                           cell.get('t') == 'inlineStr'):
+                        has_data = True
+                sheet_data.remove(elem)
+
+                if not header_read:
+                    # the first row holds the column headers
+                    header = values
+                    for col, value in sorted(header.items()):
+                        if value in columns and value not in wanted.values():
+                            wanted[col] = value
+                    wanted = dict(sorted(wanted.items(),
+                                         key=lambda item: columns.index(item[1])))
+                    header_read = True
+                    rows.append(list(wanted.values()))
+                    last_row_with_data = 0
+                    continue
+
+                # rows missing from the xml are empty rows
+                while len(rows) < row_num:
+                    rows.append([''] * len(wanted))
+                rows.append([values.get(col, '') for col in wanted])
+                if has_data:
+                    last_row_with_data = len(rows) - 1
+
+        # trim trailing empty rows
+        rows = rows[:last_row_with_data + 1]
+        if not rows:
+            return pd.DataFrame()
+        if not wanted:
+            return pd.DataFrame(index=pd.RangeIndex(len(rows) - 1),
+                                columns=pd.Index(columns)[:0])
+        from pandas.io.parsers import TextParser
+        return TextParser(rows, header=0, skip_blank_lines=False).read()
+
+    def close(self):
+        self.zip_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+